@@ -41,3 +41,75 @@ class App:
             )
 
         return decorator
+
+    def operator(self, operator: str, **kwargs):
+        """
+        A decorator wrapping a plain (sync or async) per-item function in an operator `Task`. See
+        `map`, `filter` and `flat_map`.
+
+        Args:
+          operator (str): One of `"map"`, `"filter"` or `"flat_map"`.
+
+        Returns:
+          A decorator function returning a `Task` object.
+        """
+
+        def decorator(function):
+
+            return Task(
+                name=function.__name__,
+                function=function,
+                operator=operator,
+                **kwargs
+            )
+
+        return decorator
+
+    def map(self, **kwargs):
+        """
+        A decorator for a per-item transform: the task sends the return value of the function for
+        every item. The runner calls the function directly in a loop over batches of items, which is
+        cheaper than an async generator for lightweight stages.
+
+        .. code-block:: python
+
+          @app.map()
+          def parse(line: str):
+            return json.loads(line)
+
+        Returns:
+          A decorator function returning a `Task` object.
+        """
+        return self.operator("map", **kwargs)
+
+    def filter(self, **kwargs):
+        """
+        A decorator for a per-item predicate: the task sends the items for which the function returns
+        a truthy value.
+
+        .. code-block:: python
+
+          @app.filter()
+          def errors(record: dict):
+            return record["status"] >= 500
+
+        Returns:
+          A decorator function returning a `Task` object.
+        """
+        return self.operator("filter", **kwargs)
+
+    def flat_map(self, **kwargs):
+        """
+        A decorator for a per-item expansion: the task sends every value of the iterable the function
+        returns.
+
+        .. code-block:: python
+
+          @app.flat_map()
+          async def links(page: str):
+            return await extract_links(page)
+
+        Returns:
+          A decorator function returning a `Task` object.
+        """
+        return self.operator("flat_map", **kwargs)
@@ -105,8 +105,7 @@ class CongestionLoadBalancer(AbstractLoadBalancer):
         
         Args:
           output (list): The `output` parameter is a list of objects. Each object in the list has an
-        attribute `input` which is an object with a `queue` attribute. The `queue` attribute represents a
-        queue and has a method `qsize()` which returns the size of the queue.
+        attribute `input` which is a `Stream` whose `qsize()` method returns the number of buffered items.
         
         Returns:
           a list containing the object with the smallest input queue size.
@@ -116,12 +115,12 @@ class CongestionLoadBalancer(AbstractLoadBalancer):
             return []
 
         min_q = output[0]
-        min_qsize = min_q.input.queue.qsize()
+        min_qsize = min_q.input.qsize()
         qsizes = []
         for o in output:
-            qsizes.append(o.input.queue.qsize())
-            if o.input.queue.qsize() < min_qsize:
-                min_qsize = o.input.queue.qsize()
+            qsizes.append(o.input.qsize())
+            if o.input.qsize() < min_qsize:
+                min_qsize = o.input.qsize()
                 min_q = o
 
         return [min_q]
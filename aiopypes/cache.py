@@ -0,0 +1,142 @@
+"""
+    Per-task result caching, enabled with `@app.task(cache=...)`.
+
+    .. code-block:: python
+
+      @app.task(scale=10, cache=Cache(key=lambda url: url, max_items=10000, ttl=300))
+      async def fetch(input: aiopypes.Stream):
+          async for url in input:
+              yield await download(url)
+
+    The results a task produces for an item are stored under a key derived from the item and replayed
+    for later items with the same key, until they expire (`ttl`) or are evicted as least recently used
+    (`max_items`). Runners asking for a key that is already being computed wait for that computation
+    instead of starting their own, so each key costs at most one execution at a time.
+"""
+import asyncio
+import time
+
+from collections import OrderedDict
+from typing import Callable
+
+
+class Cache:
+    """
+    An LRU result cache with expiry and in-flight request coalescing.
+    """
+
+    def __init__(self,
+                 key: Callable = None,
+                 max_items: int = 1024,
+                 ttl: float = None):
+        """
+        The `__init__` function configures the cache.
+
+        Args:
+          key (Callable): Maps an item to its cache key. Defaults to the item itself, which must then be
+        hashable.
+          max_items (int): The most keys held before the least recently used ones are evicted. Defaults to
+        1024
+          ttl (float): How long, in seconds, results stay valid. Defaults to no expiry.
+        """
+        if max_items < 1:
+            raise ValueError("cache must hold at least one item")
+
+        self.key = key
+        self.max_items = max_items
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def lookup(self, key: object):
+        """
+        The `lookup` function returns the cached results for `key`, or None when there are none or they
+        have expired.
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires, values = entry
+        if expires is not None and expires <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return values
+
+    def store(self, key: object, values: list) -> None:
+        """
+        The `store` function caches the results for `key`, evicting the least recently used keys past
+        `max_items`.
+        """
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        self.entries[key] = (expires, values)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_items:
+            self.entries.popitem(last=False)
+
+    async def get(self, item: object, compute: Callable) -> list:
+        """
+        The `get` function returns the results for an item, from the cache, from a computation of the
+        same key already in flight, or by awaiting `compute(item)`.
+
+        Args:
+          item (object): The item.
+          compute (Callable): The coroutine function producing the list of results of an item.
+
+        Returns:
+          The list of results.
+        """
+        key = self.key(item) if self.key else item
+
+        while True:
+            values = self.lookup(key)
+            if values is not None:
+                self.hits += 1
+                return values
+
+            future = self.pending.get(key)
+            if future is None:
+                break
+
+            self.coalesced += 1
+            await asyncio.wait([future])
+            if not future.cancelled():
+                return future.result()
+            # the runner computing the key was cancelled: compute it here instead
+
+        self.misses += 1
+        future = self.pending[key] = asyncio.get_running_loop().create_future()
+        try:
+            values = await compute(item)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it, the future itself need not be retrieved
+            raise
+        finally:
+            del self.pending[key]
+
+        self.store(key, values)
+        future.set_result(values)
+        return values
+
+    def metrics(self) -> dict:
+        """
+        The `metrics` function reports the cache counters.
+
+        Returns:
+          A dictionary with the number of items served from the cache (`cache_hits`), computed
+        (`cache_misses`) and served by waiting on an identical computation in flight (`cache_coalesced`),
+        and the number of keys held (`cache_items`).
+        """
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_coalesced": self.coalesced,
+            "cache_items": len(self.entries),
+        }
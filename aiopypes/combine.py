@@ -0,0 +1,82 @@
+"""
+    Combiner trees for high fan-in reduce stages, built by `Pipeline.reduce(..., combine=...)`.
+
+    .. code-block:: python
+
+      pipeline = source \
+                 .map(*[count_words] * 64) \
+                 .reduce(merge_counts, combine=operator.add, fan_in=8)
+
+    Instead of every upstream task sending its items straight to the reducer, groups of up to
+    `fan_in` upstream tasks send them to a combiner, which folds each batch of items waiting in its
+    input into a single partial result with `combine`, and sends only that partial result on. Layers
+    of combiners are stacked until at most `fan_in` of them feed the reducer, so the reducer handles
+    a few partial results instead of every item, however many upstream tasks there are.
+
+    `combine(a, b)` must be associative and commutative (partial results from different combiners
+    arrive in any order), and return an item of the same kind as its arguments, such as a number, a
+    `collections.Counter` or a set: the reducer receives partial results where it would have received
+    items.
+"""
+import asyncio
+import math
+
+from functools import reduce
+
+from .signal import Signal
+
+
+def combiner(combine, batch_size: int = 128):
+    """
+    The `combiner` function builds the task function of a combiner.
+
+    Args:
+      combine (Callable): The (sync or async) function combining two items into one.
+      batch_size (int): The most items folded into one partial result. Defaults to 128
+
+    Returns:
+      An async generator function yielding one partial result per batch of items.
+    """
+    asynchronous = asyncio.iscoroutinefunction(combine)
+
+    async def function(input):
+        while True:
+            batch = await input.drain(batch_size)
+            done = batch[-1] == Signal.TERM
+            if done:
+                batch.pop()
+            if batch:
+                if asynchronous:
+                    partial = batch[0]
+                    for item in batch[1:]:
+                        partial = await combine(partial, item)
+                    yield partial
+                else:
+                    yield reduce(combine, batch)
+            if done:
+                return
+
+    return function
+
+
+def layers(tasks: int, fan_in: int) -> list:
+    """
+    The `layers` function sizes a combiner tree: a first layer of combiners for every `fan_in`
+    upstream tasks, then further layers until at most `fan_in` combiners are left.
+
+    Args:
+      tasks (int): The number of upstream tasks.
+      fan_in (int): The most tasks feeding one combiner, and the reducer.
+
+    Returns:
+      The number of combiners in each layer, from the upstream tasks to the reducer.
+    """
+    if fan_in < 2:
+        raise ValueError("a combiner tree needs a fan-in of at least 2")
+    if not tasks:
+        return []
+
+    sizes = [math.ceil(tasks / fan_in)]
+    while sizes[-1] > fan_in:
+        sizes.append(math.ceil(sizes[-1] / fan_in))
+    return sizes
@@ -0,0 +1,50 @@
+"""
+    Per-item deadlines, so that work nobody is waiting for anymore is dropped instead of processed.
+
+    .. code-block:: python
+
+      @app.task(interval=0.1)
+      async def quotes():
+          return Deadline.after(await fetch_quote(), 2.0)
+
+      @app.task(max_age=0.5)
+      async def price(input: aiopypes.Stream):
+          async for quote in input:
+              yield await reprice(quote)
+
+    An item gets a deadline when a task yields it as a `Deadline`, or when it enters the input of a
+    task declared with `max_age` (the earlier deadline wins). Streams drop items whose deadline has
+    passed as they are dequeued, and tasks drop results whose deadline has passed before sending
+    them. The results of an item inherit its deadline, so a deadline set at the source holds through
+    every downstream stage. Dropped items are counted in `Task.metrics` as `dropped_expired`.
+
+    Deadlines are `time.monotonic()` timestamps. A `DurableStream` logs them as `time.time()`
+    timestamps, so items replayed after a restart keep the deadlines they were given.
+"""
+import time
+
+from contextvars import ContextVar
+from typing import NamedTuple
+
+
+class Deadline(NamedTuple):
+    value: object
+    expires: float
+
+    @classmethod
+    def after(cls, value: object, seconds: float):
+        """
+        The `after` function gives an item a deadline a number of seconds from now.
+
+        Args:
+          value (object): The item.
+          seconds (float): How long the item stays worth processing.
+
+        Returns:
+          A new `Deadline` object.
+        """
+        return cls(value, time.monotonic() + seconds)
+
+
+# The deadline of the item the current runner dequeued last, inherited by the results it sends.
+expiry = ContextVar("expiry", default=None)
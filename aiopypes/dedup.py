@@ -0,0 +1,308 @@
+"""
+    Probabilistic deduplication, added to a pipeline with `Pipeline.dedup`.
+
+    .. code-block:: python
+
+      pipeline = source \
+                 .dedup(key=lambda e: e["id"], error_rate=0.001, window=3600, path="ids.bloom") \
+                 .map(store)
+
+    Keys are remembered in a scalable Bloom filter: a chain of bit arrays (`bytearray`) that each hold
+    up to a fixed number of keys, where every new array is `growth` times larger and has a tighter
+    false-positive rate so that the overall rate stays below `error_rate`. A key costs about
+    `1.44 * log2(1 / error_rate)` bits (~14 bits at 0.1%), against ~100 bytes in a `set`. A new key is
+    never dropped as a duplicate more often than `error_rate`; a duplicate is always dropped.
+
+    With `window`, keys are forgotten after roughly `window` seconds: the filter is split into `slices`
+    generations of `window / slices` seconds each, and the oldest is dropped as a new one starts. With
+    `path`, the filter is written to disk every `snapshot_interval` seconds and when the stage shuts
+    down, and reloaded on start.
+"""
+import asyncio
+import math
+import os
+import pickle
+import struct
+import time
+
+from hashlib import blake2b
+from typing import Callable
+
+
+hashes = struct.Struct("<QQ")
+
+
+def fingerprint(key: object) -> tuple:
+    """
+    The `fingerprint` function hashes a key into the two 64-bit values from which the bit positions of
+    every filter are derived (double hashing). Keys other than `bytes` and `str` are hashed by their
+    `repr`.
+
+    Args:
+      key (object): The key.
+
+    Returns:
+      A tuple of two integers.
+    """
+    if isinstance(key, str):
+        key = key.encode()
+    elif not isinstance(key, (bytes, bytearray)):
+        key = repr(key).encode()
+    h1, h2 = hashes.unpack(blake2b(key, digest_size=16).digest())
+    return h1, h2 | 1
+
+
+class BloomFilter:
+    """
+    A fixed-size Bloom filter sized for `capacity` keys at `error_rate` false positives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float, count: int = 0, bits: bytes = None):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.count = count
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits is not None else bytearray((self.size + 7) // 8)
+
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def contains(self, h1: int, h2: int) -> bool:
+        bits, size = self.bits, self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, h1: int, h2: int) -> bool:
+        """
+        The `add` function sets the bits of a key and returns whether they were all set already.
+        """
+        bits, size = self.bits, self.size
+        present = True
+        for i in range(self.hashes):
+            position = (h1 + i * h2) % size
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                present = False
+        if not present:
+            self.count += 1
+        return present
+
+
+class ScalableBloomFilter:
+    """
+    A chain of Bloom filters that grows as keys are added while keeping the combined false-positive
+    rate below `error_rate`.
+    """
+
+    def __init__(self,
+                 capacity: int = 100000,
+                 error_rate: float = 0.001,
+                 growth: int = 2,
+                 tightening: float = 0.5,
+                 filters: list = None):
+        self.growth = growth
+        self.tightening = tightening
+        self.filters = filters if filters else [BloomFilter(capacity, error_rate * (1 - tightening))]
+
+    def contains(self, h1: int, h2: int) -> bool:
+        return any(f.contains(h1, h2) for f in reversed(self.filters))
+
+    def add(self, h1: int, h2: int) -> bool:
+        """
+        The `add` function adds a key and returns whether it was (probably) present already.
+        """
+        current = self.filters[-1]
+        for f in self.filters[:-1]:
+            if f.contains(h1, h2):
+                return True
+        if current.full():
+            if current.contains(h1, h2):
+                return True
+            current = BloomFilter(current.capacity * self.growth, current.error_rate * self.tightening)
+            self.filters.append(current)
+        return current.add(h1, h2)
+
+    def nbytes(self) -> int:
+        return sum(len(f.bits) for f in self.filters)
+
+
+class Dedup:
+    """
+    The function of a dedup stage: a filter returning True for items whose key has not been seen.
+    """
+
+    def __init__(self,
+                 key: Callable = None,
+                 capacity: int = 100000,
+                 error_rate: float = 0.001,
+                 window: float = None,
+                 slices: int = 4,
+                 path: str = None,
+                 snapshot_interval: float = 60.0):
+        """
+        The `__init__` function configures the filter, and loads the snapshot at `path` if there is one.
+
+        Args:
+          key (Callable): Maps an item to its key. Defaults to the item itself.
+          capacity (int): The number of keys the first filter is sized for. Larger filters are added as
+        it fills up, so this only needs to be a rough estimate. Defaults to 100000
+          error_rate (float): The highest rate at which new keys are taken for duplicates. Defaults to
+        0.001
+          window (float): How long, in seconds, keys are remembered for. Keys are dropped `window` to
+        `window * (1 + 1 / slices)` seconds after they were added. Defaults to forever.
+          slices (int): The number of generations a `window` is split into. Defaults to 4
+          path (str): A file to snapshot the filter to. Defaults to None
+          snapshot_interval (float): How often, in seconds, the snapshot is written. Defaults to 60.0
+        """
+        if not 0 < error_rate < 1:
+            raise ValueError("dedup error rate must be between 0 and 1")
+
+        self.key = key
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.window = window
+        self.slices = slices
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.generations = []
+        self.unique = 0
+        self.duplicates = 0
+        self.saving = None
+        self.saved = time.time()
+
+        if path and os.path.exists(path):
+            self.load()
+        if not self.generations:
+            self.generations.append((time.time(), self.generation()))
+
+    def generation(self) -> ScalableBloomFilter:
+        # generations overlap, so each gets a share of the error rate
+        error_rate = self.error_rate / (self.slices + 1) if self.window else self.error_rate
+        return ScalableBloomFilter(self.capacity, error_rate)
+
+    def rotate(self, now: float) -> None:
+        length = self.window / self.slices
+        start = self.generations[-1][0]
+        if now < start + length:
+            return
+        start += (now - start) // length * length
+        self.generations.append((start, self.generation()))
+        while self.generations[0][0] < start - self.window:
+            self.generations.pop(0)
+
+    def __call__(self, item: object) -> bool:
+        h1, h2 = fingerprint(self.key(item) if self.key else item)
+        now = time.time()
+        if self.window:
+            self.rotate(now)
+
+        duplicate = any(f.contains(h1, h2) for start, f in self.generations[:-1]) \
+            or self.generations[-1][1].add(h1, h2)
+        if duplicate:
+            self.duplicates += 1
+        else:
+            self.unique += 1
+
+        if self.path and now >= self.saved + self.snapshot_interval:
+            self.snapshot()
+        return not duplicate
+
+    def state(self, generations: list) -> dict:
+        """
+        The `state` function copies generations of the filter into a picklable state. It can run on a
+        worker thread while keys are added: a filter's bits are copied before its count, so a key
+        added in between is at worst counted without being in the copy.
+
+        Args:
+          generations (list): The `(start, filter)` generations, as a list the event loop no longer
+        changes.
+
+        Returns:
+          A dictionary with the window, the slices, and the generations.
+        """
+        copies = []
+        for start, sbf in generations:
+            filters = []
+            for f in list(sbf.filters):
+                bits = bytes(f.bits)
+                filters.append((f.capacity, f.error_rate, f.count, bits))
+            copies.append((start, filters))
+        return {"window": self.window, "slices": self.slices, "generations": copies}
+
+    def load(self) -> None:
+        """
+        The `load` function restores the filter from the snapshot at `path`. Generations keep the
+        time they started at, so they rotate on the schedule they had before the restart, and those
+        that expired in the meantime are dropped right away. A snapshot taken with another `window`
+        or `slices` is aged out by the configured ones.
+        """
+        with open(self.path, "rb") as f:
+            state = pickle.load(f)
+        for start, filters in state["generations"]:
+            sbf = self.generation()
+            sbf.filters = [BloomFilter(*f) for f in filters]
+            self.generations.append((start, sbf))
+        if self.window and self.generations:
+            self.rotate(time.time())
+
+    def save(self, generations: list) -> None:
+        """
+        The `save` function writes generations of the filter to `path`, replacing the previous
+        snapshot atomically.
+
+        Args:
+          generations (list): The generations, see `state`.
+        """
+        state = self.state(generations)
+        temp = f"{self.path}.tmp"
+        with open(temp, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path)
+
+    def snapshot(self) -> None:
+        """
+        The `snapshot` function writes the filter to `path`. Within an event loop the file is written
+        from a worker thread, and a snapshot is skipped while the previous one is still being written.
+        """
+        self.saved = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return self.save(list(self.generations))
+        if self.saving and not self.saving.done():
+            return
+        self.saving = loop.run_in_executor(None, self.save, list(self.generations))
+
+    async def close(self) -> None:
+        """
+        The `close` function writes a last snapshot when the stage shuts down, so that a restart does
+        not forget the keys seen since the previous one. It is called by the task running the stage.
+        """
+        if not self.path:
+            return
+        while self.saving and not self.saving.done():
+            await asyncio.shield(self.saving)
+        self.saved = time.time()
+        self.saving = asyncio.get_running_loop().run_in_executor(None, self.save, list(self.generations))
+        await asyncio.shield(self.saving)
+
+    def metrics(self) -> dict:
+        """
+        The `metrics` function reports the counts and size of the filter.
+
+        Returns:
+          A dictionary with the number of items passed (`dedup_unique`) and dropped (`dedup_duplicates`),
+        and the size of the filter in bytes (`dedup_bytes`).
+        """
+        return {
+            "dedup_unique": self.unique,
+            "dedup_duplicates": self.duplicates,
+            "dedup_bytes": sum(f.nbytes() for start, f in self.generations),
+        }
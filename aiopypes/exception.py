@@ -0,0 +1,4 @@
+class TopologyError(Exception):
+    """
+    Raised by `Pipeline.compile` when the tasks of a pipeline do not form a valid graph.
+    """
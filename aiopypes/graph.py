@@ -1,47 +1,39 @@
 from .task import Task
+from .topology import Topology
 
 
 class Graph:
 
     """
-    [0] every_second (n=1)
-     |
-     *--> [0] route_a (n=1)
-     |     |
-     |     *--> [0] task1 (n=50) --*
-     |     *--> [0] task2 (n=50) --*
-     |                             |
-     *--> [0] route_b (n=1)        |
-           |                       |
-           *--> [0] task1 (n=50) --*
-           *--> [0] task2 (n=50) --*
-                                   |
-                                   *--> [10] task4 (n=1)
+    0 [0] every_second (n=1)
+     *--> 1 [0] route_a (n=1)
+     |     *--> 3 [0] task1 (n=50)
+     |     |     *--> 7 [10] task4 (n=1)
+     |     *--> 4 [0] task2 (n=50)
+     |           *--> 7 [10] task4 (n=1)
+     *--> 2 [0] route_b (n=1)
+           *--> 5 [0] task1 (n=50)
+           |     *--> 7 [10] task4 (n=1)
+           *--> 6 [0] task2 (n=50)
+                 *--> 7 [10] task4 (n=1)
     """
 
     def __init__(self, root: Task):
         self.root = root
-    
-    def print(self):
-        g = ""
-        pointer = set()
-        pointer.add(self.root)
-        v_offset = 0
-        h_offset = 0
+
+    def tasks(self) -> list:
+        tasks = {}
+        pointer = [self.root]
         while pointer:
-            new_pointer = set()
-            if v_offset > 0:
-                g += "\n" * v_offset + " " * h_offset-6 + "|"
-                v_offset += 1
-            for task in list(pointer):
-                if h_offset > 0:
-                    stdscr.addstr(v_offset, h_offset-6, "*-->")
-                g += self.node(task)
-                for o in task.output:
-                    new_pointer.add(o)
-                v_offset += 1
-            h_offset += 7
-            pointer = new_pointer
+            task = pointer.pop()
+            if task not in tasks:
+                tasks[task] = None
+                pointer.extend(task.output)
+        return list(tasks)
+
+    def print(self):
+        print(Topology.build(self.tasks()).render(self.node))
 
     def node(self, task: Task):
-        return f"[{task.input.queue.qsize()}] {task.name} (n={len(task.runners)})"
\ No newline at end of file
+        qsize = task.input.qsize() if task.input else 0
+        return f"[{qsize}] {task.name} (n={len(task.runners)})"
@@ -0,0 +1,149 @@
+"""
+    Keyed stream joins, added to a pipeline with `Pipeline.join`.
+
+    .. code-block:: python
+
+      pipeline = aiopypes.Pipeline() \
+                 .join(requests, responses, key=lambda r: r["id"], within=30) \
+                 .map(store)
+
+    Items from both sides are buffered per key in a hash index. Each new item is paired with every
+    buffered item of the other side that has the same key and arrived within `within` seconds, and
+    the `(left, right)` pairs are sent downstream. Buffered items are evicted once they are older than
+    `within`, or oldest first once the join holds more than `max_items`, both in O(1) per item.
+"""
+import sys
+import time
+
+from collections import deque
+from typing import Callable
+
+
+LEFT = 0
+RIGHT = 1
+
+
+def tag(side: int):
+    """
+    The `tag` function builds the task function that marks items with the side of the join they
+    arrive on.
+
+    Args:
+      side (int): `LEFT` or `RIGHT`.
+
+    Returns:
+      An async generator function yielding `(side, item)` tuples.
+    """
+    async def function(input):
+        async for item in input:
+            yield side, item
+
+    return function
+
+
+class JoinState:
+
+    def __init__(self, join):
+        self.join = join
+        self.index = {}
+        self.expiry = deque()
+
+    def __len__(self):
+        return len(self.expiry)
+
+    def pop(self) -> None:
+        t, side, key = self.expiry.popleft()
+        buffers = self.index[key]
+        buffers[side].popleft()
+        if not buffers[LEFT] and not buffers[RIGHT]:
+            del self.index[key]
+
+    def add(self, side: int, item: object) -> list:
+        join = self.join
+        now = join.timestamp(item) if join.timestamp else time.monotonic()
+
+        horizon = now - join.within
+        while self.expiry and self.expiry[0][0] < horizon:
+            self.pop()
+
+        key = join.key(item) if side == LEFT else join.right_key(item)
+        buffers = self.index.get(key)
+        if buffers is None:
+            buffers = self.index[key] = (deque(), deque())
+
+        within = join.within
+        if side == LEFT:
+            pairs = [(item, o) for t, o in buffers[RIGHT] if abs(now - t) <= within]
+        else:
+            pairs = [(o, item) for t, o in buffers[LEFT] if abs(now - t) <= within]
+
+        buffers[side].append((now, item))
+        self.expiry.append((now, side, key))
+        while len(self.expiry) > join.max_items:
+            self.pop()
+
+        return pairs
+
+    def nbytes(self) -> int:
+        size = sys.getsizeof(self.index) + sys.getsizeof(self.expiry)
+        for left, right in self.index.values():
+            size += sys.getsizeof(left) + sys.getsizeof(right)
+            size += sum(sys.getsizeof(item) for t, item in left)
+            size += sum(sys.getsizeof(item) for t, item in right)
+        return size
+
+
+class Join:
+    """
+    The task function of a join stage. It is called once per runner with a stream of `(side, item)`
+    tuples, and keeps the state of every running join so it can be reported by `metrics`.
+    """
+
+    def __init__(self,
+                 key: Callable,
+                 within: float,
+                 right_key: Callable = None,
+                 max_items: int = 100000,
+                 timestamp: Callable = None):
+        """
+        The `__init__` function configures the join.
+
+        Args:
+          key (Callable): Maps an item to its join key.
+          within (float): How far apart (in seconds, or in units of `timestamp`) two items may arrive
+        and still be joined. Older items are evicted.
+          right_key (Callable): Maps an item of the right side to its join key. Defaults to `key`.
+          max_items (int): The most items buffered across both sides before the oldest are evicted.
+        Defaults to 100000
+          timestamp (Callable): Maps an item to its event time. Defaults to the arrival time.
+        """
+        self.key = key
+        self.right_key = right_key if right_key else key
+        self.within = within
+        self.max_items = max_items
+        self.timestamp = timestamp
+        self.states = []
+
+    async def __call__(self, input):
+        state = JoinState(self)
+        self.states.append(state)
+        try:
+            async for side, item in input:
+                for pair in state.add(side, item):
+                    yield pair
+        finally:
+            self.states.remove(state)
+
+    def metrics(self) -> dict:
+        """
+        The `metrics` function reports how much state the join is holding.
+
+        Returns:
+          A dictionary with the number of buffered items (`join_items`), distinct keys (`join_keys`) and
+        an estimate of the memory they use in bytes (`join_bytes`).
+        """
+        return {
+            "join_items": sum(len(state) for state in self.states),
+            "join_keys": sum(len(state.index) for state in self.states),
+            "join_bytes": sum(state.nbytes() for state in self.states),
+        }
\ No newline at end of file
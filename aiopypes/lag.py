@@ -0,0 +1,209 @@
+"""
+    Event-loop lag: how late the loop runs callbacks that are due, which grows when tasks keep it busy
+    with CPU-bound work instead of awaiting I/O.
+
+    Every pipeline runs a `LoopLagMonitor` on each of its event loops (its own loop, and the loop of
+    each thread group). Scalers see the monitor of their loop as `scaler.monitor`, and
+    `TanhTaskScaler` does not add runners while the lag is above its `max_lag`: more runners would
+    only add overhead to a loop that is already saturated. Task metrics report the share of time the
+    task held its loop (`busy`), and flag it with `offload` when its loop is lagging and the task is
+    a large part of the reason, as a hint to move it to its own thread (`@app.task(thread=...)`) or to
+    an executor.
+
+    .. code-block:: python
+
+      job = asyncio.create_task(pipeline.run_async())
+      ...
+      print(pipeline.lag())     # {None: {"lag_p50": 0.0002, "lag_p99": 0.005, ...}}
+"""
+import asyncio
+import time
+import types
+
+from collections import deque
+
+
+class LoopLagMonitor:
+    """
+    A probe sleeping `interval` seconds at a time on an event loop, recording how much later than
+    planned it wakes up in a histogram.
+    """
+
+    bounds = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+    def __init__(self,
+                 interval: float = 0.01,
+                 window: int = 100,
+                 threshold: float = 0.1,
+                 share: float = 0.25):
+        """
+        The `__init__` function configures the probe.
+
+        Args:
+          interval (float): The seconds between two probes. Defaults to 0.01
+          window (int): The number of recent probes the current lag is taken over. Defaults to 100
+          threshold (float): The lag, in seconds, above which the loop counts as lagging. Defaults to 0.1
+          share (float): The share of the loop's time a task must hold, while the loop is lagging, to be
+        flagged for offloading. Defaults to 0.25
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.share = share
+        self.recent = deque(maxlen=window)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.samples = 0
+        self.worst = 0.0
+
+    def record(self, lag: float) -> None:
+        """
+        The `record` function adds one measured lag to the histogram.
+
+        Args:
+          lag (float): The lag, in seconds.
+        """
+        self.recent.append(lag)
+        self.samples += 1
+        self.worst = max(self.worst, lag)
+        for i, bound in enumerate(self.bounds):
+            if lag <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def lag(self) -> float:
+        """
+        The `lag` function returns the current lag: the largest one over the recent probes.
+
+        Returns:
+          The lag, in seconds.
+        """
+        return max(self.recent, default=0.0)
+
+    def lagging(self) -> bool:
+        """
+        The `lagging` function checks whether the current lag is above the threshold.
+
+        Returns:
+          Whether the loop is lagging.
+        """
+        return self.lag() > self.threshold
+
+    def offload(self, share: float) -> bool:
+        """
+        The `offload` function checks whether a task holding the loop for `share` of the time should
+        move off it: the loop is lagging and the task is a large part of its load.
+
+        Args:
+          share (float): The share of the time the task held the loop.
+
+        Returns:
+          Whether the task should be moved to a thread or an executor.
+        """
+        return share >= self.share and self.lagging()
+
+    def quantile(self, q: float) -> float:
+        """
+        The `quantile` function estimates a quantile of the lag from the histogram, as the upper bound
+        of the bucket it falls in.
+
+        Args:
+          q (float): The quantile, between 0 and 1.
+
+        Returns:
+          The lag, in seconds.
+        """
+        rank = q * self.samples
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(bound, self.worst)
+        return self.worst
+
+    def metrics(self) -> dict:
+        """
+        The `metrics` function reports the lag of the loop.
+
+        Returns:
+          A dictionary with the current lag (`lag`), its median, 99th percentile and largest value
+        (`lag_p50`, `lag_p99`, `lag_max`), all in seconds, and the number of probes per bucket
+        (`histogram`, keyed by the upper bound of the bucket).
+        """
+        return {
+            "lag": self.lag(),
+            "lag_p50": self.quantile(0.5),
+            "lag_p99": self.quantile(0.99),
+            "lag_max": self.worst,
+            "histogram": dict(zip(self.bounds + (float("inf"),), self.counts)),
+        }
+
+    async def run(self, lock: asyncio.Lock) -> None:
+        """
+        The `run` function probes the loop it runs on until the killswitch is acquired.
+
+        Args:
+          lock (asyncio.Lock): The killswitch.
+        """
+        loop = asyncio.get_running_loop()
+        while not lock.locked():
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.record(max(loop.time() - start - self.interval, 0.0))
+
+
+class Clock:
+    """
+    The time a task's runners have held their event loop, in seconds, since `start`.
+    """
+
+    __slots__ = ("busy", "start")
+
+    def __init__(self):
+        self.busy = 0.0
+        self.start = time.perf_counter()
+
+    def share(self) -> float:
+        """
+        The `share` function returns the fraction of the time since `start` spent holding the loop.
+
+        Returns:
+          The share, between 0 and 1.
+        """
+        elapsed = time.perf_counter() - self.start
+        return self.busy / elapsed if elapsed > 0 else 0.0
+
+
+@types.coroutine
+def timed(coroutine, clock: Clock):
+    """
+    The `timed` function runs a coroutine, adding the time each of its steps (from one suspension to
+    the next) holds the event loop to `clock`.
+
+    Args:
+      coroutine: The coroutine.
+      clock (Clock): The clock to add the time to.
+
+    Returns:
+      The value the coroutine returns.
+    """
+    iterator = coroutine.__await__()
+    value, error = None, None
+    while True:
+        start = time.perf_counter()
+        try:
+            if error is None:
+                signal = iterator.send(value)
+            else:
+                signal = iterator.throw(error)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            clock.busy += time.perf_counter() - start
+        value, error = None, None
+        try:
+            value = yield signal
+        except GeneratorExit:
+            iterator.close()
+            raise
+        except BaseException as e:
+            error = e
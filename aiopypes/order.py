@@ -0,0 +1,104 @@
+import asyncio
+
+from typing import Callable
+
+
+class ReorderBuffer:
+    """
+    Restores input order for tasks running more than one runner.
+
+    The input stream tags every item with a sequence number when it is dequeued. When a runner yields,
+    its result is filed under the sequence number of the last item it dequeued (items it consumed
+    without yielding are treated as filtered out), and results are sent downstream strictly in
+    sequence order. A runner whose result is `window` or more positions ahead of the oldest missing
+    one waits, so a slow item holds back at most `window` completed results.
+    """
+
+    def __init__(self, window: int = 100):
+        """
+        The `__init__` function sets the size of the reorder window.
+
+        Args:
+          window (int): The maximum distance, in items, between the oldest unfinished item and the newest
+        buffered result. Defaults to 100
+        """
+        if window < 1:
+            raise ValueError("reorder window must be at least 1")
+
+        self.window = window
+        self.next = 0
+        self.pending = {}
+        self.cond = asyncio.Condition()
+
+    def copy(self):
+        """
+        The `copy` function returns a new, empty buffer with the same window.
+
+        Returns:
+          A new `ReorderBuffer` object.
+        """
+        return self.__class__(self.window)
+
+    def buffered(self) -> int:
+        """
+        The `buffered` function returns the number of completed results held back.
+        """
+        return sum(len(items) for items in self.pending.values())
+
+    async def release(self, send: Callable) -> None:
+        """
+        The `release` function sends every result that is next in sequence. It must be called with the
+        condition lock held, which also serializes sends.
+
+        Args:
+          send (Callable): The coroutine function sending a result downstream.
+        """
+        while self.next in self.pending:
+            for item in self.pending.pop(self.next):
+                await send(item)
+            self.next += 1
+        self.cond.notify_all()
+
+    async def put(self, seqs: list, item: object, send: Callable) -> None:
+        """
+        The `put` function files a result under the last of `seqs`, marks the others as filtered out, and
+        sends whatever has become next in sequence.
+
+        Args:
+          seqs (list): The sequence numbers of the items dequeued by the runner since its last yield.
+          item (object): The result the runner yielded.
+          send (Callable): The coroutine function sending a result downstream.
+        """
+        async with self.cond:
+            for seq in seqs[:-1]:
+                self.pending[seq] = []
+            await self.release(send)
+
+            seq = seqs[-1]
+            if seq < self.next:
+                await send(item)
+                return
+            if seq in self.pending:
+                self.pending[seq].append(item)
+                return
+
+            await self.cond.wait_for(lambda: seq - self.next < self.window)
+            self.pending[seq] = [item]
+            await self.release(send)
+
+    async def skip(self, seqs: list, send: Callable) -> None:
+        """
+        The `skip` function marks items as producing no result (filtered out, or re-enqueued after their
+        runner was cancelled) so that they no longer hold back later results.
+
+        Args:
+          seqs (list): The sequence numbers to skip.
+          send (Callable): The coroutine function sending a result downstream.
+        """
+        if not seqs:
+            return
+        async with self.cond:
+            for seq in seqs:
+                if seq >= self.next:
+                    self.pending.setdefault(seq, [])
+            await self.release(send)
\ No newline at end of file
@@ -1,4 +1,7 @@
 import asyncio
+import math
+
+from typing import Callable
 
 
 class Pipeline:
@@ -16,6 +19,9 @@ class Pipeline:
         self.scope = []
         self.tasks = []
         self.jobs = []
+        self.topology = None
+        self.threads = {}
+        self.monitors = {}
         self.lock = asyncio.Lock()
         if tasks:
             for task in tasks:
@@ -31,7 +37,9 @@ class Pipeline:
         
         Args:
           routes (list): The `routes` parameter is a list that specifies the routes that the tasks should
-        follow. It is an optional parameter and its default value is an empty list.
+        follow. It is an optional parameter and its default value is an empty list. A `Router` (or a dict,
+        taken as `Router(routes=...)`) routes items by key, predicate or default instead, see
+        `aiopypes.route`.
         
         Returns:
           The `map` method is returning `self`.
@@ -40,7 +48,7 @@ class Pipeline:
         new_scope = []
 
         for scope in self.scope:
-            scope.routes = routes
+            scope.routes = self.router(routes, tasks, len(scope.output))
             for task in tasks:
                 t = task.copy()
                 t.lock = self.lock
@@ -52,7 +60,7 @@ class Pipeline:
         
         return self
 
-    def reduce(self, *tasks, routes: list = []):
+    def reduce(self, *tasks, routes: list = [], combine: Callable = None, fan_in: int = 8):
         """
         The `reduce` function adds tasks to a pipeline and connects them together by setting their output to
         be the input for the next task.
@@ -61,12 +69,27 @@ class Pipeline:
           routes (list): The `routes` parameter is a list that specifies the routing of the output of each
         task to the input of the next task in the pipeline. Each element in the `routes` list represents a
         connection between two tasks. The format of each element is `(task_index_1, task_index_2
+        A `Router` (or a dict) instead routes the items of every task in the current scope to the given
+        tasks, as in `map`.
+          combine (Callable): An associative and commutative function combining two items into one. When
+        given, the tasks of the current scope feed a tree of combiners that pre-aggregate batches of
+        items, and the reduced tasks receive partial results instead of items, see `aiopypes.combine`.
+        Defaults to None
+          fan_in (int): The most tasks feeding each combiner, and the reduced tasks. Defaults to 8
         
         Returns:
           The `reduce` method returns `self`, which allows for method chaining.
         """
+        if combine is not None:
+            self.combine(combine, fan_in)
+
         new_scope = []
 
+        if not isinstance(routes, list):
+            for scope in self.scope:
+                scope.routes = self.router(routes, tasks, len(scope.output))
+            routes = []
+
         for task in tasks:
             t = task.copy()
             t.lock = self.lock
@@ -80,6 +103,169 @@ class Pipeline:
 
         return self
 
+    def combine(self, combine: Callable, fan_in: int = 8):
+        """
+        The `combine` function adds a tree of combiners after the tasks of the current scope, sized by
+        `aiopypes.combine.layers`, and makes its last layer the current scope. Each combiner runs on the
+        thread of the tasks feeding it when they share one.
+
+        Args:
+          combine (Callable): An associative and commutative function combining two items into one.
+          fan_in (int): The most tasks feeding each combiner. Defaults to 8
+
+        Returns:
+          The `combine` method returns `self`, which allows for method chaining.
+        """
+        from .task import Task
+        from .combine import combiner, layers
+
+        template = Task(name="combine", function=combiner(combine), scale=1, fuse=False)
+
+        for size in layers(len(self.scope), fan_in):
+            new_scope = []
+            width = math.ceil(len(self.scope) / size)
+            for i in range(0, len(self.scope), width):
+                group = self.scope[i:i + width]
+                t = template.copy()
+                t.lock = self.lock
+                threads = {task.thread for task in group}
+                t.thread = threads.pop() if len(threads) == 1 else None
+                for task in group:
+                    task.output.append(t)
+                new_scope.append(t)
+                self.tasks.append(t)
+            self.scope = new_scope
+
+        return self
+
+    @staticmethod
+    def router(routes: object, tasks: tuple, offset: int) -> object:
+        """
+        The `router` function resolves the routes given to `map` or `reduce` for one upstream task whose
+        first `offset` outputs already exist. Lists of routes are returned unchanged.
+        """
+        from .route import Router
+
+        if isinstance(routes, dict):
+            routes = Router(routes=routes)
+        if isinstance(routes, Router):
+            return routes.resolve(tasks, offset)
+        return routes
+
+    def window(self,
+               kind: str,
+               size: float = None,
+               key: Callable = None,
+               agg: object = "count",
+               **kwargs):
+        """
+        The `window` function adds a windowed aggregation stage after every task in the current scope.
+        Each closed window is sent downstream as a `Window(key, start, end, value)` tuple.
+
+        .. code-block:: python
+
+          pipeline = source \\
+                     .window("tumbling", size=10, key=lambda i: i["user"], agg="count") \\
+                     .map(report)
+
+        Args:
+          kind (str): One of `"tumbling"`, `"sliding"` or `"session"`.
+          size (float): The window length (or, for session windows, the inactivity gap) in seconds or
+        in units of the event-time `timestamp`.
+          key (Callable): Maps an item to the key it is aggregated under. Defaults to a single key.
+          agg (object): A built-in aggregation name (`"count"`, `"sum"`, `"min"`, `"max"`, `"mean"`) or an
+        `aiopypes.window.Aggregation`. Defaults to `"count"`
+          **kwargs: Further options of `aiopypes.window.window` (`slide`, `gap`, `value`, `timestamp`,
+        `lateness`).
+
+        Returns:
+          The `window` method returns `self`, which allows for method chaining.
+        """
+        from .task import Task
+        from .window import window
+
+        function = window(kind, size=size, key=key, agg=agg, **kwargs)
+
+        return self.map(Task(name=f"{kind}_window", function=function, scale=1, fuse=False))
+
+    def dedup(self,
+              key: Callable = None,
+              error_rate: float = 0.001,
+              **kwargs):
+        """
+        The `dedup` function adds a stage after every task in the current scope that drops items whose key
+        has already been seen. Keys are kept in a scalable Bloom filter, so memory stays at a couple of
+        bytes per key at the cost of dropping new items as duplicates at a rate of at most `error_rate`.
+
+        .. code-block:: python
+
+          pipeline = source \\
+                     .dedup(key=lambda e: e["id"], window=3600) \\
+                     .map(store)
+
+        Args:
+          key (Callable): Maps an item to its key. Defaults to the item itself.
+          error_rate (float): The false-positive rate of the filter. Defaults to 0.001
+          **kwargs: Further options of `aiopypes.dedup.Dedup` (`capacity`, `window`, `slices`, `path`,
+        `snapshot_interval`).
+
+        Returns:
+          The `dedup` method returns `self`, which allows for method chaining.
+        """
+        from .task import Task
+        from .dedup import Dedup
+
+        function = Dedup(key=key, error_rate=error_rate, **kwargs)
+
+        return self.map(Task(name="dedup", function=function, operator="filter"))
+
+    def join(self,
+             left,
+             right,
+             key: Callable,
+             within: float,
+             **kwargs):
+        """
+        The `join` function merges two upstream pipelines (or tasks) into this one and joins their
+        outputs on a key. Matching `(left, right)` pairs are sent downstream.
+
+        .. code-block:: python
+
+          pipeline = Pipeline() \\
+                     .join(requests, responses, key=lambda r: r["id"], within=30) \\
+                     .map(store)
+
+        Args:
+          left: The `Pipeline` (or `Task`) whose current scope feeds the left side of the join.
+          right: The `Pipeline` (or `Task`) whose current scope feeds the right side of the join.
+          key (Callable): Maps an item to its join key.
+          within (float): How far apart two items may arrive and still be joined; older items are
+        evicted from the join state.
+          **kwargs: Further options of `aiopypes.join.Join` (`right_key`, `max_items`, `timestamp`).
+
+        Returns:
+          The `join` method returns `self`, which allows for method chaining.
+        """
+        from .task import Task
+        from .join import Join, LEFT, RIGHT, tag
+
+        join = Task(name="join", function=Join(key, within, **kwargs), scale=1)
+        join.lock = self.lock
+
+        for side, upstream in ((LEFT, left), (RIGHT, right)):
+            if not isinstance(upstream, Pipeline):
+                upstream = Pipeline(tasks=[upstream])
+            name = "join_left" if side == LEFT else "join_right"
+            upstream.map(Task(name=name, function=tag(side)))
+            for scope in upstream.scope:
+                scope.output.append(join)
+            self.merge(upstream)
+
+        self.tasks.append(join)
+        self.scope = [join]
+
+        return self
+
     def merge(self, *pipelines):
         """
         The `merge` function takes multiple pipelines as input and merges their tasks into a single
@@ -97,6 +283,160 @@ class Pipeline:
         
         return self
     
+    def instantiate(self):
+        """
+        The `instantiate` function gives every task copied into the pipeline its own input stream, scaler
+        and balancer. Copies are created without them so that building large graphs stays cheap; this is
+        called when the pipeline starts.
+
+        Returns:
+          The `instantiate` method returns `self`, which allows for method chaining.
+        """
+        for task in self.tasks:
+            task.instantiate()
+
+        return self
+
+    def fuse(self):
+        """
+        The `fuse` function collapses linear chains of lightweight tasks into single tasks whose
+        runners pass results directly from one task function to the next, skipping the queue, scaler
+        and send of every hop. A task is fused into its upstream task when it is that task's only
+        output, has no other upstream task, and `Task.fusable` allows it. Fusion is applied when the
+        pipeline starts and can be disabled per task with `fuse=False`.
+
+        Returns:
+          The `fuse` method returns `self`, which allows for method chaining.
+        """
+        self.instantiate()
+
+        upstream = {}
+        for task in self.tasks:
+            for o in task.output:
+                upstream[o] = upstream.get(o, 0) + 1
+
+        absorbed = set()
+        for task in self.tasks:
+            if len(task.output) == 1:
+                o = task.output[0]
+                if upstream.get(o) == 1 and task.fusable(o):
+                    absorbed.add(o)
+
+        tasks = []
+        for task in self.tasks:
+            if task in absorbed:
+                continue
+            chain = []
+            tail = task
+            while len(tail.output) == 1 and tail.output[0] in absorbed and tail.output[0] is not task:
+                tail = tail.output[0]
+                chain.append(tail)
+            if chain:
+                task.absorb(chain)
+                self.scope = [task if t in chain else t for t in self.scope]
+            tasks.append(task)
+
+        self.tasks = tasks
+
+        return self
+
+    def compile(self):
+        """
+        The `compile` function validates the graph of tasks and freezes it into a `Topology`, with tasks
+        numbered in topological order, and gives every task with routes an O(1) route table. It is
+        called by `run_async` once tasks have been fused.
+
+        Raises:
+          TopologyError: The graph has a cycle, an edge to a task outside the pipeline, or a route
+        without an output.
+
+        Returns:
+          The `Topology` of the pipeline.
+        """
+        from .topology import Topology
+
+        self.topology = Topology.build(self.tasks)
+        for task in self.topology.tasks:
+            task.dispatch = self.topology.dispatch(task) if task.routes else None
+
+        return self.topology
+
+    def siblings(self) -> list:
+        """
+        The `siblings` function groups the tasks with a `StealingStream` input that are fed by the same
+        upstream tasks and run on the same thread, and lets each of them steal from the others. Ordered
+        tasks, tasks fed through routes and source tasks are left out. It is called by `run_async` once
+        the pipeline is compiled and partitioned.
+
+        Returns:
+          The list of groups of sibling tasks.
+        """
+        from .stream import StealingStream
+
+        topology = self.topology
+        groups = {}
+        for i, task in enumerate(topology.tasks):
+            if type(task.input) is not StealingStream or task.ordered:
+                continue
+            upstream = topology.inputs[i]
+            if not upstream or any(topology.tasks[u].routes for u in upstream):
+                continue
+            groups.setdefault((frozenset(upstream), task.thread), []).append(task)
+
+        groups = [group for group in groups.values() if len(group) > 1]
+        for group in groups:
+            for task in group:
+                task.input.group([t.input for t in group if t is not task])
+
+        return groups
+
+    def partition(self) -> dict:
+        """
+        The `partition` function groups the tasks of the pipeline by the thread they run on, and gives
+        every task fed from another thread a `ThreadSafeStream` input.
+
+        Raises:
+          ValueError: A task fed from another thread has an input stream other than a plain `Stream`, or a
+        bounded one with the `"block"` policy.
+
+        Returns:
+          A dictionary of the lists of tasks by thread name, where `None` is the pipeline's own loop.
+        """
+        from .stream import Stream, ThreadSafeStream
+
+        groups = {}
+        for task in self.tasks:
+            groups.setdefault(task.thread, []).append(task)
+            for o in task.output:
+                if o.thread == task.thread or isinstance(o.input, ThreadSafeStream):
+                    continue
+                if type(o.input) is not Stream:
+                    raise ValueError(f"task {o.name} is fed from another thread and needs an in-memory stream")
+                stream = ThreadSafeStream(o.input.max_items, o.input.policy, o.input.max_age)
+                stream.sequence = o.input.sequence
+                o.input = stream
+
+        return groups
+
+    def metrics(self) -> list:
+        """
+        The `metrics` function collects the metrics of every task in the pipeline.
+
+        Returns:
+          A list with the `Task.metrics` dictionary of each task.
+        """
+        return [task.metrics() for task in self.tasks]
+
+    def lag(self) -> dict:
+        """
+        The `lag` function reports the event-loop lag of a running pipeline (see `aiopypes.lag`).
+
+        Returns:
+          The `LoopLagMonitor.metrics` dictionary of each event loop, keyed by thread name (None for the
+        loop the pipeline runs on).
+        """
+        return {name: monitor.metrics() for name, monitor in self.monitors.items()}
+
     async def graph(self):
         """
         The above function uses the curses library to display information about tasks and their runners in
@@ -108,34 +448,20 @@ class Pipeline:
         curses.cbreak()
 
         """
-        [0] task1 (30)
-         |
-         *--> [5] task2 (30)
-         *--> [10] task3 (30)
-               |
-               *--> [10] task4 (1)
+        0 [0] task1 (n=30)
+         *--> 1 [5] task2 (n=30)
+         *--> 2 [10] task3 (n=30)
+               *--> 3 [10] task4 (n=1)
         """
+        def node(task):
+            return f"[{task.input.qsize()}] {task.name} (n={len(task.runners)})"
+
         try:
             while not self.lock.locked():
-                pointer = set()
-                pointer.add(self.tasks[0])
-                v_offset = 0
-                h_offset = 0
-                while pointer:
-                    new_pointer = set()
-                    if v_offset > 0:
-                        stdscr.addstr(v_offset, h_offset-6, "|")
-                        v_offset += 1
-                    for task in list(pointer):
-                        if h_offset > 0:
-                            stdscr.addstr(v_offset, h_offset-6, "*-->")
-                        stdscr.addstr(v_offset, h_offset, f"[{task.input.queue.qsize()}] {task.name} (n={len(task.runners)})")
-                        for o in task.output:
-                            new_pointer.add(o)
-                        v_offset += 1
-                    h_offset += 7
-                    pointer = new_pointer
-                stdscr.addstr(v_offset, h_offset, f"\n")
+                topology = self.topology if self.topology else self.compile()
+                stdscr.erase()
+                for v_offset, line in enumerate(topology.render(node).splitlines()):
+                    stdscr.addstr(v_offset, 0, line)
                 stdscr.refresh()
                 await asyncio.sleep(1)
         finally:
@@ -143,13 +469,38 @@ class Pipeline:
             curses.nocbreak()
             curses.endwin()
 
-    async def run_async(self, graph: bool = False):
-    
+    async def run_async(self, graph: bool = False, fuse: bool = True):
+
+        from .lag import LoopLagMonitor
+        from .thread import ThreadGroup
+
+        self.instantiate()
+        if fuse:
+            self.fuse()
+
+        self.compile()
+        groups = self.partition()
+        self.siblings()
+        self.monitors = {name: LoopLagMonitor() for name in groups}
+        for name, tasks in groups.items():
+            for task in tasks:
+                task.monitor = task.scaler.monitor = self.monitors[name]
+        threads = [ThreadGroup(name, tasks, self.monitors[name])
+                   for name, tasks in groups.items() if name is not None]
+        self.threads = {thread.name: thread for thread in threads}
+
         try:
+            for thread in threads:
+                thread.start()
             async with asyncio.TaskGroup() as tg:
-                for task in self.tasks:
+                for task in groups.get(None, []):
                     job = tg.create_task(task.run_async())
                     self.jobs.append(job)
+                if None in self.monitors:
+                    job = tg.create_task(self.monitors[None].run(self.lock))
+                    self.jobs.append(job)
+                if threads:
+                    tg.create_task(self.wait_threads(threads))
                 if graph:
                     job = tg.create_task(self.graph())
                     self.jobs.append(job)
@@ -157,9 +508,12 @@ class Pipeline:
         finally:
             try:
                 print("Closing tasks gracefully")
-                await self.lock.acquire()
+                await self.stop()
                 print("Killswitch acquired")
+                for thread in threads:
+                    thread.stop()
                 closures = [asyncio.wait_for(job, timeout=10) for job in self.jobs]
+                closures += [thread.join(timeout=10) for thread in threads]
                 await asyncio.gather(*closures)
                 print("All tasks closed gracefully")
             except asyncio.TimeoutError:
@@ -167,11 +521,115 @@ class Pipeline:
             except asyncio.CancelledError:
                 print("Tasks already closed")
 
-    def run(self, **kwargs):
+    async def wait_threads(self, threads: list):
+        """
+        The `wait_threads` function keeps the pipeline's own loop running until the killswitch is acquired
+        or every thread group has returned.
+
+        Args:
+          threads (list): The running `ThreadGroup` objects.
+        """
+        while not self.lock.locked() and any(thread.thread.is_alive() for thread in threads):
+            await asyncio.sleep(0.1)
+
+    async def drain(self, deadline: float = 30.0) -> bool:
+        """
+        The `drain` function stops a running pipeline without losing queued items. Source tasks are stopped
+        first, then every task is stopped as soon as all of its upstream tasks have stopped and it has
+        processed the items left in its input, so independent branches drain in parallel. Once every task
+        has stopped, or `deadline` has passed, the killswitch is acquired as in `stop`.
+
+        .. code-block:: python
+
+          loop.add_signal_handler(signal.SIGTERM, lambda: asyncio.ensure_future(pipeline.drain(10)))
+
+        Args:
+          deadline (float): The most seconds to spend draining before stopping anyway. Defaults to 30.0
+
+        Returns:
+          Whether every task drained before the deadline.
+        """
+        topology = self.topology if self.topology else self.compile()
+        jobs = []
+
+        async def drain(i):
+            await asyncio.gather(*(jobs[j] for j in topology.inputs[i]))
+            task = topology.tasks[i]
+            coroutine = task.drain(source=not topology.inputs[i])
+            thread = self.threads.get(task.thread)
+            if thread:
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, thread.loop))
+            else:
+                await coroutine
+
+        for i in range(len(topology.tasks)):
+            jobs.append(asyncio.ensure_future(drain(i)))
+
+        try:
+            async with asyncio.timeout(deadline):
+                await asyncio.gather(*jobs)
+            drained = True
+        except TimeoutError:
+            for job in jobs:
+                job.cancel()
+            drained = False
+
+        await self.stop()
+        return drained
+
+    async def stop(self):
+        """
+        The `stop` function acquires the killswitch, which makes every task stop its runners and return, so
+        that `run` and `run_async` return.
+        """
+        if not self.lock.locked():
+            await self.lock.acquire()
+        for task in self.tasks:
+            if task.thread is None:
+                task.interrupt()
+
+    def run(self,
+            loop_factory: Callable = None,
+            task_factory: Callable = None,
+            eager: bool = False,
+            slow_callback_ms: float = None,
+            debug: bool = None,
+            **kwargs):
         """
         The `run` function runs a series of tasks asynchronously and handles graceful closure of the tasks.
+
+        .. code-block:: python
+
+          import uvloop
+
+          pipeline.run(loop_factory=uvloop.new_event_loop, eager=True)
+
+        Args:
+          loop_factory (Callable): Creates the event loop to run on (e.g. `uvloop.new_event_loop`).
+        Defaults to the default asyncio event loop.
+          task_factory (Callable): A task factory to install on the loop, see
+        `asyncio.AbstractEventLoop.set_task_factory`. Defaults to None
+          eager (bool): Installs `asyncio.eager_task_factory` (Python 3.12+), which starts runners
+        synchronously until their first suspension instead of scheduling them. Defaults to False
+          slow_callback_ms (float): Sets the duration, in milliseconds, above which the loop logs a
+        callback as slow in debug mode. Defaults to the loop default (100ms).
+          debug (bool): Runs the loop in debug mode. Defaults to the `PYTHONASYNCIODEBUG` setting.
+          **kwargs: Passed to `run_async`.
         """
+        if eager:
+            if task_factory:
+                raise ValueError("eager and task_factory cannot be combined")
+            if not hasattr(asyncio, "eager_task_factory"):
+                raise RuntimeError("eager task execution requires Python 3.12 or newer")
+            task_factory = asyncio.eager_task_factory
+
         try:
-            asyncio.run(self.run_async(**kwargs))
+            with asyncio.Runner(debug=debug, loop_factory=loop_factory) as runner:
+                loop = runner.get_loop()
+                if task_factory:
+                    loop.set_task_factory(task_factory)
+                if slow_callback_ms is not None:
+                    loop.slow_callback_duration = slow_callback_ms / 1000
+                runner.run(self.run_async(**kwargs))
         except KeyboardInterrupt:
             print("Pipeline application shut down by user")
\ No newline at end of file
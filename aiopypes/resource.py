@@ -0,0 +1,61 @@
+"""
+    Resources (HTTP sessions, database pools, ...) opened and closed alongside a task, declared with
+    `@app.task(resources=...)`.
+
+    .. code-block:: python
+
+      @app.task(scaler=aiopypes.TanhTaskScaler(max=20),
+                resources={"session": Resource(lambda size: aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=size)), sized=True)})
+      async def fetch(input: aiopypes.Stream, session):
+          async for url in input:
+              async with session.get(url) as response:
+                  yield await response.text()
+
+    Each resource is built by a factory returning an async context manager. Task-scoped resources are
+    entered once, before the task starts its first runner, shared by all of its runners and exited in
+    `Task.shutdown`. Runner-scoped resources are entered when a runner starts and exited when it stops.
+    The entered values are passed to the task function as keyword arguments named after the resource.
+"""
+from typing import Callable
+
+
+class Resource:
+    """
+    The declaration of a resource: how to build it and how long it lives.
+    """
+
+    def __init__(self,
+                 factory: Callable,
+                 scope: str = "task",
+                 sized: bool = False):
+        """
+        The `__init__` function configures the resource.
+
+        Args:
+          factory (Callable): Returns an async context manager whose entered value is the resource.
+          scope (str): `"task"` for one resource shared by every runner of the task, or `"runner"` for one
+        resource per runner. Defaults to `"task"`
+          sized (bool): Calls the factory with the number of runners that will share the resource: the
+        maximum of the task's scaler for task-scoped resources, and 1 for runner-scoped ones (the task's
+        `concurrency`, for runners with several items in flight), so that a connection pool can hold one
+        connection per runner. Defaults to False
+        """
+        if scope not in ("task", "runner"):
+            raise ValueError(f"unknown resource scope: {scope}")
+
+        self.factory = factory
+        self.scope = scope
+        self.sized = sized
+
+    def create(self, size: int):
+        """
+        The `create` function calls the factory.
+
+        Args:
+          size (int): The number of runners sharing the resource.
+
+        Returns:
+          The async context manager of the resource.
+        """
+        return self.factory(size) if self.sized else self.factory()
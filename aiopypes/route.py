@@ -0,0 +1,172 @@
+"""
+    Content-based routing between a task and the tasks it is mapped onto.
+
+    .. code-block:: python
+
+      pipeline = source \
+                 .map(clicks, views, archive, routes=Router(
+                     key=lambda e: e["type"],
+                     routes={"click": clicks, "view": [views, archive]},
+                     predicates=[(lambda e: e["size"] > 1_000_000, archive)],
+                     default=archive))
+
+    A `Router` sends each item to the targets of the first rule it matches: the entry of `routes` for
+    the item's key, then the first of `predicates` returning True, then `default` (dropping the item
+    when there is no default). Targets are tasks passed to the same `map`/`reduce` call (or their
+    positions in it), or lists of them for items that go to several tasks.
+
+    A task can also route an item explicitly by yielding `Routed(key, value)`: `value` is sent to the
+    targets of `key` and the key never becomes part of the item. The legacy list form of `routes`
+    (where a task yields `(route, *values)` tuples) accepts `Routed` items as well.
+"""
+from types import MappingProxyType
+from typing import Callable, NamedTuple
+
+
+class Routed(NamedTuple):
+    key: object
+    value: object
+
+
+class Router:
+    """
+    The routing rules of the edges created by one `map` or `reduce` call.
+    """
+
+    def __init__(self,
+                 routes: dict = None,
+                 key: Callable = None,
+                 predicates: list = None,
+                 default: object = None):
+        """
+        The `__init__` function declares the rules. Rules are compiled into a dispatch function when the
+        pipeline is compiled.
+
+        Args:
+          routes (dict): Maps route keys to targets.
+          key (Callable): Maps an item to its route key. Items yielded as `Routed` use their own key.
+        Defaults to None, where only `Routed` items have a key.
+          predicates (list): `(predicate, target)` pairs tried in order for items whose key has no route.
+          default (object): The target of items matching no rule. Defaults to None, which drops them.
+        """
+        self.routes = dict(routes) if routes else {}
+        self.key = key
+        self.predicates = list(predicates) if predicates else []
+        self.default = default
+
+    def resolve(self, tasks: tuple, offset: int = 0):
+        """
+        The `resolve` function replaces every target by the positions, in a task's output list, of the
+        tasks it refers to.
+
+        Args:
+          tasks (tuple): The tasks passed to the `map` or `reduce` call, in order.
+          offset (int): The position of the first of them in the output list. Defaults to 0
+
+        Raises:
+          ValueError: A target is neither one of `tasks` nor a position in them.
+
+        Returns:
+          A new `Router` whose targets are tuples of output positions.
+        """
+        def positions(target):
+            if target is None:
+                return ()
+            if not isinstance(target, (list, tuple)):
+                target = [target]
+            result = []
+            for t in target:
+                if isinstance(t, int):
+                    index = t
+                elif t in tasks:
+                    index = tasks.index(t)
+                else:
+                    raise ValueError(f"route target {t!r} is not one of the mapped tasks")
+                if not 0 <= index < len(tasks):
+                    raise ValueError(f"route target {t!r} is out of range")
+                result.append(offset + index)
+            return tuple(result)
+
+        return self.__class__(
+            routes={route: positions(target) for route, target in self.routes.items()},
+            key=self.key,
+            predicates=[(predicate, positions(target)) for predicate, target in self.predicates],
+            default=positions(self.default),
+        )
+
+    def targets(self) -> set:
+        """
+        The `targets` function returns every output position used by a resolved router.
+        """
+        targets = set(self.default or ())
+        for positions in self.routes.values():
+            targets.update(positions)
+        for predicate, positions in self.predicates:
+            targets.update(positions)
+        return targets
+
+    def compile(self, output: list) -> Callable:
+        """
+        The `compile` function builds the dispatch function of a resolved router.
+
+        Args:
+          output (list): The output tasks of the routing task.
+
+        Returns:
+          A function mapping an item to the list of tasks to send it to and the value to send.
+        """
+        table = MappingProxyType({
+            route: [output[i] for i in positions] for route, positions in self.routes.items()
+        })
+        predicates = tuple((predicate, [output[i] for i in positions])
+                           for predicate, positions in self.predicates)
+        default = [output[i] for i in self.default or ()]
+        key = self.key
+
+        def dispatch(obj):
+            if type(obj) is Routed:
+                route, obj = obj
+            else:
+                route = key(obj) if key else None
+            if table:
+                try:
+                    targets = table.get(route)
+                except TypeError:
+                    targets = None
+                if targets is not None:
+                    return targets, obj
+            for predicate, targets in predicates:
+                if predicate(obj):
+                    return targets, obj
+            return default, obj
+
+        return dispatch
+
+
+def legacy(table: dict, output: list) -> Callable:
+    """
+    The `legacy` function builds the dispatch function of a list of routes: items are `(route, *values)`
+    tuples (or `Routed`), sent to the output at the position of `route` in the list, or to every output
+    when there is no such route.
+
+    Args:
+      table (dict): Maps each route to the list of tasks it sends to.
+      output (list): The output tasks of the routing task.
+
+    Returns:
+      A function mapping an item to the list of tasks to send it to and the value to send.
+    """
+    table = MappingProxyType(dict(table))
+
+    def dispatch(obj):
+        if type(obj) is Routed:
+            route, obj = obj
+        else:
+            route = obj[0]
+            obj = obj[1] if len(obj) == 2 else obj[1:]
+        try:
+            return table.get(route, output), obj
+        except TypeError:
+            return output, obj
+
+    return dispatch
@@ -1,3 +1,5 @@
+import time
+
 from abc import ABC, abstractclassmethod, abstractproperty
 
 from .stream import Stream
@@ -14,7 +16,9 @@ class AbstractTaskScaler(ABC):
     def __init__(self,
                  interval: int = 1,
                  min: int = 1,
-                 max: int = 50):
+                 max: int = 50,
+                 max_lag: float = None,
+                 grace: float = None):
         """
         The function is a constructor that initializes three variables with default values.
         
@@ -26,10 +30,21 @@ class AbstractTaskScaler(ABC):
         1
           max (int): The `max` parameter represents the maximum value that can be generated by the code.
         Defaults to 50
+          max_lag (float): The event-loop lag, in seconds, above which `lagging` tells the scaler to hold
+        off adding runners. Defaults to None, never
+          grace (float): With `min=0`, retires every runner of the task once its input has been empty,
+        with nothing in flight, for this many seconds. The task then waits for the next item to arrive
+        and starts `wake()` runners as soon as it does, instead of polling the scaler. Defaults to
+        None, never
         """
         self.interval = interval
         self.min = min
         self.max = max
+        self.max_lag = max_lag
+        self.grace = grace
+        self.monitor = None
+        self.held = 0
+        self.since = None
     
     @abstractclassmethod
     def scale(self, *args) -> list:
@@ -71,6 +86,47 @@ class AbstractTaskScaler(ABC):
         else:
             return proposal
 
+    def lagging(self) -> bool:
+        """
+        The `lagging` function checks whether the event loop of the task is lagging by more than
+        `max_lag`, according to the `LoopLagMonitor` the pipeline set as `monitor` (see `aiopypes.lag`).
+
+        Returns:
+          Whether adding runners should be held off.
+        """
+        return (self.max_lag is not None and self.monitor is not None
+                and self.monitor.lag() > self.max_lag)
+
+    def idle(self, input: Stream) -> bool:
+        """
+        The `idle` function checks whether the runners of the task should all be retired: `min` is 0
+        and the input has been empty, with nothing in flight, for `grace` seconds.
+
+        Args:
+          input (Stream): The input stream of the task.
+
+        Returns:
+          Whether to scale the task to zero.
+        """
+        if self.min > 0 or self.grace is None:
+            return False
+        now = time.monotonic()
+        if self.since is None or input.qsize() or input.inflight():
+            self.since = now
+            return False
+        return now - self.since >= self.grace
+
+    def wake(self) -> int:
+        """
+        The `wake` function returns the number of runners to start when an item arrives at a task scaled
+        to zero, and resets the idle timer.
+
+        Returns:
+          The number of runners, at least 1.
+        """
+        self.since = None
+        return max(self.min, 1)
+
     def sleep(self):
         """
         The function returns the value of the interval attribute.
@@ -80,6 +136,15 @@ class AbstractTaskScaler(ABC):
         """
         return self.interval
 
+    def capacity(self) -> int:
+        """
+        The `capacity` function returns the most runners the scaler will run at once.
+
+        Returns:
+          The value of `self.max`.
+        """
+        return self.max
+
 
 class StaticTaskScaler(AbstractTaskScaler):
 
@@ -122,6 +187,25 @@ class StaticTaskScaler(AbstractTaskScaler):
         else:
             return 0
 
+    def wake(self) -> int:
+        """
+        The `wake` function restarts the fixed number of runners after the task was scaled to zero.
+
+        Returns:
+          The value of `self.val`.
+        """
+        self.since = None
+        return self.val
+
+    def capacity(self) -> int:
+        """
+        The `capacity` function returns the fixed number of runners.
+
+        Returns:
+          The value of `self.val`.
+        """
+        return self.val
+
 
 class TanhTaskScaler(AbstractTaskScaler):
 
@@ -130,6 +214,7 @@ class TanhTaskScaler(AbstractTaskScaler):
                  sample_window: int = 10,
                  kappa: float = 0.02,
                  buffer: int = 1,
+                 max_lag: float = 0.1,
                  **kwargs):
         """
         The above function is a constructor that initializes various parameters and variables for a class.
@@ -145,8 +230,10 @@ class TanhTaskScaler(AbstractTaskScaler):
         `kappa` will result in a smaller step size, while a lower value will result in a larger step size.
           buffer (int): The `buffer` parameter is an integer that determines the number of previous samples
         to keep in memory. It is used to calculate the gradient of the samples. Defaults to 1
+          max_lag (float): Holds off adding runners above `min` while the event loop lags by more than
+        this many seconds, since more runners only add overhead to a saturated loop. Defaults to 0.1
         """
-        super().__init__(**kwargs)
+        super().__init__(max_lag=max_lag, **kwargs)
 
         self.max_step_size = max_step_size
         self.sample_window = sample_window
@@ -198,7 +285,7 @@ class TanhTaskScaler(AbstractTaskScaler):
         Returns:
           the value of `val`.
         """
-        qsize = input.queue.qsize()
+        qsize = input.qsize()
         self.sample(qsize)
         gradient = self.get_gradient()
 
@@ -209,6 +296,10 @@ class TanhTaskScaler(AbstractTaskScaler):
         elif qsize > 0:
             proposal = self.buffer
 
+        if proposal > 0 and current >= self.min and self.lagging():
+            self.held += 1
+            proposal = 0
+
         val = self.clip(proposal, current+proposal)
 
         return val
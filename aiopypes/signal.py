@@ -4,4 +4,7 @@ class Signal:
     """_summary_
     """
 
-    TERM: str = 'TERM'
\ No newline at end of file
+    TERM: str = 'TERM'
+    # Returned by streams in place of an item dropped past its deadline. Unlike TERM, it is never sent
+    # between tasks, so it is an object no item can be (or be equal to).
+    EXPIRED: object = object()
\ No newline at end of file
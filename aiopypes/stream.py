@@ -1,18 +1,272 @@
 import asyncio
+import os
+import pickle
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
 
+from collections import deque
+from contextvars import ContextVar
+from typing import Callable
+
+from .deadline import Deadline, expiry
 from .signal import Signal
+from .wal import WriteAheadLog
+
 
+# The task whose runner is running, which `FairStream` uses to tell upstream tasks apart.
+sender = ContextVar("sender", default=None)
 
 class Stream:
     """_summary_
     """
 
-    def __init__(self):
+    __slots__ = ("queue", "checkouts", "sequence", "tags", "max_items", "policy", "max_age", "room",
+                 "timed", "expired", "shed", "arrival", "arrived")
+
+    policies = ("block", "drop_oldest", "drop_newest", "drop_random")
+
+    def __init__(self, max_items: int = None, policy: str = "block", max_age: float = None):
         """_summary_
 
         Args:
+          max_items (int): Bounds the number of items waiting in the stream. `Signal.TERM` and requeued
+        items are never held back. Defaults to None, unbounded.
+          policy (str): What happens to an item enqueued while `max_items` items are waiting: `"block"`
+        waits for room, `"drop_newest"` drops the item, `"drop_oldest"` drops the item that would be
+        dequeued next to make room, and `"drop_random"` drops incoming items with a probability rising
+        from 0 at half of `max_items` to 1 at `max_items`, so that overload is shed before the stream
+        is full. Defaults to "block"
+          max_age (float): Gives every enqueued item a deadline `max_age` seconds after it enters the
+        stream (see `aiopypes.deadline`). Defaults to None
         """
+        if policy not in self.policies:
+            raise ValueError(f"unknown shedding policy {policy!r}, expected one of {self.policies}")
+        if max_items is not None and max_items < 1:
+            raise ValueError("a bounded stream needs room for at least one item")
+        if policy != "block" and max_items is None:
+            raise ValueError(f"the {policy!r} policy needs max_items")
+
         self.queue = asyncio.Queue()
+        self.checkouts = {}
+        self.sequence = None
+        self.tags = {}
+        self.max_items = max_items
+        self.policy = policy
+        self.max_age = max_age
+        self.room = asyncio.Event() if max_items is not None and policy == "block" else None
+        self.timed = False
+        self.expired = 0
+        self.shed = 0
+        self.arrival = None
+        self.arrived = None
+
+    def copy(self):
+        """
+        The `copy` function returns a new, empty stream with the same configuration as this one.
+
+        Returns:
+          A new `Stream` object.
+        """
+        return self.__class__(self.max_items, self.policy, self.max_age)
+
+    def qsize(self) -> int:
+        """
+        The `qsize` function returns the number of items waiting in the stream.
+
+        Returns:
+          The number of buffered items.
+        """
+        return self.queue.qsize()
+
+    async def open(self) -> None:
+        """
+        The `open` function is called by the owning task before its first runner starts.
+        """
+        pass
+
+    async def close(self) -> None:
+        """
+        The `close` function is called by the owning task once all of its runners have shut down.
+        """
+        pass
+
+    def checkout(self, entry: object) -> None:
+        """
+        The `checkout` function records a dequeued entry as in flight for the current runner and, once
+        sequencing is enabled, tags it with the next sequence number.
+
+        Args:
+          entry (object): The entry taken off the queue.
+        """
+        runner = asyncio.current_task()
+        self.checkouts.setdefault(runner, []).append(entry)
+        if self.sequence is not None:
+            self.tags.setdefault(runner, []).append(self.sequence)
+            self.sequence += 1
+
+    def sequenced(self) -> None:
+        """
+        The `sequenced` function enables tagging dequeued entries with consecutive sequence numbers,
+        as used by ordered tasks.
+        """
+        self.sequence = 0
+
+    def tagged(self, runner: asyncio.Task = None) -> list:
+        """
+        The `tagged` function returns (and forgets) the sequence numbers of the entries a runner has
+        dequeued since it was last called for that runner.
+
+        Args:
+          runner (asyncio.Task): The runner. Defaults to the current one.
+
+        Returns:
+          The list of sequence numbers, in dequeue order.
+        """
+        return self.tags.pop(runner or asyncio.current_task(), [])
+
+    def ack(self) -> list:
+        """
+        The `ack` function is called by a runner each time it yields (and when it finishes),
+        acknowledging every entry it has dequeued since its previous yield.
+
+        Returns:
+          The list of acknowledged entries.
+        """
+        entries = self.checkouts.pop(asyncio.current_task(), None)
+        if not entries:
+            return []
+        self.commit(entries)
+        return entries
+
+    def commit(self, entries: list) -> None:
+        """
+        The `commit` function is a hook for streams that need to act on acknowledged entries.
+
+        Args:
+          entries (list): The acknowledged entries.
+        """
+        pass
+
+    def handoff(self, runner: asyncio.Task) -> None:
+        """
+        The `handoff` function passes the oldest entry a runner has in flight to the current asyncio
+        task, which then acknowledges it as its own, e.g. the per-item tasks of a runner with
+        `concurrency`, which take over their entries in the order they were dequeued.
+
+        Args:
+          runner (asyncio.Task): The runner giving up the entry.
+        """
+        entries = self.checkouts.get(runner)
+        if not entries:
+            return
+        self.checkouts.setdefault(asyncio.current_task(), []).append(entries.pop(0))
+        if not entries:
+            del self.checkouts[runner]
+
+    def requeue(self, runner: asyncio.Task) -> list:
+        """
+        The `requeue` function puts the entries a runner had in flight back on the queue, e.g. when the
+        runner is cancelled before acknowledging them.
+
+        Args:
+          runner (asyncio.Task): The runner whose entries should be re-enqueued.
+
+        Returns:
+          The list of re-enqueued entries.
+        """
+        entries = self.checkouts.pop(runner, None)
+        if not entries:
+            return []
+        for entry in entries:
+            self.queue.put_nowait(entry)
+        return entries
+
+    def inflight(self, runner: asyncio.Task = None) -> int:
+        """
+        The `inflight` function returns the number of entries dequeued but not yet acknowledged.
+
+        Args:
+          runner (asyncio.Task): Restricts the count to a single runner. Defaults to all runners.
+
+        Returns:
+          The number of in-flight entries.
+        """
+        if runner is not None:
+            return len(self.checkouts.get(runner, ()))
+        return sum(len(entries) for entries in self.checkouts.values())
+
+    def stamp(self, val: object) -> object:
+        """
+        The `stamp` function gives an item the deadline of the stream's `max_age`, unless it already has
+        an earlier one.
+
+        Args:
+          val (object): The item.
+
+        Returns:
+          The item as a `Deadline`.
+        """
+        if val == Signal.TERM:
+            return val
+        expires = time.monotonic() + self.max_age
+        if type(val) is Deadline:
+            return val if val.expires <= expires else Deadline(val.value, expires)
+        return Deadline(val, expires)
+
+    def evict(self) -> object:
+        """
+        The `evict` function removes the item the `"drop_oldest"` policy drops to make room.
+
+        Returns:
+          The removed item.
+        """
+        return self.queue.get_nowait()
+
+    def arrive(self) -> None:
+        """
+        The `arrive` function sets the `arrival` event (which a task scaled to zero waits on, see
+        `AbstractTaskScaler`), recording when it was set.
+        """
+        if not self.arrival.is_set():
+            self.arrived = time.perf_counter()
+            self.arrival.set()
+
+    def offer(self, val: object) -> None:
+        """
+        The `offer` function adds an item without waiting, applying the shedding policy when the stream
+        is bounded. `Signal.TERM` is never dropped.
+
+        Args:
+          val (object): The item.
+        """
+        if self.arrival is not None:
+            self.arrive()
+        queue = self.queue
+        if self.max_items is None or self.policy == "block" or val == Signal.TERM:
+            return queue.put_nowait(val)
+
+        size = queue.qsize()
+        if self.policy == "drop_random":
+            low = self.max_items // 2
+            if size >= low and random.random() * (self.max_items - low) < size - low:
+                self.shed += 1
+                return
+        elif size >= self.max_items:
+            if self.policy == "drop_newest":
+                self.shed += 1
+                return
+            oldest = self.evict()
+            if oldest == Signal.TERM:
+                queue.put_nowait(oldest)  # the stream is shutting down, keep the signal
+                self.shed += 1
+                return
+            self.shed += 1
+        queue.put_nowait(val)
 
     async def enqueue(self, val: object) -> None:
         """_summary_
@@ -23,7 +277,69 @@ class Stream:
         Returns:
             _type_: _description_
         """
-        return await self.queue.put(val)
+        if self.max_age is not None:
+            val = self.stamp(val)
+        if self.room is not None and val != Signal.TERM:
+            while self.queue.qsize() >= self.max_items:
+                self.room.clear()
+                await self.room.wait()
+        self.offer(val)
+
+    def admit(self, o: object) -> object:
+        """
+        The `admit` function checks the deadline of a dequeued item. The deadline of a live item becomes
+        the deadline of the results the current runner sends next.
+
+        Args:
+          o (object): The item, possibly a `Deadline`.
+
+        Returns:
+          The item without its deadline, or `Signal.EXPIRED` when its deadline has passed.
+        """
+        if type(o) is not Deadline:
+            if self.timed:
+                expiry.set(None)
+            return o
+        self.timed = True
+        if o.expires > time.monotonic():
+            expiry.set(o.expires)
+            return o.value
+        self.expired += 1
+        return Signal.EXPIRED
+
+    def expiry(self, entry: object) -> float:
+        """
+        The `expiry` function returns the deadline of a checked out entry.
+
+        Args:
+          entry (object): The entry.
+
+        Returns:
+          The deadline, or None.
+        """
+        return entry.expires if type(entry) is Deadline else None
+
+    def receive(self, o: object) -> object:
+        """
+        The `receive` function turns an entry taken off the queue into the item returned to the runner.
+
+        Args:
+          o (object): The entry.
+
+        Returns:
+          The item, `Signal.TERM`, or `Signal.EXPIRED` when the item is dropped.
+        """
+        if o == Signal.TERM:
+            return o
+        if self.room is not None and not self.room.is_set():
+            self.room.set()
+        if not self.timed and type(o) is not Deadline:
+            self.checkout(o)
+            return o
+        item = self.admit(o)
+        if item is not Signal.EXPIRED:
+            self.checkout(o)
+        return item
 
     async def dequeue(self) -> object:
         """_summary_
@@ -31,7 +347,77 @@ class Stream:
         Returns:
             _type_: _description_
         """
-        return await self.queue.get()
+        while True:
+            o = self.receive(await self.queue.get())
+            if o is not Signal.EXPIRED:
+                return o
+
+    async def poll(self, timeout: float = None) -> object:
+        """
+        The `poll` function returns the next item, waiting at most `timeout` seconds for one. Unlike
+        wrapping `dequeue` in `asyncio.wait_for`, which runs it in a task of its own, the item is checked
+        out by the calling runner, which acknowledges it.
+
+        Args:
+          timeout (float): The most seconds to wait. Defaults to None, no limit.
+
+        Raises:
+          asyncio.TimeoutError: No item arrived in time.
+
+        Returns:
+          The next item in the stream.
+        """
+        if timeout is None or self.qsize():
+            return await self.dequeue()
+        loop = asyncio.get_running_loop()
+        end = loop.time() + timeout
+        while True:
+            getter = asyncio.ensure_future(self.queue.get())
+            try:
+                await asyncio.wait((getter,), timeout=max(end - loop.time(), 0))
+            except BaseException:
+                if getter.done():
+                    self.queue.put_nowait(getter.result())
+                else:
+                    getter.cancel()
+                raise
+            if not getter.done():
+                getter.cancel()  # the queue keeps an item a cancelled getter was woken for
+                await asyncio.wait((getter,))
+                if getter.cancelled():
+                    raise asyncio.TimeoutError
+            o = self.receive(getter.result())
+            if o is not Signal.EXPIRED:
+                return o
+
+    async def drain(self, size: int) -> list:
+        """
+        The `drain` function waits for one item, then takes whatever else is already buffered, up to
+        `size` items in total. A `Signal.TERM` is only ever the last item of a batch.
+
+        Args:
+          size (int): The most items to return.
+
+        Returns:
+          The list of items.
+        """
+        items = [await self.dequeue()]
+        queue = self.queue
+        while len(items) < size and not queue.empty() and items[-1] != Signal.TERM:
+            o = self.receive(queue.get_nowait())
+            if o is not Signal.EXPIRED:
+                items.append(o)
+        return items
+
+    def metrics(self) -> dict:
+        """
+        The `metrics` function reports how many items the stream dropped.
+
+        Returns:
+          A dictionary with the number of items dropped past their deadline (`dropped_expired`) and shed
+        by the bounding policy (`dropped_shed`).
+        """
+        return {"dropped_expired": self.expired, "dropped_shed": self.shed}
 
     def __aiter__(self):
         return self
@@ -50,4 +436,1095 @@ class Stream:
         if o == Signal.TERM:
             raise StopAsyncIteration
         else:
-            return o
\ No newline at end of file
+            return o
+
+
+class FusedStream(Stream):
+    """
+    The input of a task fused into its upstream task: items are pulled straight from the upstream
+    task's async generator instead of going through a queue.
+    """
+
+    def __init__(self, source):
+        """
+        The `__init__` function wraps the upstream async iterator.
+
+        Args:
+          source: The async iterator producing the upstream task's results.
+        """
+        super().__init__()
+
+        self.source = source
+
+    async def dequeue(self) -> object:
+        """
+        The `dequeue` function returns the next upstream result, or `Signal.TERM` once the upstream
+        generator is exhausted.
+
+        Returns:
+          The next item in the stream.
+        """
+        try:
+            return await self.__anext__()
+        except StopAsyncIteration:
+            return Signal.TERM
+
+    async def __anext__(self):
+        while True:
+            o = await self.source.__anext__()
+            if not self.timed and type(o) is not Deadline:
+                return o
+            o = self.admit(o)
+            if o is not Signal.EXPIRED:
+                return o
+
+
+class ThreadSafeStream(Stream):
+    """
+    The input of a task fed by tasks running on other threads (see `Task(thread=...)`). Items enqueued
+    from another event loop are collected in a locked buffer and moved onto the queue by a single
+    `call_soon_threadsafe` callback on the consuming loop, which picks up every item enqueued before
+    it runs, so a burst of items costs one cross-thread wakeup instead of one per item.
+    """
+
+    def __init__(self, max_items: int = None, policy: str = "block", max_age: float = None):
+        """
+        The `__init__` function initializes the stream. Items enqueued before it is opened are held until
+        the consuming loop is known. A bounded stream needs a shedding policy other than `"block"`, as
+        producers on other loops cannot wait for room; the policy is applied as items reach the
+        consuming loop.
+
+        Args:
+          max_items (int): See `Stream`. Defaults to None
+          policy (str): See `Stream`. Defaults to "block"
+          max_age (float): See `Stream`. Defaults to None
+        """
+        if max_items is not None and policy == "block":
+            raise ValueError("a bounded thread-safe stream needs a shedding policy")
+
+        super().__init__(max_items, policy, max_age)
+
+        self.loop = None
+        self.mutex = threading.Lock()
+        self.pending = []
+        self.scheduled = False
+
+    def qsize(self) -> int:
+        """
+        The `qsize` function returns the number of items waiting in the stream, including those not yet
+        handed over to the consuming loop.
+
+        Returns:
+          The number of buffered items.
+        """
+        return self.queue.qsize() + len(self.pending)
+
+    async def open(self) -> None:
+        """
+        The `open` function binds the stream to the loop of the consuming task.
+        """
+        with self.mutex:
+            self.loop = asyncio.get_running_loop()
+        self.flush()
+
+    def flush(self) -> None:
+        """
+        The `flush` function moves the buffered items onto the queue. It runs on the consuming loop.
+        """
+        with self.mutex:
+            items, self.pending, self.scheduled = self.pending, [], False
+        for item in items:
+            self.offer(item)
+
+    async def enqueue(self, val: object) -> None:
+        """
+        The `enqueue` function adds an item to the stream from any thread.
+
+        Args:
+          val (object): The item.
+        """
+        if self.max_age is not None:
+            val = self.stamp(val)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        with self.mutex:
+            local = running is not None and running is self.loop
+            if not local:
+                self.pending.append(val)
+                if self.scheduled or self.loop is None:
+                    return
+                self.scheduled = True
+
+        if local:
+            return self.offer(val)
+        try:
+            self.loop.call_soon_threadsafe(self.flush)
+        except RuntimeError:
+            pass  # the consuming loop has already shut down
+
+
+class LevelQueue(asyncio.Queue):
+    """
+    An `asyncio.Queue` holding items in one FIFO deque per priority level, used by `PriorityStream`.
+    `Signal.TERM` is held apart and only returned once every level is empty.
+    """
+
+    def __init__(self, priority: Callable, levels: int, weights: list = None, maxsize: int = 0):
+        self.priority = priority
+        self.levels = levels
+        self.weights = weights
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        self._queue = [deque() for _ in range(self.levels)]
+        self.terms = deque()
+        self.size = 0
+        self.credits = [0] * self.levels
+        self.dequeued = [0] * self.levels
+        self.waited = [0.0] * self.levels
+        self.longest = [0.0] * self.levels
+
+    def qsize(self):
+        return self.size
+
+    def empty(self):
+        return not self.size
+
+    def full(self):
+        return 0 < self.maxsize <= self.size
+
+    def _put(self, item):
+        self.size += 1
+        if item == Signal.TERM:
+            self.terms.append(item)
+            return
+        value = item.value if type(item) is Deadline else item
+        level = min(max(int(self.priority(value)), 0), self.levels - 1)
+        self._queue[level].append((time.monotonic(), item))
+
+    def evict(self) -> object:
+        """
+        The `evict` function removes the oldest item of the least urgent non-empty level, or a
+        `Signal.TERM` when only signals are left.
+        """
+        for items in reversed(self._queue):
+            if items:
+                self.size -= 1
+                return items.popleft()[1]
+        self.size -= 1
+        return self.terms.popleft()
+
+    def select(self) -> int:
+        """
+        The `select` function picks the level to dequeue from: the highest non-empty level, or with
+        `weights`, the non-empty level picked by smooth weighted round-robin, so that each level gets a
+        share of dequeues proportional to its weight while it has items.
+        """
+        if not self.weights:
+            for level, items in enumerate(self._queue):
+                if items:
+                    return level
+            return None
+
+        best, total = None, 0
+        for level, items in enumerate(self._queue):
+            if items:
+                weight = self.weights[level]
+                self.credits[level] += weight
+                total += weight
+                if best is None or self.credits[level] > self.credits[best]:
+                    best = level
+        if best is not None:
+            self.credits[best] -= total
+        return best
+
+    def _get(self):
+        self.size -= 1
+        level = self.select()
+        if level is None:
+            return self.terms.popleft()
+        enqueued, item = self._queue[level].popleft()
+        wait = time.monotonic() - enqueued
+        self.dequeued[level] += 1
+        self.waited[level] += wait
+        if wait > self.longest[level]:
+            self.longest[level] = wait
+        return item
+
+
+class PriorityStream(Stream):
+    """
+    A stream serving items by priority level instead of in arrival order.
+
+    .. code-block:: python
+
+      @app.task(priority=lambda job: 0 if job.user_triggered else 1, levels=2)
+      async def refresh(input: aiopypes.Stream):
+          async for job in input:
+              yield await run(job)
+
+    `priority` maps each item to a level, 0 being the most urgent (out of range levels are clipped).
+    By default a lower level is only served when all higher levels are empty (strict priority); with
+    `weights`, every non-empty level gets a share of dequeues proportional to its weight, so bulk items
+    still progress under sustained urgent traffic. Items keep FIFO order within a level, and
+    `Signal.TERM` is served after every level is empty.
+    """
+
+    def __init__(self,
+                 priority: Callable,
+                 levels: int = 3,
+                 weights: list = None,
+                 max_items: int = None,
+                 policy: str = "block",
+                 max_age: float = None):
+        """
+        The `__init__` function configures the levels.
+
+        Args:
+          priority (Callable): Maps an item to its level.
+          levels (int): The number of levels. Defaults to 3
+          weights (list): The dequeue weight of each level, for weighted rather than strict priority.
+        Defaults to None
+          max_items (int): See `Stream`. The `"drop_oldest"` policy drops the oldest item of the least
+        urgent level. Defaults to None
+          policy (str): See `Stream`. Defaults to "block"
+          max_age (float): See `Stream`. Defaults to None
+        """
+        super().__init__(max_items, policy, max_age)
+
+        if levels < 1:
+            raise ValueError("a priority stream needs at least one level")
+        if weights is not None and len(weights) != levels:
+            raise ValueError("a priority stream needs one weight per level")
+
+        self.priority = priority
+        self.levels = levels
+        self.weights = weights
+        self.queue = LevelQueue(priority, levels, weights)
+
+    def copy(self):
+        """
+        The `copy` function returns a new, empty stream with the same levels.
+
+        Returns:
+          A new `PriorityStream` object.
+        """
+        return self.__class__(self.priority, self.levels, self.weights, self.max_items, self.policy,
+                              self.max_age)
+
+    def evict(self) -> object:
+        return self.queue.evict()
+
+    def metrics(self) -> dict:
+        """
+        The `metrics` function reports, per level, how many items are waiting and how long dequeued items
+        waited, along with the items the stream dropped.
+
+        Returns:
+          A dictionary of lists indexed by level: the items waiting (`priority_qsize`), dequeued
+        (`priority_dequeued`), and their average and longest wait in seconds (`priority_wait_avg`,
+        `priority_wait_max`).
+        """
+        queue = self.queue
+        return {
+            **super().metrics(),
+            "priority_qsize": [len(items) for items in queue._queue],
+            "priority_dequeued": list(queue.dequeued),
+            "priority_wait_avg": [waited / dequeued if dequeued else 0.0
+                                  for waited, dequeued in zip(queue.waited, queue.dequeued)],
+            "priority_wait_max": list(queue.longest),
+        }
+
+
+class FairQueue(asyncio.Queue):
+    """
+    An `asyncio.Queue` holding items in one FIFO deque per flow, served by deficit round-robin, used by
+    `FairStream`. `Signal.TERM` is held apart and only returned once every flow is empty.
+    """
+
+    def __init__(self, key: Callable = None, weights: dict = None, maxsize: int = 0):
+        self.key = key
+        self.weights = weights
+        super().__init__(maxsize)
+
+    def _init(self, maxsize):
+        self.flows = {}
+        self.active = deque()
+        self.terms = deque()
+        self.size = 0
+
+    def qsize(self):
+        return self.size
+
+    def empty(self):
+        return not self.size
+
+    def full(self):
+        return 0 < self.maxsize <= self.size
+
+    def label(self, flow: object) -> object:
+        """
+        The `label` function returns the name of a flow: its key, or the name of its upstream task.
+        """
+        if self.key or flow is None:
+            return flow
+        return flow.name
+
+    def weight(self, flow: object) -> float:
+        """
+        The `weight` function returns the share of a flow. Tasks fused into a chain are also looked up by
+        the name of the last task of the chain.
+        """
+        if not self.weights:
+            return 1
+        label = self.label(flow)
+        if label in self.weights:
+            return self.weights[label]
+        if isinstance(label, str) and "+" in label:
+            return self.weights.get(label.rsplit("+", 1)[-1], 1)
+        return 1
+
+    def _put(self, item):
+        self.size += 1
+        if item == Signal.TERM:
+            self.terms.append(item)
+            return
+        value = item.value if type(item) is Deadline else item
+        flow = self.key(value) if self.key else sender.get()
+        state = self.flows.get(flow)
+        if state is None:
+            state = self.flows[flow] = [deque(), self.weight(flow), 0.0]
+            self.active.append(flow)
+        state[0].append(item)
+
+    def _get(self):
+        self.size -= 1
+        active = self.active
+        if not active:
+            return self.terms.popleft()
+        while True:
+            state = self.flows[active[0]]
+            if state[2] >= 1:
+                break
+            state[2] += state[1]
+            if state[2] >= 1:
+                break
+            active.rotate(-1)  # a flow with a fractional weight waits for another round
+        items = state[0]
+        item = items.popleft()
+        state[2] -= 1
+        if not items:
+            del self.flows[active.popleft()]
+        elif state[2] < 1:
+            active.rotate(-1)
+        return item
+
+    def evict(self) -> object:
+        """
+        The `evict` function removes the oldest item of the longest flow, or a `Signal.TERM` when only
+        signals are left.
+        """
+        self.size -= 1
+        if not self.active:
+            return self.terms.popleft()
+        flow = max(self.active, key=lambda f: len(self.flows[f][0]))
+        items = self.flows[flow][0]
+        item = items.popleft()
+        if not items:
+            del self.flows[flow]
+            self.active.remove(flow)
+        return item
+
+
+class FairStream(Stream):
+    """
+    A stream sharing its task between the flows feeding it, instead of serving items in arrival order.
+
+    .. code-block:: python
+
+      @app.task(fair=True, weights={"route_a": 1, "route_b": 3})
+      async def task1(input: aiopypes.Stream):
+          async for router, sleep in input:
+              yield router, await work(sleep)
+
+    A flow is the upstream task an item comes from or, with `key`, the key of the item (e.g. a
+    tenant or a route). Each flow has its own FIFO sub-queue, and the flows with items are served by
+    deficit round-robin: in each round, a flow is served as many items as its weight (1 unless set
+    in `weights`, fractional weights carrying over to the next rounds). A flow flooding the stream
+    only lengthens its own sub-queue, so under saturation every flow keeps its share, and dequeuing
+    costs O(1) however many flows there are. `Signal.TERM` is served after every flow is empty.
+    """
+
+    def __init__(self,
+                 key: Callable = None,
+                 weights: dict = None,
+                 max_items: int = None,
+                 policy: str = "block",
+                 max_age: float = None):
+        """
+        The `__init__` function configures the flows.
+
+        Args:
+          key (Callable): Maps an item to its flow. Defaults to None, one flow per upstream task.
+          weights (dict): The share of each flow, by key or upstream task name. Defaults to None, equal
+        shares.
+          max_items (int): See `Stream`. The `"drop_oldest"` policy drops the oldest item of the longest
+        flow. Defaults to None
+          policy (str): See `Stream`. Defaults to "block"
+          max_age (float): See `Stream`. Defaults to None
+        """
+        super().__init__(max_items, policy, max_age)
+
+        if weights and any(weight <= 0 for weight in weights.values()):
+            raise ValueError("fair stream weights must be positive")
+
+        self.key = key
+        self.weights = weights
+        self.queue = FairQueue(key, weights)
+
+    def copy(self):
+        """
+        The `copy` function returns a new, empty stream with the same flows and weights.
+
+        Returns:
+          A new `FairStream` object.
+        """
+        return self.__class__(self.key, self.weights, self.max_items, self.policy, self.max_age)
+
+    def evict(self) -> object:
+        return self.queue.evict()
+
+    def metrics(self) -> dict:
+        """
+        The `metrics` function reports how many items each flow has waiting, along with the items the
+        stream dropped.
+
+        Returns:
+          A dictionary with the number of items waiting per flow name (`fair_qsize`).
+        """
+        queue = self.queue
+        return {
+            **super().metrics(),
+            "fair_qsize": {queue.label(flow): len(state[0]) for flow, state in queue.flows.items()},
+        }
+
+
+class StealableQueue(asyncio.Queue):
+    """
+    An `asyncio.Queue` whose newest items can be taken by another queue's consumers, used by
+    `StealingStream`. Each item put wakes one runner waiting for work in `idle`: one of this queue's
+    own, or else one of a sibling queue's, which can then steal the item.
+    """
+
+    def _init(self, maxsize):
+        super()._init(maxsize)
+        self.idle = deque()
+        self.siblings = []
+
+    def _put(self, item):
+        self._queue.append(item)
+        self.wake()
+
+    def wake(self) -> None:
+        """
+        The `wake` function wakes one runner waiting for work on this queue or, if there is none, on
+        one of its siblings.
+        """
+        for queue in (self, *self.siblings):
+            idle = queue.idle
+            while idle:
+                waiter = idle.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+
+    def steal(self, size: int) -> list:
+        """
+        The `steal` function removes up to `size` items from the tail of the queue, never taking a
+        `Signal.TERM`.
+
+        Args:
+          size (int): The most items to take.
+
+        Returns:
+          The list of items, oldest first.
+        """
+        queue = self._queue
+        items = []
+        while queue and len(items) < size and queue[-1] != Signal.TERM:
+            items.append(queue.pop())
+        items.reverse()
+        return items
+
+
+class StealingStream(Stream):
+    """
+    A stream whose idle runners take work from the streams of sibling tasks.
+
+    .. code-block:: python
+
+      @app.task(scale=1, steal=True)
+      async def task1(input: aiopypes.Stream):
+          ...
+
+      @app.task(scale=50, steal=True)
+      async def task2(input: aiopypes.Stream):
+          ...
+
+      pipeline = source.map(task1, task2)
+
+    Siblings are the tasks with a stealing stream fed by the same upstream tasks, on the same thread
+    (see `Pipeline.siblings`). When a runner finds its own stream empty, it moves half of the backlog of
+    the sibling with the longest backlog (at most `batch_size` items), taken from the tail, onto its
+    own stream. While there is nothing to steal, it waits until an item is put on its own stream, or on
+    the stream of a sibling with no idle runner of its own; each item wakes at most one runner.
+    Ordered tasks and tasks fed through routes are never grouped, so items keep the task their order
+    or key gives them. Siblings must be able to process each other's items.
+    """
+
+    def __init__(self,
+                 batch_size: int = 128,
+                 max_items: int = None,
+                 policy: str = "block",
+                 max_age: float = None):
+        """
+        The `__init__` function configures stealing. The stream has no siblings until the pipeline
+        groups them.
+
+        Args:
+          batch_size (int): The most items taken from a sibling at once. Defaults to 128
+          max_items (int): See `Stream`. Defaults to None
+          policy (str): See `Stream`. Defaults to "block"
+          max_age (float): See `Stream`. Defaults to None
+        """
+        super().__init__(max_items, policy, max_age)
+
+        self.batch_size = batch_size
+        self.queue = StealableQueue()
+        self.siblings = []
+        self.steals = 0
+        self.stolen = 0
+        self.given = 0
+
+    def copy(self):
+        """
+        The `copy` function returns a new, empty stream with the same configuration and no siblings.
+
+        Returns:
+          A new `StealingStream` object.
+        """
+        return self.__class__(self.batch_size, self.max_items, self.policy, self.max_age)
+
+    def group(self, siblings: list) -> None:
+        """
+        The `group` function sets the streams this stream steals from, and whose idle runners its items
+        may wake.
+
+        Args:
+          siblings (list): The `StealingStream` inputs of the sibling tasks.
+        """
+        self.siblings = siblings
+        self.queue.siblings = [sibling.queue for sibling in siblings]
+
+    def steal(self) -> int:
+        """
+        The `steal` function moves half of the backlog of the busiest sibling onto this stream.
+
+        Returns:
+          The number of items moved.
+        """
+        victim = max(self.siblings, key=lambda sibling: sibling.queue.qsize())
+        backlog = victim.queue.qsize()
+        if not backlog:
+            return 0
+        items = victim.queue.steal(min(max(backlog // 2, 1), self.batch_size))
+        if victim.room is not None and not victim.room.is_set():
+            victim.room.set()
+        for item in items:
+            self.queue.put_nowait(item)
+        if items:
+            self.steals += 1
+            self.stolen += len(items)
+            victim.given += len(items)
+        return len(items)
+
+    async def dequeue(self) -> object:
+        """
+        The `dequeue` function returns the next item, stealing from siblings while this stream is
+        empty.
+
+        Returns:
+          The next item in the stream.
+        """
+        if not self.siblings:
+            return await super().dequeue()
+
+        queue = self.queue
+        loop = asyncio.get_running_loop()
+        while True:
+            if queue.empty() and not self.steal():
+                waiter = loop.create_future()
+                queue.idle.append(waiter)
+                try:
+                    await waiter
+                except asyncio.CancelledError:
+                    if waiter.done() and not waiter.cancelled():
+                        queue.wake()  # pass the wakeup on to another runner
+                    raise
+                continue
+            o = self.receive(queue.get_nowait())
+            if o is not Signal.EXPIRED:
+                return o
+
+    def metrics(self) -> dict:
+        """
+        The `metrics` function reports the work moved between this stream and its siblings, along with
+        the items the stream dropped.
+
+        Returns:
+          A dictionary with the number of steals (`steals`), items stolen from siblings (`stolen`) and
+        items siblings stole from this stream (`given`).
+        """
+        return {**super().metrics(), "steals": self.steals, "stolen": self.stolen, "given": self.given}
+
+
+class SpillableStream(Stream):
+    """
+    A `Stream` that keeps a bounded head (ready to be consumed) and a bounded tail (most recently
+    enqueued) in memory, and spills everything in between to append-only segment files on disk.
+
+    .. code-block:: python
+
+      @app.task(stream=SpillableStream(max_items=10000))
+      async def task(input: aiopypes.Stream):
+        async for i in input:
+          yield i
+
+    Items are framed with a 4-byte length prefix and written with the `serializer` (any object
+    exposing `dumps` and `loads`, such as `pickle` or `marshal`). Segments are read back with a single
+    sequential read and deleted once loaded, so memory stays close to `max_items` plus two segments
+    regardless of how large the backlog grows. Segment files are written and read on worker threads,
+    so a backlog spilling to a slow disk does not stall the other tasks on the event loop.
+    """
+
+    header = struct.Struct("<I")
+
+    def __init__(self,
+                 max_items: int = 10000,
+                 max_bytes: int = None,
+                 segment_bytes: int = 4 * 1024 * 1024,
+                 directory: str = None,
+                 serializer=pickle):
+        """
+        The `__init__` function sets the thresholds above which incoming items are spilled to disk.
+
+        Args:
+          max_items (int): The number of items kept in memory at the head of the stream before spilling
+        begins. Defaults to 10000
+          max_bytes (int): An optional bound on the (shallow) size in bytes of the items kept at the head
+        of the stream. Defaults to None
+          segment_bytes (int): The size of the in-memory tail buffer that is flushed to a new segment
+        file once full. Defaults to 4 MiB
+          directory (str): The directory in which a temporary spill directory is created. Defaults to the
+        system temporary directory.
+          serializer: The object used to `dumps`/`loads` spilled items. Defaults to `pickle`
+        """
+        super().__init__()
+
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.directory = directory
+        self.serializer = serializer
+
+        self.path = None
+        self.segments = deque()
+        self.loading = None
+        self.counter = 0
+        self.spilled = 0
+        self.tail = bytearray()
+        self.tail_count = 0
+        self.head_bytes = 0
+
+    def copy(self):
+        """
+        The `copy` function returns a new, empty stream with the same thresholds and serializer.
+
+        Returns:
+          A new `SpillableStream` object.
+        """
+        return self.__class__(
+            max_items=self.max_items,
+            max_bytes=self.max_bytes,
+            segment_bytes=self.segment_bytes,
+            directory=self.directory,
+            serializer=self.serializer
+        )
+
+    def qsize(self) -> int:
+        """
+        The `qsize` function returns the number of items waiting in memory and on disk.
+
+        Returns:
+          The number of buffered items.
+        """
+        return self.queue.qsize() + self.spilled + self.tail_count
+
+    def full(self) -> bool:
+        """
+        The `full` function checks whether the in-memory head has crossed the depth or memory threshold.
+
+        Returns:
+          `True` if new items should be spilled, `False` otherwise.
+        """
+        if self.queue.qsize() >= self.max_items:
+            return True
+        if self.max_bytes is not None and self.head_bytes >= self.max_bytes:
+            return True
+        return False
+
+    async def close(self) -> None:
+        """
+        The `close` function removes the spill directory and any segments left in it, once the
+        segments being written or read are done.
+        """
+        pending = [written for filename, count, written in self.segments]
+        if self.loading is not None:
+            pending.append(self.loading)
+        await asyncio.gather(*pending, return_exceptions=True)
+        if self.path is not None:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
+        self.segments.clear()
+        self.spilled = 0
+        self.tail = bytearray()
+        self.tail_count = 0
+
+    def push(self, val: object) -> None:
+        """
+        The `push` function places an item at the head of the stream, accounting for its size.
+
+        Args:
+          val (object): The item to place in memory.
+        """
+        if self.max_bytes is not None:
+            self.head_bytes += sys.getsizeof(val)
+        self.queue.put_nowait(val)
+
+    def spill(self, val: object) -> asyncio.Future:
+        """
+        The `spill` function serializes an item into the tail buffer, flushing it to a segment file once
+        the buffer exceeds `segment_bytes`.
+
+        Args:
+          val (object): The item to spill.
+
+        Returns:
+          The write of the segment when the tail buffer was flushed, None otherwise.
+        """
+        data = self.serializer.dumps(val)
+        self.tail += self.header.pack(len(data))
+        self.tail += data
+        self.tail_count += 1
+        if len(self.tail) >= self.segment_bytes:
+            return self.flush()
+
+    @staticmethod
+    def write(filename: str, data: bytes) -> None:
+        with open(filename, "wb") as f:
+            f.write(data)
+
+    @staticmethod
+    def read(filename: str) -> bytes:
+        with open(filename, "rb") as f:
+            data = f.read()
+        os.remove(filename)
+        return data
+
+    def flush(self) -> asyncio.Future:
+        """
+        The `flush` function starts writing the tail buffer to a new append-only segment file, on a
+        worker thread. The segment counts as spilled right away, and is only read back once written.
+
+        Returns:
+          The write of the segment.
+        """
+        if self.path is None:
+            self.path = tempfile.mkdtemp(prefix="aiopypes-", dir=self.directory)
+        filename = os.path.join(self.path, f"{self.counter:012d}.seg")
+        written = asyncio.get_running_loop().run_in_executor(None, self.write, filename, bytes(self.tail))
+        self.segments.append((filename, self.tail_count, written))
+        self.spilled += self.tail_count
+        self.counter += 1
+        self.tail = bytearray()
+        self.tail_count = 0
+        return written
+
+    def refill(self) -> None:
+        """
+        The `refill` function moves the oldest spilled segment (or, once the disk is empty, the tail
+        buffer) back into memory. A segment is read on a worker thread by the `loading` task, one at a
+        time so that segments are loaded in order; the tail buffer is moved at once.
+        """
+        if self.loading is not None:
+            return
+        if self.segments:
+            self.loading = asyncio.ensure_future(self.load())
+        elif self.tail_count:
+            data = bytes(self.tail)
+            self.tail = bytearray()
+            self.tail_count = 0
+            self.unpack(data)
+
+    async def load(self) -> None:
+        """
+        The `load` function reads the oldest spilled segment back into memory.
+        """
+        try:
+            filename, count, written = self.segments[0]
+            await written
+            data = await asyncio.to_thread(self.read, filename)
+            self.segments.popleft()
+            self.spilled -= count
+            self.unpack(data)
+        finally:
+            self.loading = None
+
+    def unpack(self, data: bytes) -> None:
+        """
+        The `unpack` function places the items framed in `data` at the head of the stream.
+
+        Args:
+          data (bytes): The contents of a segment or of the tail buffer.
+        """
+        view = memoryview(data)
+        offset = 0
+        size = self.header.size
+        loads = self.serializer.loads
+        while offset < len(view):
+            length, = self.header.unpack_from(view, offset)
+            offset += size
+            self.push(loads(view[offset:offset + length]))
+            offset += length
+
+    async def enqueue(self, val: object) -> None:
+        """
+        The `enqueue` function keeps the item in memory while nothing has been spilled and the head is
+        below its thresholds, and spills it otherwise so that ordering is preserved.
+
+        Args:
+          val (object): The item to enqueue.
+        """
+        if self.max_age is not None:
+            val = self.stamp(val)
+        if self.arrival is not None:
+            self.arrive()
+        if self.spilled or self.tail_count or self.full():
+            written = self.spill(val)
+            if self.queue.empty():
+                self.refill()
+            if written is not None:
+                await written
+        else:
+            self.push(val)
+
+    async def dequeue(self) -> object:
+        """
+        The `dequeue` function returns the next item, refilling the head from disk when it runs empty.
+
+        Returns:
+          The next item in the stream.
+        """
+        while self.queue.empty() and (self.spilled or self.tail_count):
+            self.refill()
+            if self.loading is not None:
+                await asyncio.shield(self.loading)
+        return await super().dequeue()
+
+    def receive(self, o: object) -> object:
+        """
+        The `receive` function accounts for an entry leaving the head, refilling the head from disk when
+        it runs empty.
+
+        Args:
+          o (object): The entry.
+
+        Returns:
+          The item, `Signal.TERM`, or `Signal.EXPIRED` when the item is dropped.
+        """
+        if self.max_bytes is not None:
+            self.head_bytes -= sys.getsizeof(o)
+        if self.queue.empty():
+            self.refill()
+        return super().receive(o)
+
+    def requeue(self, runner: asyncio.Task) -> list:
+        """
+        The `requeue` function puts the entries a runner had in flight back on the in-memory head of the
+        stream, behind the items already there.
+
+        Args:
+          runner (asyncio.Task): The runner whose entries should be re-enqueued.
+
+        Returns:
+          The list of re-enqueued entries.
+        """
+        entries = super().requeue(runner)
+        if self.max_bytes is not None:
+            self.head_bytes += sum(sys.getsizeof(entry) for entry in entries)
+        return entries
+
+
+class DurableStream(Stream):
+    """
+    A `Stream` backed by a `WriteAheadLog`, giving at-least-once delivery across restarts and crashes.
+
+    .. code-block:: python
+
+      @app.task(stream=DurableStream("/var/lib/app/task"))
+      async def task(input: aiopypes.Stream):
+        async for i in input:
+          yield i
+
+    Every enqueued item is appended to the log (and waits for its group commit) before it becomes
+    visible to the runners. An item is acknowledged once the runner that dequeued it yields or
+    finishes; items that were never acknowledged are replayed, in order, when the stream is opened
+    again.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 serializer=pickle,
+                 **kwargs):
+        """
+        The `__init__` function sets up the log backing the stream.
+
+        Args:
+          directory (str): The directory of the log. Each copy of the stream (one per task copy in a
+        pipeline) logs to its own numbered sub-directory, so the same pipeline maps back to the same
+        logs on restart.
+          serializer: The object used to `dumps`/`loads` items. Defaults to `pickle`
+          **kwargs: Options passed to `WriteAheadLog` (`segment_bytes`, `commit_interval`, `fsync`, ...).
+        """
+        super().__init__()
+
+        self.directory = directory
+        self.serializer = serializer
+        self.options = kwargs
+        self.log = WriteAheadLog(directory, **kwargs)
+        self.copies = 0
+        self.opening = None
+
+    def copy(self):
+        """
+        The `copy` function returns a new, empty stream logging to the next numbered sub-directory.
+
+        Returns:
+          A new `DurableStream` object.
+        """
+        directory = os.path.join(self.directory, str(self.copies))
+        self.copies += 1
+        return self.__class__(directory, serializer=self.serializer, **self.options)
+
+    async def open(self) -> None:
+        """
+        The `open` function opens the log (once) and re-enqueues every unacknowledged item from a
+        previous run.
+        """
+        if self.opening is None:
+            self.opening = asyncio.ensure_future(self.log.open())
+            for seq, payload in await self.opening:
+                self.queue.put_nowait((seq, self.loads(payload)))
+        else:
+            await self.opening
+
+    def dumps(self, val: object) -> bytes:
+        """
+        The `dumps` function serializes an item for the log. A deadline is logged as a `time.time()`
+        timestamp, since the `time.monotonic()` clock it is kept in restarts along with the machine.
+
+        Args:
+          val (object): The item, possibly a `Deadline`.
+
+        Returns:
+          The serialized item.
+        """
+        if type(val) is Deadline:
+            val = Deadline(val.value, val.expires - time.monotonic() + time.time())
+        return self.serializer.dumps(val)
+
+    def loads(self, payload: bytes) -> object:
+        """
+        The `loads` function deserializes an item replayed from the log, moving its deadline back onto
+        the `time.monotonic()` clock.
+
+        Args:
+          payload (bytes): The serialized item.
+
+        Returns:
+          The item, possibly a `Deadline`.
+        """
+        val = self.serializer.loads(payload)
+        if type(val) is Deadline:
+            val = Deadline(val.value, val.expires - time.time() + time.monotonic())
+        return val
+
+    async def close(self) -> None:
+        """
+        The `close` function commits outstanding acknowledgements and closes the log.
+        """
+        await self.log.close()
+
+    def commit(self, entries: list) -> None:
+        """
+        The `commit` function acknowledges the given entries in the log.
+
+        Args:
+          entries (list): The acknowledged `(seq, item)` entries.
+        """
+        self.log.ack([seq for seq, _ in entries])
+
+    async def enqueue(self, val: object) -> None:
+        """
+        The `enqueue` function appends the item to the log and makes it available once committed.
+
+        Args:
+          val (object): The item to enqueue.
+        """
+        if val == Signal.TERM:
+            return await self.queue.put(val)
+        if self.max_age is not None:
+            val = self.stamp(val)
+        if not self.log.opened:
+            await self.open()
+        seq = await self.log.append(self.dumps(val))
+        await self.queue.put((seq, val))
+        if self.arrival is not None:
+            self.arrive()
+
+    def receive(self, o: object) -> object:
+        """
+        The `receive` function returns the item of a `(seq, item)` entry and records the entry as checked
+        out by the current runner until it is acknowledged. Items dropped past their deadline are
+        acknowledged right away, so they are not replayed.
+
+        Args:
+          o (object): The entry.
+
+        Returns:
+          The item, `Signal.TERM`, or `Signal.EXPIRED` when the item is dropped.
+        """
+        if o == Signal.TERM:
+            return o
+        item = self.admit(o[1])
+        if item is Signal.EXPIRED:
+            self.log.ack([o[0]])
+        else:
+            self.checkout(o)
+        return item
+
+    def expiry(self, entry: object) -> float:
+        return super().expiry(entry[1])
\ No newline at end of file
@@ -8,18 +8,64 @@
     The design describes how data processing is coordinated within a Task object.
 """
 import asyncio
+import inspect
+import time
 
+from contextlib import AsyncExitStack
+from functools import partial
 from typing import Callable
 
-from .stream import Stream
+from .stream import Stream, FairStream, FusedStream, PriorityStream, StealingStream, sender
 from .pipeline import Pipeline
 from .balance import AbstractLoadBalancer, DefaultLoadBalancer
+from .cache import Cache
+from .deadline import Deadline, expiry
+from .lag import Clock, timed
+from .order import ReorderBuffer
+from .resource import Resource
 from .scale import AbstractTaskScaler, DefaultTaskScaler, StaticTaskScaler
 from .signal import Signal
 
 
+async def transform(steps: list, item: object) -> list:
+    """
+    The `transform` function passes one item through a list of operator steps.
+
+    Args:
+      steps (list): `(operator, function, asynchronous)` tuples, see `Task.step`.
+      item (object): The item.
+
+    Returns:
+      The list of values sent downstream for the item.
+    """
+    values = [item]
+    for operator, function, asynchronous in steps:
+        results = []
+        for value in values:
+            result = function(value)
+            if asynchronous:
+                result = await result
+            if operator == "map":
+                results.append(result)
+            elif operator == "filter":
+                if result:
+                    results.append(value)
+            else:
+                results.extend(result)
+        values = results
+    return values
+
+
 class Task:
 
+    __slots__ = (
+        "name", "function", "lock", "scaler", "balancer", "interval", "input", "ordered",
+        "reorder_window", "reorder", "fuse", "operator", "batch_size", "cache", "resources",
+        "shared", "bound", "stack", "thread", "dispatch", "asynchronous", "chain", "output",
+        "runners", "locks", "routes", "template", "draining", "concurrency", "limits", "flights",
+        "monitor", "clock", "woken", "colds",
+    )
+
     def __init__(self,
                  name: str,
                  function: Callable,
@@ -27,7 +73,25 @@ class Task:
                  scale: int = None,
                  scaler: AbstractTaskScaler = None,
                  balancer: AbstractLoadBalancer = None,
-                 interval: float = None):
+                 interval: float = None,
+                 stream: Stream = None,
+                 ordered: bool = False,
+                 reorder_window: int = 100,
+                 fuse: bool = True,
+                 operator: str = None,
+                 batch_size: int = 128,
+                 cache: Cache = None,
+                 resources: dict = None,
+                 thread: str = None,
+                 priority: Callable = None,
+                 levels: int = 3,
+                 weights: list = None,
+                 fair: bool = False,
+                 steal: bool = False,
+                 max_age: float = None,
+                 max_items: int = None,
+                 policy: str = "block",
+                 concurrency: int = 1):
         """_summary_
 
         Args:
@@ -38,7 +102,64 @@ class Task:
             scaler (AbstractTaskScaler, optional): _description_. Defaults to None.
             balancer (AbstractLoadBalancer, optional): _description_. Defaults to None.
             interval (float, optional): _description_. Defaults to None.
+            stream (Stream, optional): The input stream to use in place of the default in-memory
+                `Stream` (e.g. a `SpillableStream`). Each copy of the task gets its own empty
+                stream with the same configuration. Defaults to None.
+            ordered (bool, optional): Emits results in input order, even with several runners.
+                Each result is matched with the last item its runner dequeued before yielding, so
+                ordered task functions should yield at most once per item. Defaults to False.
+            reorder_window (int, optional): The maximum number of completed results an ordered
+                task holds back while waiting on a slower item. Defaults to 100.
+            fuse (bool, optional): Allows the pipeline to run this task in the same runner as its
+                upstream (or downstream) task when they form a simple linear chain. Defaults to True.
+            operator (str, optional): Treats `function` as a plain (sync or async) per-item
+                callable instead of an async generator over the input stream: `"map"` sends its
+                return value, `"filter"` sends the item when it returns a truthy value and
+                `"flat_map"` sends every value of the iterable it returns. Defaults to None.
+            batch_size (int, optional): The most items an operator task drains from its input per
+                loop iteration. Defaults to 128.
+            cache (Cache, optional): Caches the results of each item under a key of the item, and
+                coalesces concurrent computations of the same key. A dict is passed to `Cache` as
+                keyword arguments. Copies of the task share the cache. Defaults to None.
+            resources (dict, optional): Resources passed to the task function as keyword arguments,
+                by name. Values are `Resource` objects, or factories returning an async context
+                manager, which are treated as task-scoped resources. Tasks with resources are not
+                fused into upstream tasks. Defaults to None.
+            thread (str, optional): Runs the task on a separate thread and event loop, shared with
+                the other tasks of the pipeline given the same thread name. Defaults to None, the
+                loop the pipeline is run on.
+            priority (Callable, optional): Serves the input by priority level instead of in arrival
+                order, using a `PriorityStream` with `levels` levels and `weights` (see
+                `PriorityStream`). Ignored when `stream` is given. Defaults to None.
+            levels (int, optional): The number of priority levels. Defaults to 3.
+            weights (list, optional): The dequeue weight of each level. Defaults to None, strict
+                priority. With `fair`, a dict of the share of each flow instead (see `FairStream`).
+            fair (bool, optional): Shares the task between the flows feeding it with a `FairStream`
+                input: `True` for one flow per upstream task, or a callable mapping an item to its
+                flow. Ignored when `stream` or `priority` is given. Defaults to False.
+            steal (bool, optional): Lets idle runners take work from the inputs of sibling tasks
+                (tasks also declared with `steal=True` and fed by the same upstream tasks), using a
+                `StealingStream`. Ignored when `stream`, `priority` or `fair` is given. Defaults to
+                False.
+            max_age (float, optional): Drops items that waited in the input, or have been in the
+                pipeline, longer than this many seconds, see `aiopypes.deadline`. Applies to
+                `stream` as well. Defaults to None.
+            max_items (int, optional): Bounds the input stream. Ignored when `stream` is given.
+                Defaults to None, unbounded.
+            policy (str, optional): What the bounded input does with items enqueued while it is
+                full: `"block"`, `"drop_oldest"`, `"drop_newest"` or `"drop_random"` (see
+                `Stream`). Defaults to "block".
+            concurrency (int, optional): The most items each runner of an operator task processes at
+                once, each in its own asyncio task, sending results in completion order. The scaler
+                then counts concurrency slots instead of runners (`scale` defaults to `concurrency`,
+                one full runner), and runners are added or removed as slots fill or empty. Defaults
+                to 1.
         """
+        if concurrency < 1:
+            raise ValueError("a task needs a concurrency of at least 1")
+        if concurrency > 1 and (not operator or cache or ordered or interval is not None):
+            raise ValueError("concurrency needs an operator task without cache or ordering")
+
         self.name = name
         self.function = function
         self.lock = lock
@@ -47,17 +168,61 @@ class Task:
         self.interval = interval
 
         if not self.scaler:
-            if not scale or scale <= 0:
+            if (not scale or scale <= 0) and concurrency > 1:
+                self.scaler = StaticTaskScaler(concurrency)
+            elif not scale or scale <= 0:
                 self.scaler = DefaultTaskScaler()
             else:
                 self.scaler = StaticTaskScaler(scale)
         if not balancer:
             self.balancer = DefaultLoadBalancer()
-        self.input = Stream()
+        if stream:
+            self.input = stream
+            if max_age is not None:
+                self.input.max_age = max_age
+        elif priority:
+            self.input = PriorityStream(priority, levels, weights, max_items, policy, max_age)
+        elif fair:
+            key = fair if callable(fair) else None
+            self.input = FairStream(key, weights, max_items, policy, max_age)
+        elif steal:
+            self.input = StealingStream(batch_size, max_items=max_items, policy=policy, max_age=max_age)
+        else:
+            self.input = Stream(max_items, policy, max_age)
+        self.ordered = ordered
+        self.reorder_window = reorder_window
+        self.reorder = None
+        if ordered:
+            self.reorder = ReorderBuffer(reorder_window)
+            self.input.sequenced()
+        self.fuse = fuse
+        self.operator = operator
+        self.batch_size = batch_size
+        self.cache = Cache(**cache) if isinstance(cache, dict) else cache
+        self.resources = {
+            name: resource if isinstance(resource, Resource) else Resource(resource)
+            for name, resource in (resources or {}).items()
+        }
+        self.shared = {}
+        self.bound = {}
+        self.stack = None
+        self.thread = thread
+        self.dispatch = None
+        self.asynchronous = asyncio.iscoroutinefunction(function)
+        self.chain = []
         self.output = []
         self.runners = []
         self.locks = []
         self.routes = []
+        self.template = None
+        self.draining = False
+        self.concurrency = concurrency
+        self.limits = {}
+        self.flights = {}
+        self.monitor = None
+        self.clock = None
+        self.woken = None
+        self.colds = [0, 0.0, 0.0]
 
     def run(self, **kwargs):
         """_summary_
@@ -65,23 +230,46 @@ class Task:
         Returns:
             _type_: _description_
         """
-        pipeline = Pipeline().extend(self)
+        pipeline = Pipeline(tasks=[self])
         return getattr(pipeline, "run")(**kwargs)
 
     def copy(self):
-        """_summary_
+        """Returns a new node of the pipeline graph running this task. The copy shares the
+        configuration of the task it was created from (function, cache, resources, ...), and only
+        gets its own input stream, scaler, balancer and reorder buffer when `instantiate` is called
+        as the pipeline starts, so that large graphs are cheap to build.
 
         Returns:
-            _type_: _description_
+            Task: The copy.
         """
-        return self.__class__(
-            name=self.name,
-            function=self.function,
-            lock=self.lock,
-            scaler=self.scaler.copy(),
-            balancer=self.balancer.copy(),
-            interval=self.interval
-        )
+        task = object.__new__(self.__class__)
+        for attr in ("name", "function", "lock", "interval", "ordered", "reorder_window", "fuse",
+                     "operator", "batch_size", "cache", "resources", "thread", "asynchronous", "concurrency"):
+            setattr(task, attr, getattr(self, attr))
+        task.template = self.template if self.template else self
+        task.scaler = task.balancer = task.input = task.reorder = None
+        task.shared, task.bound, task.stack, task.dispatch = {}, {}, None, None
+        task.chain, task.output, task.runners, task.locks, task.routes = [], [], [], [], []
+        task.draining = False
+        task.limits, task.flights = {}, {}
+        task.monitor = task.clock = task.woken = None
+        task.colds = [0, 0.0, 0.0]
+        return task
+
+    def instantiate(self):
+        """Creates the input stream, scaler, balancer and reorder buffer of a copy from its template.
+        Does nothing for tasks that already have them.
+        """
+        template = self.template
+        if template is None or self.input is not None:
+            return
+        self.input = template.input.copy()
+        self.input.max_age = template.input.max_age
+        self.scaler = template.scaler.copy()
+        self.balancer = template.balancer.copy()
+        if self.ordered:
+            self.reorder = template.reorder.copy()
+            self.input.sequenced()
 
     def map(self, *args, **kwargs):
         """_summary_
@@ -101,13 +289,32 @@ class Task:
         pipeline = Pipeline(tasks=[self])
         return getattr(pipeline, "reduce")(*args, **kwargs)
 
+    def window(self, *args, **kwargs):
+        """Starts a pipeline from this task followed by a windowed aggregation stage (see
+        `Pipeline.window`).
+
+        Returns:
+            Pipeline: The new pipeline.
+        """
+        pipeline = Pipeline(tasks=[self])
+        return getattr(pipeline, "window")(*args, **kwargs)
+
+    def dedup(self, *args, **kwargs):
+        """Starts a pipeline from this task followed by a dedup stage (see `Pipeline.dedup`).
+
+        Returns:
+            Pipeline: The new pipeline.
+        """
+        pipeline = Pipeline(tasks=[self])
+        return getattr(pipeline, "dedup")(*args, **kwargs)
+
     def get_timer_iter(self, *args, **kwargs):
         """_summary_
         """
         async def timer():
             while True:
                 await asyncio.sleep(self.interval)
-                yield await self.function(*args, **kwargs)
+                yield await self.function(*args, **kwargs, **self.bindings())
         
         return timer()
 
@@ -117,7 +324,67 @@ class Task:
         Returns:
             _type_: _description_
         """
-        return self.function(self.input, *args, **kwargs)
+        return self.generate(self.input, *args, **kwargs)
+
+    def generate(self, stream: Stream, *args, **kwargs):
+        """Returns the async generator running the task function over `stream`, wrapping operator
+        functions in a generator that calls them once per item.
+
+        Args:
+            stream (Stream): The stream to read items from.
+
+        Returns:
+            The async generator of results.
+        """
+        if self.cache:
+            return self.cached(stream)
+        if not self.operator:
+            return self.function(stream, *args, **kwargs, **self.bindings())
+        return self.operate(stream, [self.step()])
+
+    def step(self) -> tuple:
+        """Returns the `(operator, function, asynchronous)` step applied by `transform`."""
+        function = self.function
+        if self.resources:
+            function = partial(function, **self.bindings())
+        return self.operator, function, self.asynchronous
+
+    async def operate(self, source, steps: list):
+        """Async generator passing each item of `source` through a list of operator steps.
+
+        Args:
+            source: The async iterator to read items from.
+            steps (list): The steps of consecutive operator tasks.
+        """
+        async for item in source:
+            for value in await transform(steps, item):
+                yield value
+
+    async def apply(self, item: object) -> list:
+        """Runs the task function on a single item.
+
+        Args:
+            item (object): The item.
+
+        Returns:
+            list: The results the task produces for the item.
+        """
+        if self.operator:
+            return await transform([self.step()], item)
+        stream = Stream()
+        stream.queue.put_nowait(item)
+        stream.queue.put_nowait(Signal.TERM)
+        return [result async for result in self.function(stream, **self.bindings())]
+
+    async def cached(self, stream: Stream):
+        """Async generator sending the results of each item of `stream` through the task cache.
+
+        Args:
+            stream (Stream): The stream to read items from.
+        """
+        async for item in stream:
+            for result in await self.cache.get(item, self.apply):
+                yield result
 
     def iterator(self):
         """_summary_
@@ -126,10 +393,69 @@ class Task:
             _type_: _description_
         """
         if self.interval != None:
-            return self.get_timer_iter()
+            iterator = self.get_timer_iter()
 
         else:
-            return self.get_function_iter()
+            iterator = self.get_function_iter()
+
+        steps = []
+        for task in self.chain:
+            if task.operator and not task.cache:
+                steps.append(task.step())
+                continue
+            if steps:
+                iterator, steps = self.operate(iterator, steps), []
+            iterator = task.generate(FusedStream(iterator))
+        if steps:
+            iterator = self.operate(iterator, steps)
+
+        return iterator
+
+    def fusable(self, task) -> bool:
+        """Checks whether `task` can run inside this task's runners, receiving this task's results
+        directly instead of through its input stream. Both tasks must allow fusion, this task must
+        send only to `task` (no routes, default balancer), `task` must use a plain, unbounded `Stream`
+        without `max_age` and have no resources, both must run on the same thread, neither may be
+        ordered, and both must be statically scaled to the same number of runners with the same
+        concurrency. The pipeline additionally checks that `task` has no other upstream task.
+
+        Args:
+            task (Task): The downstream task.
+
+        Returns:
+            bool: Whether the two tasks can be fused.
+        """
+        return (self.fuse and task.fuse
+                and len(self.output) == 1 and self.output[0] is task
+                and not self.routes
+                and type(self.balancer) is DefaultLoadBalancer
+                and type(task.input) is Stream
+                and task.input.max_items is None
+                and task.input.max_age is None
+                and task.interval is None
+                and not task.resources
+                and self.thread == task.thread
+                and not self.reorder and not task.reorder
+                and type(self.scaler) is StaticTaskScaler
+                and type(task.scaler) is StaticTaskScaler
+                and self.scaler.val == task.scaler.val
+                and self.concurrency == task.concurrency)
+
+    def absorb(self, chain: list):
+        """Fuses a chain of downstream tasks into this one: their functions are stacked on top of
+        this task's function in every runner, and this task takes over the outputs, routes and
+        balancer of the last task in the chain.
+
+        Args:
+            chain (list): The downstream tasks, in order.
+        """
+        tail = chain[-1]
+        self.chain.extend(chain)
+        self.name = "+".join([self.name] + [task.name for task in chain])
+        self.output = tail.output
+        self.routes = tail.routes
+        self.balancer = tail.balancer
+        self.fuse = tail.fuse
 
     def multiplex(self, route, output):
         """_summary_
@@ -148,14 +474,24 @@ class Task:
         return output
 
     async def send(self, obj: object):
-        """_summary_
+        """Sends a result downstream. The result carries the deadline it was yielded with (as a
+        `Deadline`), or else the deadline of the item the runner dequeued last, and is dropped
+        instead of sent once that deadline has passed.
 
         Args:
             obj (object): _description_
         """
+        if type(obj) is Deadline:
+            obj, expires = obj
+        else:
+            expires = expiry.get()
+
         output = self.output
 
-        if self.routes:
+        if self.dispatch is not None:
+            output, obj = self.dispatch(obj)
+
+        elif self.routes:
             output = self.multiplex(obj[0], output)
             if len(obj[1:]) == 1:
                 obj = obj[1]
@@ -165,26 +501,253 @@ class Task:
         elif self.balancer:
             output = self.balancer.balance(self.output)
 
+        if not output:
+            return
+        if expires is not None:
+            if expires <= time.monotonic():
+                self.input.expired += 1
+                return
+            obj = Deadline(obj, expires)
+        if len(output) == 1:
+            return await output[0].input.enqueue(obj)
+
         enqueue = [o.input.enqueue(obj) for o in output]
 
         await asyncio.gather(*enqueue)
 
     async def run_async_single(self, name: str, lock: asyncio.Lock):
-        """_summary_
+        """Runs the task function, sending each result downstream and acknowledging the items it
+        consumed. A runner that is asked to stop (through its own lock or the pipeline killswitch)
+        finishes sending the result it just produced before returning, and a runner that is
+        cancelled puts the items it had in flight back on its input stream.
 
         Args:
             name (str): _description_
             lock (asyncio.Lock): _description_
         """
-        async def iterator(*args, **kwargs):
-            async for f in self.iterator(*args, **kwargs):
+        if self.woken is not None:
+            self.cold()
+
+        if self.reorder:
+            return await self.run_async_ordered(lock)
+
+        if self.concurrency > 1:
+            return await self.run_async_concurrent(lock)
+
+        if all(t.operator and not t.cache for t in [self] + self.chain) and self.interval is None:
+            return await self.run_async_batch(lock)
+
+        try:
+            async for o in self.iterator():
+                await self.send(o)
+                self.input.ack()
                 if (lock.locked() or self.lock.locked()):
-                    return
+                    break
+        except asyncio.CancelledError:
+            self.input.requeue(asyncio.current_task())
+            raise
+
+        self.input.ack()
+
+    async def run_async_ordered(self, lock: asyncio.Lock):
+        """Runs the task function like `run_async_single`, but passes each result through the reorder
+        buffer so that results leave the task in the order their items were dequeued.
+
+        Args:
+            lock (asyncio.Lock): The lock signalling this runner to stop.
+        """
+        runner = asyncio.current_task()
+        seqs = []
+        last = None
+        try:
+            async for o in self.iterator():
+                seqs = self.input.tagged()
+                if seqs:
+                    last = seqs[-1]
+                expires = expiry.get()
+                if expires is not None and type(o) is not Deadline:
+                    o = Deadline(o, expires)  # the result may be sent from another runner
+                if last is None:
+                    await self.send(o)
                 else:
-                    yield f
+                    await self.reorder.put(seqs or [last], o, self.send)
+                seqs = []
+                self.input.ack()
+                if (lock.locked() or self.lock.locked()):
+                    break
+        except asyncio.CancelledError:
+            self.input.requeue(runner)
+            await self.reorder.skip(seqs + self.input.tagged(runner), self.send)
+            raise
 
-        async for o in iterator():
-            await self.send(o)
+        self.input.ack()
+        await self.reorder.skip(self.input.tagged(runner), self.send)
+
+    async def run_async_batch(self, lock: asyncio.Lock):
+        """Runs operator tasks (and chains of fused operator tasks) without async generators:
+        items are drained from the input in batches and passed through each operator function in
+        a plain loop. Items are acknowledged once their batch has been sent.
+
+        Args:
+            lock (asyncio.Lock): The lock signalling this runner to stop.
+        """
+        steps = [t.step() for t in [self] + self.chain]
+        runner = asyncio.current_task()
+        try:
+            while True:
+                batch = await self.input.drain(self.batch_size)
+                done = batch[-1] == Signal.TERM
+                if done:
+                    batch.pop()
+                entries = self.input.checkouts.get(runner, ()) if self.input.timed else ()
+                for i, item in enumerate(batch):
+                    if entries:
+                        expiry.set(self.input.expiry(entries[i]))
+                    for value in await transform(steps, item):
+                        await self.send(value)
+                self.input.ack()
+                if (done or lock.locked() or self.lock.locked()):
+                    break
+        except asyncio.CancelledError:
+            self.input.requeue(asyncio.current_task())
+            raise
+
+    async def run_async_concurrent(self, lock: asyncio.Lock):
+        """Runs operator tasks with up to `concurrency` items in flight: each item is passed through
+        the operator functions in its own asyncio task, which sends its results and acknowledges the
+        item as soon as it completes. The runner stops dequeuing while its slots are all taken, and
+        waits for the items in flight before it returns.
+
+        Args:
+            lock (asyncio.Lock): The lock signalling this runner to stop.
+        """
+        steps = [t.step() for t in [self] + self.chain]
+        runner = asyncio.current_task()
+        self.flights[runner] = pending = set()
+        landed = asyncio.Event()
+        errors = []
+
+        def land(flight):
+            pending.discard(flight)
+            if not flight.cancelled() and flight.exception() is not None:
+                errors.append(flight.exception())
+            landed.set()
+
+        try:
+            done = False
+            while not (done or lock.locked() or self.lock.locked()):
+                while pending and len(pending) >= self.limits.get(runner, 0) and not errors:
+                    landed.clear()
+                    await landed.wait()
+                if errors:
+                    raise errors[0]
+                batch = await self.input.drain(max(self.limits.get(runner, 0) - len(pending), 1))
+                done = batch[-1] == Signal.TERM
+                if done:
+                    batch.pop()
+                entries = ()
+                if batch and self.input.timed:
+                    entries = self.input.checkouts.get(runner, [])[-len(batch):]
+                for i, item in enumerate(batch):
+                    if entries:
+                        expiry.set(self.input.expiry(entries[i]))
+                    flight = asyncio.create_task(self.clocked(self.process(steps, item, runner)))
+                    pending.add(flight)
+                    flight.add_done_callback(land)
+            while pending and not errors:
+                landed.clear()
+                await landed.wait()
+            if errors:
+                raise errors[0]
+        except BaseException:
+            # cancelled, or an item failed: the items still in flight go back on the input
+            flights = list(pending)
+            for flight in flights:
+                flight.cancel()
+            if flights:
+                await asyncio.wait(flights)
+            for flight in flights:
+                self.input.requeue(flight)
+            self.input.requeue(runner)
+            raise
+        finally:
+            self.flights.pop(runner, None)
+
+    async def process(self, steps: list, item: object, runner: asyncio.Task):
+        """Takes over an item from a concurrent runner, passes it through the operator steps, sends
+        the results and acknowledges the item.
+
+        Args:
+            steps (list): The steps of the task and the operator tasks fused into it.
+            item (object): The item.
+            runner (asyncio.Task): The runner that dequeued the item.
+        """
+        self.input.handoff(runner)
+        for value in await transform(steps, item):
+            await self.send(value)
+        self.input.ack()
+
+    async def clocked(self, coroutine):
+        """Runs a runner (or per-item) coroutine, adding the time it holds the event loop to the task
+        clock (see `aiopypes.lag`).
+
+        Args:
+            coroutine: The coroutine.
+        """
+        if self.clock is None:
+            self.clock = Clock()
+        return await timed(coroutine, self.clock)
+
+    def bindings(self) -> dict:
+        """Returns the resources of the current runner, by name.
+
+        Returns:
+            dict: The task-scoped resources and the runner-scoped resources of the calling runner.
+        """
+        if not self.resources:
+            return {}
+        return {**self.shared, **self.bound.get(asyncio.current_task(), {})}
+
+    async def open_resources(self):
+        """Enters the task-scoped resources, sized for the most runners the scaler will start.
+        """
+        self.stack = AsyncExitStack()
+        for name, resource in self.resources.items():
+            if resource.scope == "task":
+                self.shared[name] = await self.stack.enter_async_context(
+                    resource.create(self.scaler.capacity()))
+
+    async def close_resources(self):
+        """Exits the task-scoped resources, in reverse order, then closes the functions of this task
+        and of the tasks fused into it that have an async `close` method, such as a dedup stage
+        writing its last snapshot.
+        """
+        if self.stack:
+            await self.stack.aclose()
+        self.stack = None
+        self.shared = {}
+        for task in (self, *self.chain):
+            close = getattr(task.function, "close", None)
+            if inspect.iscoroutinefunction(close):
+                await close()
+
+    async def run_async_resourced(self, name: str, lock: asyncio.Lock):
+        """Runs `run_async_single` within the runner-scoped resources of a new runner.
+
+        Args:
+            name (str): The runner name.
+            lock (asyncio.Lock): The lock signalling this runner to stop.
+        """
+        runner = asyncio.current_task()
+        async with AsyncExitStack() as stack:
+            self.bound[runner] = bound = {}
+            try:
+                for key, resource in self.resources.items():
+                    if resource.scope == "runner":
+                        bound[key] = await stack.enter_async_context(resource.create(self.concurrency))
+                await self.run_async_single(name, lock)
+            finally:
+                del self.bound[runner]
 
     async def add_runner(self):
         """_summary_
@@ -192,44 +755,254 @@ class Task:
         ct = len(self.runners)
         name = f"{self.name}-{ct}"
         lock = asyncio.Lock()
-        runner = asyncio.create_task(self.run_async_single(name, lock), name=name)
+        if any(resource.scope == "runner" for resource in self.resources.values()):
+            coroutine = self.run_async_resourced(name, lock)
+        else:
+            coroutine = self.run_async_single(name, lock)
+        runner = asyncio.create_task(self.clocked(coroutine), name=name)
         self.locks.append(lock)
         self.runners.append(runner)
 
-    async def remove_runner(self):
-        """_summary_
+    async def remove_runner(self, index: int = None):
+        """Stops the runner with the fewest items in flight (the most recent one on ties). A runner
+        that does not stop in time is cancelled, which re-enqueues the items it had in flight.
+
+        Args:
+            index (int, optional): The position of the runner to stop instead. Defaults to None.
 
         Returns:
             _type_: _description_
         """
-        runner = self.runners.pop()
-        lock = self.locks.pop()
+        if index is None:
+            index = min(range(len(self.runners)),
+                        key=lambda i: (self.input.inflight(self.runners[i]), -i))
+        runner = self.runners.pop(index)
+        lock = self.locks.pop(index)
+        self.limits.pop(runner, None)
         try:
-            await lock.acquire()
+            if not lock.locked():  # a draining source's lock is already held
+                await lock.acquire()
             await asyncio.wait_for(runner, timeout=10)
             return runner
-        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        except (asyncio.TimeoutError, asyncio.CancelledError):
             runner.cancel()
-            await asyncio.wait_for(runner, timeout=30)
+            await asyncio.wait([runner], timeout=30)
+            if asyncio.current_task().cancelling():
+                raise  # the caller was cancelled, not just the runner
 
-    async def shutdown(self):
-        """_summary_
+    def slots(self) -> list:
+        """Returns the units the scaler counts: the runners, or with `concurrency`, one entry per
+        concurrency slot (the runner holding it).
+
+        Returns:
+            list: The runners, once per slot.
+        """
+        if self.concurrency == 1:
+            return self.runners
+        return [runner for runner in self.runners for _ in range(self.limits.get(runner, 0))]
+
+    async def add_slots(self, count: int):
+        """Adds `count` slots, filling up the last runner before starting new ones.
+
+        Args:
+            count (int): The number of slots to add.
+        """
+        if self.concurrency == 1:
+            for _ in range(count):
+                await self.add_runner()
+            return
+        while count > 0:
+            if not self.runners or self.limits[self.runners[-1]] == self.concurrency:
+                await self.add_runner()
+                self.limits[self.runners[-1]] = 0
+            runner = self.runners[-1]
+            added = min(count, self.concurrency - self.limits[runner])
+            self.limits[runner] += added
+            count -= added
+
+    async def remove_slots(self, count: int):
+        """Removes `count` slots from the last runner first, stopping runners left without any. A
+        runner given fewer slots finishes the items it has in flight before dequeuing more.
+
+        Args:
+            count (int): The number of slots to remove.
+        """
+        if self.concurrency == 1:
+            for _ in range(count):
+                await self.remove_runner()
+            return
+        while count > 0 and self.runners:
+            runner = self.runners[-1]
+            removed = min(count, self.limits[runner])
+            self.limits[runner] -= removed
+            count -= removed
+            if not self.limits[runner]:
+                await self.remove_runner(len(self.runners) - 1)
+
+    async def hibernate(self):
+        """Waits, with no runners and without polling the scaler, until an item arrives in the input
+        (or the task is interrupted), then starts `scaler.wake()` runners at once.
+        """
+        arrival = self.input.arrival
+        arrival.clear()
+        if self.input.qsize():
+            self.woken = time.perf_counter()
+        else:
+            await arrival.wait()
+            self.woken = self.input.arrived
+        if self.lock.locked() or self.draining:
+            self.woken = None
+            return
+        await self.add_slots(self.scaler.wake())
+
+    def cold(self):
+        """Records the cold-start latency of the first runner started by `hibernate`: the time from
+        the arrival of the item that woke the task to the runner starting.
+        """
+        latency = time.perf_counter() - self.woken
+        self.woken = None
+        self.colds[0] += 1
+        self.colds[1] += latency
+        self.colds[2] = max(self.colds[2], latency)
+
+    def interrupt(self):
+        """Wakes the task if it is hibernating, so that it notices the killswitch.
+        """
+        if self.input is not None and self.input.arrival is not None:
+            self.input.arrival.set()
+
+    def inflight(self) -> dict:
+        """Reports the number of items each runner has dequeued but not yet acknowledged.
+
+        Returns:
+            dict: The in-flight count keyed by runner name.
+        """
+        return {r.get_name(): self.input.inflight(r)
+                + sum(self.input.inflight(flight) for flight in self.flights.get(r, ()))
+                for r in self.runners}
+
+    def metrics(self) -> dict:
+        """Reports the state of the task, merged with the metrics of its function when it has any
+        (e.g. a join's state size).
+
+        Returns:
+            dict: The task metrics.
+        """
+        metrics = {
+            "name": self.name,
+            "runners": len(self.runners),
+            "qsize": self.input.qsize() if self.input else 0,
+            "inflight": self.input.inflight() if self.input else 0,
+        }
+        if self.concurrency > 1:
+            metrics["slots"] = sum(self.limits.values())
+        if self.clock:
+            share = self.clock.share()
+            metrics["busy"] = round(share, 3)
+            if self.monitor:
+                metrics["loop_lag"] = self.monitor.lag()
+                metrics["offload"] = self.monitor.offload(share)
+            if self.scaler.held:
+                metrics["scale_held"] = self.scaler.held
+        if self.colds[0]:
+            count, total, worst = self.colds
+            metrics["cold_starts"] = count
+            metrics["cold_start_avg"] = total / count
+            metrics["cold_start_max"] = worst
+        if hasattr(self.function, "metrics"):
+            metrics.update(self.function.metrics())
+        if self.cache:
+            metrics.update(self.cache.metrics())
+        if hasattr(self.input, "metrics"):
+            metrics.update(self.input.metrics())
+        return metrics
+
+    async def drain(self, source: bool = False):
+        """Stops the task once its runners have processed every item already in its input. Scaling
+        stops, and each runner gets a `Signal.TERM` queued behind the backlog. Source tasks, which do
+        not read their input, are asked to stop after their next result instead.
+
+        Args:
+            source (bool, optional): Whether the task is a source of the pipeline. Defaults to False.
+        """
+        self.draining = True
+        if not source and not self.runners and self.input.qsize():
+            await self.add_slots(self.scaler.wake())  # scaled to zero, with items just arrived
+        runners = list(self.runners)
+        pending = set(runners)
+        try:
+            if source:
+                for lock in self.locks:
+                    if not lock.locked():
+                        await lock.acquire()
+            else:
+                for _ in runners:
+                    await self.input.enqueue(Signal.TERM)
+            while pending:
+                _, pending = await asyncio.wait(pending, timeout=0.1)
+                if pending and not source and not self.input.qsize():
+                    # a runner removed by the scaler, still waiting on the input, took a signal
+                    for _ in pending:
+                        await self.input.enqueue(Signal.TERM)
+        finally:
+            # past the deadline (or cancelled), runners still busy are cancelled, which re-enqueues
+            # the items they had in flight
+            for runner in pending:
+                runner.cancel()
+            if pending:
+                await asyncio.wait(pending, timeout=1)
+            for lock in self.locks:
+                if lock.locked():
+                    lock.release()
+            self.runners.clear()
+            self.locks.clear()
+            self.limits.clear()
+
+    async def retire(self):
+        """Stops every runner, each after the items queued ahead of the `Signal.TERM` it is sent.
         """
         sigterms = [self.input.enqueue(Signal.TERM) for _ in self.runners]
         closures = [self.remove_runner() for _ in self.runners]
         await asyncio.gather(*closures, *sigterms)
+        self.limits.clear()
+
+    async def shutdown(self):
+        """_summary_
+        """
+        await self.retire()
+        await self.close_resources()
+        await self.input.close()
 
     async def run_async(self):
         """_summary_
         """
-        while not self.lock.locked():
-            scale = self.scaler.scale(self.runners, self.input)
-            if scale > 0:
-                for _ in range(scale):
-                    await self.add_runner()
-            if scale < 0:
-                for _ in range(abs(scale)):
-                    await self.remove_runner()
-            await asyncio.sleep(self.scaler.sleep())
+        sender.set(self)
+        self.clock = Clock()
+        if self.scaler.min == 0:
+            self.input.arrival = asyncio.Event()
+        await self.input.open()
+        await self.open_resources()
+
+        try:
+            while not self.lock.locked():
+                if self.draining:
+                    scale = 0
+                elif self.runners and self.scaler.idle(self.input):
+                    await self.retire()
+                    scale = 0
+                else:
+                    scale = self.scaler.scale(self.slots(), self.input)
+                if scale > 0:
+                    await self.add_slots(scale)
+                if scale < 0:
+                    await self.remove_slots(abs(scale))
+                if not self.runners and self.input.arrival is not None and not self.draining:
+                    await self.hibernate()
+                    continue
+                await asyncio.sleep(self.scaler.sleep())
+        except asyncio.CancelledError:
+            await self.close_resources()
+            await self.input.close()
+            raise
 
         await self.shutdown()
@@ -0,0 +1,113 @@
+"""
+    Thread groups: tasks declared with the same `@app.task(thread="name")` run together on a dedicated
+    thread with its own event loop.
+
+    .. code-block:: python
+
+      @app.task(thread="parse", scale=4)
+      async def parse(input: aiopypes.Stream):
+          async for page in input:
+              yield extract(page)
+
+    Tasks fed across threads get a `ThreadSafeStream` as their input. Each thread group has its own
+    killswitch, which the pipeline acquires (through the group's loop) when its own killswitch is
+    acquired. On a free-threaded CPython build the groups run in parallel; otherwise they still keep
+    slow or CPU-heavy stages from delaying the callbacks of the other loops by more than the
+    interpreter's switch interval.
+"""
+import asyncio
+import threading
+
+
+class ThreadGroup:
+    """
+    The tasks of a pipeline sharing a thread, and the thread and event loop running them.
+    """
+
+    def __init__(self, name: str, tasks: list, monitor=None):
+        """
+        The `__init__` function sets up the group. The thread is not started until `start` is called.
+
+        Args:
+          name (str): The thread name shared by the tasks.
+          tasks (list): The tasks of the group.
+          monitor (LoopLagMonitor): Probes the lag of the group's loop. Defaults to None
+        """
+        self.name = name
+        self.tasks = tasks
+        self.monitor = monitor
+        self.loop = None
+        self.lock = None
+        self.stopped = False
+        self.started = threading.Event()
+        self.thread = threading.Thread(target=self.run, name=f"aiopypes-{name}", daemon=True)
+
+    def start(self) -> None:
+        """
+        The `start` function starts the thread.
+        """
+        self.thread.start()
+
+    def run(self) -> None:
+        """
+        The `run` function is the body of the thread: it runs the tasks of the group on a new event loop
+        until they have all returned.
+        """
+        try:
+            asyncio.run(self.run_async())
+        finally:
+            self.started.set()
+
+    async def run_async(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.lock = asyncio.Lock()
+        for task in self.tasks:
+            task.lock = self.lock
+        if self.stopped:
+            await self.lock.acquire()
+        self.started.set()
+
+        async with asyncio.TaskGroup() as tg:
+            for task in self.tasks:
+                tg.create_task(task.run_async())
+            if self.monitor:
+                tg.create_task(self.monitor.run(self.lock))
+
+    def kill(self) -> None:
+        if not self.lock.locked():
+            self.loop.create_task(self.halt())
+
+    async def halt(self) -> None:
+        """
+        The `halt` function acquires the killswitch of the group, and wakes its hibernating tasks so
+        that they notice it.
+        """
+        await self.lock.acquire()
+        for task in self.tasks:
+            task.interrupt()
+
+    def stop(self) -> None:
+        """
+        The `stop` function acquires the killswitch of the group from any thread, so that its tasks shut
+        their runners down and return.
+        """
+        self.stopped = True
+        self.started.wait()
+        if self.loop and not self.loop.is_closed():
+            try:
+                self.loop.call_soon_threadsafe(self.kill)
+            except RuntimeError:
+                pass  # the loop closed in the meantime
+
+    async def join(self, timeout: float = None) -> bool:
+        """
+        The `join` function waits, without blocking the calling loop, for the thread to finish.
+
+        Args:
+          timeout (float): How long to wait, in seconds. Defaults to no limit.
+
+        Returns:
+          Whether the thread has finished.
+        """
+        await asyncio.to_thread(self.thread.join, timeout)
+        return not self.thread.is_alive()
@@ -0,0 +1,156 @@
+"""
+    The compiled, immutable form of a pipeline's task graph, built by `Pipeline.compile`.
+
+    Tasks are numbered in topological order (every task comes after all of its upstream tasks), and
+    the edges and route tables are stored as tuples and read-only dicts indexed by those numbers.
+    Compiling rejects graphs with cycles, edges to tasks outside the pipeline and routes without a
+    matching output, so broken topologies fail before the pipeline starts.
+"""
+from collections import deque
+from types import MappingProxyType
+from typing import Callable, NamedTuple
+
+from .exception import TopologyError
+from .route import Router, legacy
+
+
+class Topology(NamedTuple):
+    tasks: tuple
+    ids: MappingProxyType
+    outputs: tuple
+    inputs: tuple
+    routes: tuple
+
+    @classmethod
+    def build(cls, tasks: list):
+        """
+        The `build` function compiles a list of tasks and the outputs between them.
+
+        Args:
+          tasks (list): The tasks of the pipeline.
+
+        Raises:
+          TopologyError: The tasks form a cycle, send to a task that is not in the list, or declare more
+        routes than they have outputs.
+
+        Returns:
+          A new `Topology` object.
+        """
+        tasks = list(dict.fromkeys(tasks))
+        members = set(tasks)
+        indegree = {task: 0 for task in tasks}
+        for task in tasks:
+            for o in task.output:
+                if o not in members:
+                    raise TopologyError(f"task {task.name} sends to task {o.name}, which is not in the pipeline")
+                indegree[o] += 1
+            if isinstance(task.routes, Router):
+                if any(i >= len(task.output) for i in task.routes.targets()):
+                    raise TopologyError(f"task {task.name} routes to an output it does not have")
+            elif len(task.routes) > len(task.output):
+                raise TopologyError(f"task {task.name} has {len(task.routes)} routes but only "
+                                    f"{len(task.output)} outputs")
+
+        ready = deque(task for task in tasks if not indegree[task])
+        order = []
+        while ready:
+            task = ready.popleft()
+            order.append(task)
+            for o in task.output:
+                indegree[o] -= 1
+                if not indegree[o]:
+                    ready.append(o)
+
+        if len(order) < len(tasks):
+            cycle = ", ".join(task.name for task in tasks if indegree[task])
+            raise TopologyError(f"the pipeline contains a cycle through: {cycle}")
+
+        ids = {task: i for i, task in enumerate(order)}
+        outputs = tuple(tuple(ids[o] for o in task.output) for task in order)
+        inputs = [[] for _ in order]
+        for i, targets in enumerate(outputs):
+            for o in targets:
+                inputs[o].append(i)
+
+        routes = []
+        for task in order:
+            if isinstance(task.routes, Router):
+                routes.append(task.routes)
+                continue
+            table = {}
+            for route, o in zip(task.routes, task.output):
+                try:
+                    table.setdefault(route, ids[o])  # the first matching route wins
+                except TypeError:
+                    raise TopologyError(f"task {task.name} has an unhashable route: {route!r}")
+            routes.append(MappingProxyType(table))
+
+        return cls(
+            tasks=tuple(order),
+            ids=MappingProxyType(ids),
+            outputs=outputs,
+            inputs=tuple(tuple(i) for i in inputs),
+            routes=tuple(routes),
+        )
+
+    def roots(self) -> list:
+        """
+        The `roots` function returns the IDs of the tasks without upstream tasks.
+        """
+        return [i for i, inputs in enumerate(self.inputs) if not inputs]
+
+    def dispatch(self, task) -> Callable:
+        """
+        The `dispatch` function builds the routing function of a task, see `aiopypes.route`.
+
+        Args:
+          task (Task): The task.
+
+        Returns:
+          A function mapping an item to the list of tasks to send it to and the value to send.
+        """
+        routes = self.routes[self.ids[task]]
+        if isinstance(routes, Router):
+            return routes.compile(task.output)
+        return legacy({route: [self.tasks[o]] for route, o in routes.items()}, task.output)
+
+    def render(self, node: Callable = None) -> str:
+        """
+        The `render` function draws the graph as text, one task per line, starting from each root. A task
+        reached a second time (downstream of a `reduce`) is drawn again with `...` instead of repeating its
+        outputs.
+
+        .. code-block:: text
+
+          0 every_second
+           *--> 1 task1
+           |     *--> 3 task4
+           *--> 2 task2
+                 *--> 3 task4 ...
+
+        Args:
+          node (Callable): Maps a task to its label. Defaults to the task name.
+
+        Returns:
+          The rendered graph.
+        """
+        node = node if node else (lambda task: task.name)
+        lines = []
+        expanded = set()
+
+        def walk(i, prefix, connector, continuation):
+            label = f"{prefix}{connector}{i} {node(self.tasks[i])}"
+            if i in expanded:
+                lines.append(label + (" ..." if self.outputs[i] else ""))
+                return
+            lines.append(label)
+            expanded.add(i)
+            children = self.outputs[i]
+            for k, child in enumerate(children):
+                last = k == len(children) - 1
+                walk(child, prefix + continuation, " *--> ", "      " if last else " |    ")
+
+        for root in self.roots():
+            walk(root, "", "", "")
+
+        return "\n".join(lines)
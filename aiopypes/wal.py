@@ -0,0 +1,367 @@
+"""
+    Append-only write-ahead log used by `DurableStream` to persist items until the consuming task
+    acknowledges them.
+
+    Appends are batched in memory and written with a single `write` + `fsync` per batch (group
+    commit): every producer appending while a batch is being written waits on the same commit, so
+    the cost of the `fsync` is shared. Acknowledgements are written as compact records in the same
+    log and never wait on a commit. On startup the log is replayed and every item that was appended
+    but not acknowledged is returned, in order.
+
+    The log is split into segment files of roughly `segment_bytes`. Once a segment is closed, it is
+    deleted when all of its items have been acknowledged, or rewritten into the active segment when
+    only a small fraction (`compact_ratio`) of its items are still pending. Every file is opened,
+    read, written and removed on a worker thread, so the log never blocks the event loop on disk.
+"""
+import asyncio
+import os
+import struct
+import zlib
+
+from array import array
+
+
+class WriteAheadLog:
+
+    APPEND = 1
+    ACK = 2
+
+    header = struct.Struct("<BQII")
+
+    def __init__(self,
+                 directory: str,
+                 segment_bytes: int = 16 * 1024 * 1024,
+                 commit_interval: float = 0,
+                 commit_items: int = 1024,
+                 compact_ratio: float = 0.1,
+                 fsync: bool = True):
+        """
+        The `__init__` function configures the log. No file is touched until `open` is called.
+
+        Args:
+          directory (str): The directory holding the segment files. It is created if missing.
+          segment_bytes (int): The size after which the active segment is closed and a new one started.
+        Defaults to 16 MiB
+          commit_interval (float): The longest time (in seconds) a batch waits for more appends before
+        being committed. With the default of 0 a batch is committed as soon as the loop is idle, and
+        appends arriving while a commit is being written join the next batch. Defaults to 0
+          commit_items (int): The number of appends that triggers a commit without waiting for
+        `commit_interval`. Defaults to 1024
+          compact_ratio (float): The fraction of pending items below which a closed segment is rewritten
+        into the active one. Defaults to 0.1
+          fsync (bool): Whether each commit is `fsync`-ed. Without it, commits survive a process crash but
+        not an operating system crash. Defaults to True
+        """
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.commit_interval = commit_interval
+        self.commit_items = commit_items
+        self.compact_ratio = compact_ratio
+        self.fsync = fsync
+
+        self.opened = False
+        self.seq = 0
+        self.segments = {}
+        self.live = {}
+        self.obsolete = []
+        self.active = None
+        self.file = None
+        self.size = 0
+
+        self.buffer = bytearray()
+        self.batch = []
+        self.waiter = None
+        self.wakeup = None
+        self.full = None
+        self.committer = None
+
+    def filename(self, index: int) -> str:
+        """
+        The `filename` function returns the path of the segment with the given index.
+        """
+        return os.path.join(self.directory, f"{index:012d}.wal")
+
+    def pack(self, kind: int, seq: int, payload: bytes) -> None:
+        """
+        The `pack` function appends a framed, checksummed record to the pending batch.
+
+        Args:
+          kind (int): `APPEND` or `ACK`.
+          seq (int): The sequence number of an appended item (unused for acknowledgements).
+          payload (bytes): The serialized item, or the packed sequence numbers being acknowledged.
+        """
+        self.buffer += self.header.pack(kind, seq, len(payload), zlib.crc32(payload))
+        self.buffer += payload
+
+    def records(self, data: bytes):
+        """
+        The `records` function iterates over the records of a segment, stopping at the first truncated
+        or corrupted record (e.g. a write torn by a crash).
+
+        Args:
+          data (bytes): The content of a segment file.
+
+        Returns:
+          A generator of `(kind, seq, payload)` tuples.
+        """
+        view = memoryview(data)
+        offset = 0
+        size = self.header.size
+        while offset + size <= len(view):
+            kind, seq, length, crc = self.header.unpack_from(view, offset)
+            payload = view[offset + size:offset + size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+            offset += size + length
+            yield kind, seq, payload
+
+    def replay(self) -> list:
+        """
+        The `replay` function reads every segment in order and rebuilds the set of pending items.
+
+        Returns:
+          A list of `(seq, payload)` tuples that were appended but never acknowledged, in order.
+        """
+        pending = {}
+        appended = {}
+        indexes = sorted(int(f[:-4]) for f in os.listdir(self.directory) if f.endswith(".wal"))
+        for index in indexes:
+            with open(self.filename(index), "rb") as f:
+                data = f.read()
+            if not data:
+                os.remove(self.filename(index))
+                continue
+            self.segments[index] = [0, 0]
+            for kind, seq, payload in self.records(data):
+                if kind == self.APPEND:
+                    pending[seq] = bytes(payload)
+                    appended[seq] = index
+                    self.segments[index][1] += 1
+                    self.seq = max(self.seq, seq + 1)
+                elif kind == self.ACK:
+                    acked = array("Q")
+                    acked.frombytes(payload)
+                    for s in acked:
+                        pending.pop(s, None)
+
+        for seq in pending:
+            index = appended[seq]
+            self.live[seq] = index
+            self.segments[index][0] += 1
+
+        self.active = indexes[-1] + 1 if indexes else 0
+        return sorted(pending.items())
+
+    def recover(self) -> list:
+        """
+        The `recover` function replays the existing segments and opens a new active segment (run in a
+        worker thread, before the log is used).
+
+        Returns:
+          A list of `(seq, payload)` tuples that were appended but never acknowledged, in order.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        pending = self.replay()
+
+        self.file = open(self.filename(self.active), "ab")
+        self.size = 0
+        self.segments[self.active] = [0, 0]
+        return pending
+
+    async def open(self) -> list:
+        """
+        The `open` function replays the existing segments, opens a new active segment and starts the
+        group-commit loop.
+
+        Returns:
+          A list of `(seq, payload)` tuples that were appended but never acknowledged, in order.
+        """
+        pending = await asyncio.to_thread(self.recover)
+
+        loop = asyncio.get_running_loop()
+        self.waiter = loop.create_future()
+        self.wakeup = asyncio.Event()
+        self.full = asyncio.Event()
+        self.committer = asyncio.create_task(self.commit_loop())
+        self.opened = True
+
+        return pending
+
+    async def append(self, payload: bytes) -> int:
+        """
+        The `append` function adds an item to the current batch and waits until the batch is committed.
+
+        Args:
+          payload (bytes): The serialized item.
+
+        Returns:
+          The sequence number assigned to the item.
+        """
+        seq = self.seq
+        self.seq += 1
+        self.pack(self.APPEND, seq, payload)
+        self.batch.append(seq)
+        self.live[seq] = None
+        self.wakeup.set()
+        if len(self.batch) >= self.commit_items:
+            self.full.set()
+        await asyncio.shield(self.waiter)
+        return seq
+
+    def ack(self, seqs: list) -> None:
+        """
+        The `ack` function marks items as processed. The acknowledgement is written with the next
+        commit and does not wait for it.
+
+        Args:
+          seqs (list): The sequence numbers to acknowledge.
+        """
+        for seq in seqs:
+            index = self.live.pop(seq, None)
+            if index is not None:
+                self.segments[index][0] -= 1
+        self.pack(self.ACK, 0, array("Q", seqs).tobytes())
+        self.wakeup.set()
+
+    def write(self, buffer: bytearray) -> None:
+        """
+        The `write` function writes a batch to the active segment (run in a worker thread).
+        """
+        self.file.write(buffer)
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    async def commit(self) -> None:
+        """
+        The `commit` function writes the pending batch, wakes every append waiting on it, and rolls and
+        compacts segments as needed.
+        """
+        buffer, batch, waiter = self.buffer, self.batch, self.waiter
+        self.buffer = bytearray()
+        self.batch = []
+        self.waiter = asyncio.get_running_loop().create_future()
+        self.wakeup.clear()
+        self.full.clear()
+
+        segment = self.segments[self.active]
+        for seq in batch:
+            if seq in self.live:
+                self.live[seq] = self.active
+                segment[0] += 1
+            segment[1] += 1
+
+        try:
+            if buffer:
+                await asyncio.to_thread(self.write, buffer)
+                self.size += len(buffer)
+        except asyncio.CancelledError:
+            waiter.cancel()
+            raise
+        except BaseException as e:
+            waiter.set_exception(e)
+            raise
+        else:
+            waiter.set_result(None)
+
+        if self.obsolete:
+            obsolete, self.obsolete = self.obsolete, []
+            await asyncio.to_thread(self.remove, obsolete)
+
+        if self.size >= self.segment_bytes:
+            await self.roll()
+            await self.compact()
+
+    async def commit_loop(self) -> None:
+        """
+        The `commit_loop` function commits a batch whenever it is full, or `commit_interval` seconds
+        after its first record (immediately when `commit_interval` is 0).
+        """
+        while self.opened:
+            await self.wakeup.wait()
+            if not self.commit_interval:
+                await asyncio.sleep(0)
+            elif len(self.batch) < self.commit_items:
+                try:
+                    await asyncio.wait_for(self.full.wait(), timeout=self.commit_interval)
+                except asyncio.TimeoutError:
+                    pass
+            await self.commit()
+
+    def remove(self, indexes: list) -> None:
+        """
+        The `remove` function deletes segment files (run in a worker thread).
+
+        Args:
+          indexes (list): The indexes of the segments.
+        """
+        for index in indexes:
+            os.remove(self.filename(index))
+
+    def read(self, index: int) -> bytes:
+        """
+        The `read` function returns the content of a segment file (run in a worker thread).
+
+        Args:
+          index (int): The index of the segment.
+        """
+        with open(self.filename(index), "rb") as f:
+            return f.read()
+
+    async def roll(self) -> None:
+        """
+        The `roll` function closes the active segment and starts a new one.
+        """
+        file = self.file
+        self.active += 1
+        self.size = 0
+        self.segments[self.active] = [0, 0]
+        self.file = await asyncio.to_thread(open, self.filename(self.active), "ab")
+        await asyncio.to_thread(file.close)
+
+    async def compact(self) -> None:
+        """
+        The `compact` function removes closed segments, oldest first, whose items have all been
+        acknowledged, and rewrites the pending items of mostly-acknowledged segments into the active
+        one. Rewritten segments are only deleted after the next commit, so a crash in between just
+        replays duplicates of the same sequence numbers.
+        """
+        for index in sorted(self.segments):
+            if index == self.active:
+                break
+            live, total = self.segments[index]
+            if live > 0 and live > total * self.compact_ratio:
+                break
+            if live > 0:
+                data = await asyncio.to_thread(self.read, index)
+                for kind, seq, payload in self.records(data):
+                    if kind == self.APPEND and self.live.get(seq) == index:
+                        self.pack(self.APPEND, seq, payload)
+                        self.batch.append(seq)
+                        self.live[seq] = None
+                self.obsolete.append(index)
+                self.wakeup.set()
+            else:
+                await asyncio.to_thread(self.remove, [index])
+            del self.segments[index]
+
+    def pending(self) -> int:
+        """
+        The `pending` function returns the number of items appended but not yet acknowledged.
+        """
+        return len(self.live)
+
+    async def close(self) -> None:
+        """
+        The `close` function commits anything still buffered, stops the commit loop and closes the
+        active segment.
+        """
+        if not self.opened:
+            return
+        self.opened = False
+        self.wakeup.set()
+        self.full.set()
+        await asyncio.wait((self.committer,))  # it may have been cancelled along with the pipeline
+        if self.buffer:
+            await self.commit()
+        self.file.close()
\ No newline at end of file
@@ -0,0 +1,328 @@
+"""
+    Windowed aggregation stages, added to a pipeline with `Pipeline.window`.
+
+    .. code-block:: python
+
+      pipeline = source \
+                 .map(parse) \
+                 .window("sliding", size=60, slide=5, key=lambda e: e.user, agg="count") \
+                 .map(alert)
+
+    Items are aggregated incrementally as they arrive (one accumulator update per item) and each
+    closed window is emitted downstream as a `Window(key, start, end, value)` tuple. Sliding windows
+    are split into panes of `slide` seconds that are combined with a two-stack queue, so every item
+    and every pane costs O(1) amortized regardless of how many panes a window spans.
+
+    Windows use processing time by default. With `timestamp=`, they use event time instead and close
+    once the watermark (the largest timestamp seen, minus `lateness`) passes their end; items older
+    than the watermark are dropped.
+"""
+import asyncio
+import heapq
+import math
+import time
+
+from typing import Callable, NamedTuple
+
+from .signal import Signal
+
+
+class Window(NamedTuple):
+    key: object
+    start: float
+    end: float
+    value: object
+
+
+class Aggregation:
+    """
+    An incremental, mergeable aggregation: `add` folds one value into an accumulator, `merge` combines
+    two accumulators (it must be associative), and `result` turns an accumulator into the emitted
+    value.
+    """
+
+    def __init__(self,
+                 zero: object,
+                 add: Callable,
+                 merge: Callable,
+                 result: Callable = None):
+        self.zero = zero
+        self.add = add
+        self.merge = merge
+        self.result = result if result else (lambda acc: acc)
+
+
+def _min(a, b):
+    return b if a is None or (b is not None and b < a) else a
+
+
+def _max(a, b):
+    return b if a is None or (b is not None and b > a) else a
+
+
+AGGREGATIONS = {
+    "count": Aggregation(0, lambda acc, v: acc + 1, lambda a, b: a + b),
+    "sum": Aggregation(0, lambda acc, v: acc + v, lambda a, b: a + b),
+    "min": Aggregation(None, _min, _min),
+    "max": Aggregation(None, _max, _max),
+    "mean": Aggregation((0, 0),
+                        lambda acc, v: (acc[0] + v, acc[1] + 1),
+                        lambda a, b: (a[0] + b[0], a[1] + b[1]),
+                        lambda acc: acc[0] / acc[1] if acc[1] else None),
+}
+
+
+class TwoStackQueue:
+    """
+    A FIFO queue of `(index, accumulator)` panes that returns the aggregate of its contents in O(1)
+    amortized per operation: pushes go onto a back stack carrying a running aggregate, and pops come
+    off a front stack of suffix aggregates that is rebuilt from the back stack when it runs empty.
+    """
+
+    def __init__(self, aggregation: Aggregation):
+        self.aggregation = aggregation
+        self.front = []
+        self.back = []
+        self.back_agg = aggregation.zero
+
+    def __len__(self):
+        return len(self.front) + len(self.back)
+
+    def push(self, start: object, acc: object) -> None:
+        self.back.append((start, acc))
+        self.back_agg = self.aggregation.merge(self.back_agg, acc)
+
+    def oldest(self) -> object:
+        return self.front[-1][0] if self.front else self.back[0][0]
+
+    def pop(self) -> None:
+        if not self.front:
+            merge = self.aggregation.merge
+            agg = self.aggregation.zero
+            while self.back:
+                start, acc = self.back.pop()
+                agg = merge(acc, agg)
+                self.front.append((start, agg))
+            self.back_agg = self.aggregation.zero
+        self.front.pop()
+
+    def query(self) -> object:
+        front = self.front[-1][1] if self.front else self.aggregation.zero
+        return self.aggregation.merge(front, self.back_agg)
+
+
+class TumblingWindows:
+
+    def __init__(self, size: float, aggregation: Aggregation):
+        self.size = size
+        self.aggregation = aggregation
+        self.panes = {}
+        self.indices = []
+        self.closed = float("-inf")
+
+    def add(self, key: object, t: float, value: object) -> bool:
+        index = math.floor(t / self.size)
+        if (index + 1) * self.size <= self.closed:
+            return False
+        pane = self.panes.get(index)
+        if pane is None:
+            pane = self.panes[index] = {}
+            heapq.heappush(self.indices, index)
+        pane[key] = self.aggregation.add(pane.get(key, self.aggregation.zero), value)
+        return True
+
+    def next(self) -> int:
+        return self.indices[0] + 1 if self.indices else None
+
+    def deadline(self) -> float:
+        return (self.indices[0] + 1) * self.size if self.indices else None
+
+    def close(self, watermark: float):
+        # bounds are computed from the pane index, so they do not drift as windows go by
+        while self.indices and (self.indices[0] + 1) * self.size <= watermark:
+            index = heapq.heappop(self.indices)
+            self.closed = (index + 1) * self.size
+            for key, acc in self.panes.pop(index).items():
+                yield key, index, acc
+
+    def advance(self, watermark: float) -> list:
+        size = self.size
+        result = self.aggregation.result
+        return [Window(key, index * size, (index + 1) * size, result(acc))
+                for key, index, acc in self.close(watermark)]
+
+
+class SlidingWindows:
+
+    def __init__(self, size: float, slide: float, aggregation: Aggregation):
+        if not slide or slide <= 0:
+            raise ValueError("sliding windows need a positive slide")
+        if abs(size / slide - round(size / slide)) > 1e-9:
+            raise ValueError("sliding window size must be a multiple of its slide")
+
+        self.size = size
+        self.slide = slide
+        self.count = round(size / slide)
+        self.aggregation = aggregation
+        self.panes = TumblingWindows(slide, aggregation)
+        self.stacks = {}
+        self.closed = None
+
+    def add(self, key: object, t: float, value: object) -> bool:
+        return self.panes.add(key, t, value)
+
+    def next(self) -> int:
+        if self.stacks:
+            return self.closed + 1
+        return self.panes.next()
+
+    def deadline(self) -> float:
+        end = self.next()
+        return None if end is None else end * self.slide
+
+    def close(self, end: int) -> list:
+        slide = self.slide
+        for key, index, acc in self.panes.close(end * slide):
+            stack = self.stacks.get(key)
+            if stack is None:
+                stack = self.stacks[key] = TwoStackQueue(self.aggregation)
+            stack.push(index, acc)
+
+        windows = []
+        first = end - self.count
+        result = self.aggregation.result
+        for key in list(self.stacks):
+            stack = self.stacks[key]
+            while stack and stack.oldest() < first:
+                stack.pop()
+            if not stack:
+                del self.stacks[key]
+                continue
+            windows.append(Window(key, first * slide, end * slide, result(stack.query())))
+        self.closed = end
+        self.panes.closed = end * slide
+        return windows
+
+    def advance(self, watermark: float) -> list:
+        windows = []
+        end = self.next()
+        while end is not None and end * self.slide <= watermark:
+            windows.extend(self.close(end))
+            end = self.next()
+        return windows
+
+
+class SessionWindows:
+
+    def __init__(self, gap: float, aggregation: Aggregation):
+        self.gap = gap
+        self.aggregation = aggregation
+        self.sessions = {}
+        self.expiry = []
+        self.expired = []
+        self.closed = float("-inf")
+
+    def add(self, key: object, t: float, value: object) -> bool:
+        if t + self.gap <= self.closed:
+            return False
+        session = self.sessions.get(key)
+        if session is not None and session[1] + self.gap < t:
+            self.expired.append(self.emit(key, session))
+            session = None
+        if session is None:
+            session = self.sessions[key] = [t, t, self.aggregation.zero]
+        session[0] = min(session[0], t)
+        session[1] = max(session[1], t)
+        session[2] = self.aggregation.add(session[2], value)
+        heapq.heappush(self.expiry, (session[1] + self.gap, id(session), key))
+        return True
+
+    def emit(self, key: object, session: list) -> Window:
+        del self.sessions[key]
+        return Window(key, session[0], session[1] + self.gap, self.aggregation.result(session[2]))
+
+    def deadline(self) -> float:
+        return self.expiry[0][0] if self.expiry else None
+
+    def advance(self, watermark: float) -> list:
+        windows = self.expired
+        self.expired = []
+        while self.expiry and self.expiry[0][0] <= watermark:
+            expires, ident, key = heapq.heappop(self.expiry)
+            session = self.sessions.get(key)
+            if session is not None and id(session) == ident and session[1] + self.gap <= watermark:
+                windows.append(self.emit(key, session))
+        self.closed = max(self.closed, watermark)
+        return windows
+
+
+def window(kind: str,
+           size: float = None,
+           key: Callable = None,
+           agg: object = "count",
+           value: Callable = None,
+           slide: float = None,
+           gap: float = None,
+           timestamp: Callable = None,
+           lateness: float = 0.0):
+    """
+    The `window` function builds the task function of a windowed aggregation stage.
+
+    Args:
+      kind (str): One of `"tumbling"`, `"sliding"` or `"session"`.
+      size (float): The length of tumbling and sliding windows, or the inactivity gap of session windows
+    when `gap` is not given.
+      key (Callable): Maps an item to the key it is aggregated under. Defaults to a single global key.
+      agg (object): The name of a built-in aggregation (`"count"`, `"sum"`, `"min"`, `"max"`, `"mean"`) or
+    an `Aggregation`. Defaults to `"count"`
+      value (Callable): Maps an item to the value that is aggregated. Defaults to the item itself.
+      slide (float): How far consecutive sliding windows are apart. `size` must be a multiple of it.
+      gap (float): The inactivity gap that closes a session window.
+      timestamp (Callable): Maps an item to its event time. Defaults to processing time.
+      lateness (float): How far the watermark trails the largest event time seen. Defaults to 0
+
+    Returns:
+      An async generator function taking a `Stream` and yielding `Window` tuples.
+    """
+    aggregation = AGGREGATIONS[agg] if isinstance(agg, str) else agg
+
+    def windows():
+        if kind == "tumbling":
+            return TumblingWindows(size, aggregation)
+        if kind == "sliding":
+            return SlidingWindows(size, slide, aggregation)
+        if kind == "session":
+            return SessionWindows(gap if gap is not None else size, aggregation)
+        raise ValueError(f"unknown window kind: {kind}")
+
+    windows()  # fail on a bad configuration when the pipeline is built
+
+    async def function(input):
+        state = windows()
+        watermark = float("-inf")
+        while True:
+            if timestamp is None and not input.qsize():
+                deadline = state.deadline()
+                timeout = None if deadline is None else max(deadline - time.time(), 0)
+                try:
+                    item = await input.poll(timeout)
+                except asyncio.TimeoutError:
+                    for w in state.advance(time.time()):
+                        yield w
+                    continue
+            else:
+                item = await input.dequeue()
+
+            if item == Signal.TERM:
+                break
+
+            t = timestamp(item) if timestamp else time.time()
+            if state.add(key(item) if key else None, t, value(item) if value else item):
+                watermark = max(watermark, t - lateness) if timestamp else t
+                for w in state.advance(watermark):
+                    yield w
+
+        for w in state.advance(float("inf")):
+            yield w
+
+    return function
\ No newline at end of file
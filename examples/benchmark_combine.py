@@ -0,0 +1,75 @@
+"""
+    This script measures how many items a reduce stage accounts for, with and without a combiner
+    tree, as the number of upstream workers grows. Every worker sends a stream of counts as fast as
+    it can, and the single-runner reducer adds them to a total, awaiting once per item it receives
+    (as a reducer writing to a store would). Without combiners, the reducer gets one loop iteration
+    per item while the workers flood its input, so the more workers there are, the less of their
+    output it gets through. With `combine=operator.add`, combiners fold each batch waiting in their
+    input into one partial count, and the reducer accounts for a whole batch per item it receives.
+    Sample run (2s):
+
+    .. code-block:: text
+
+        workers          reduce    combine (fan_in=8)
+        1              127451/s       201275/s
+        8                1052/s        58728/s
+        32                282/s        15328/s
+
+    .. code-block:: bash
+
+        python -m examples.benchmark_combine --seconds 2
+"""
+import argparse
+import asyncio
+import operator
+
+import aiopypes
+
+
+def build(workers: int, options: dict, total: list):
+
+    app = aiopypes.App()
+
+    @app.task(interval=3600)
+    async def start():
+        return
+
+    @app.task()
+    async def count(input: aiopypes.Stream):
+        while True:
+            for _ in range(50):
+                yield 1
+            await asyncio.sleep(0)
+
+    @app.task(scale=1)
+    async def receive(input: aiopypes.Stream):
+        async for n in input:
+            total[0] += n
+            await asyncio.sleep(0)
+            yield
+
+    return start.map(*[count] * workers).reduce(receive, **options)
+
+
+async def measure(seconds: float, workers: int, options: dict):
+    total = [0]
+    pipeline = build(workers, options, total)
+    job = asyncio.create_task(pipeline.run_async())
+    await asyncio.sleep(seconds)
+    counted = total[0]
+    await pipeline.stop()
+    await job
+    return counted / seconds
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=2)
+    args = parser.parse_args()
+
+    print(f"{'workers':<10} {'reduce':>12} {'combine (fan_in=8)':>21}")
+    for workers in (1, 8, 32):
+        plain = asyncio.run(measure(args.seconds, workers, {}))
+        combined = asyncio.run(measure(args.seconds, workers, {"combine": operator.add, "fan_in": 8}))
+        print(f"{workers:<10} {plain:>10.0f}/s {combined:>12.0f}/s")
@@ -0,0 +1,88 @@
+"""
+    This script measures what it costs to keep 500 slow calls (such as HTTP requests, simulated with
+    a 100ms sleep) in flight, with 500 runners or with fewer runners given `concurrency` slots each.
+    All three reach about the same throughput. The script also reports the memory allocated by the
+    running pipeline and the CPU time spent per item. Slots take about a third less memory than
+    runners, but each item in flight gets its own asyncio task, which costs more CPU per item than
+    waking an idle runner. Sample run (3s):
+
+    .. code-block:: text
+
+                                  items/s   runners   memory (KiB)   CPU/item
+        scale=500                    4968       500           1796    24.1 us
+        concurrency=100              4833         5           1154    33.5 us
+        concurrency=500              4833         1           1145    35.4 us
+
+    .. code-block:: bash
+
+        python -m examples.benchmark_concurrency --seconds 3
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+import aiopypes
+
+
+def build(options: dict, counts: list):
+
+    app = aiopypes.App()
+
+    @app.task()
+    async def source(input: aiopypes.Stream):
+        while True:
+            for _ in range(50):
+                yield 1
+            await asyncio.sleep(0.001)
+
+    @app.map(fuse=False, scale=500, max_items=1000, **options)
+    async def fetch(item):
+        await asyncio.sleep(0.1)
+        return item
+
+    @app.map(fuse=False)
+    def sink(item):
+        counts[0] += 1
+
+    return source.map(fetch).map(sink)
+
+
+async def measure(seconds: float, options: dict, trace: bool = False):
+    counts = [0]
+    pipeline = build(options, counts)
+    if trace:
+        tracemalloc.start()
+    job = asyncio.create_task(pipeline.run_async())
+    await asyncio.sleep(1)
+    counted, cpu = counts[0], time.process_time()
+    await asyncio.sleep(seconds)
+    counted, cpu = counts[0] - counted, time.process_time() - cpu
+    runners = {m["name"]: m for m in pipeline.metrics()}["fetch"]["runners"]
+    memory = 0
+    if trace:
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    await pipeline.stop()
+    await job
+    return counted, runners, memory, cpu
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    runs = {
+        "scale=500": {},
+        "concurrency=100": {"concurrency": 100},
+        "concurrency=500": {"concurrency": 500},
+    }
+
+    print(f"{'':<22} {'items/s':>10} {'runners':>9} {'memory (KiB)':>14} {'CPU/item':>10}")
+    for name, options in runs.items():
+        counted, runners, _, cpu = asyncio.run(measure(args.seconds, options))
+        _, _, memory, _ = asyncio.run(measure(1, options, trace=True))
+        print(f"{name:<22} {counted / args.seconds:>10.0f} {runners:>9} {memory / 1024:>14.0f} "
+              f"{cpu / counted * 1e6:>7.1f} us")
@@ -0,0 +1,70 @@
+"""
+    This script measures the throughput cost of durable streams. A number
+    of concurrent producers (standing in for the runners of an upstream
+    task) enqueue items into a stream while a single consumer dequeues and
+    acknowledges them. The in-memory `Stream` is compared with a
+    `DurableStream` with and without `fsync`.
+
+    Since producers wait for their group commit, throughput grows with the
+    number of concurrent producers sharing each `fsync`. Sample run (100k
+    items):
+
+    .. code-block:: text
+
+                                     64 producers    1 producer
+        Stream                        750k items/s   710k items/s
+        DurableStream(fsync=False)     87k items/s    13k items/s
+        DurableStream(fsync=True)      81k items/s     6k items/s
+
+    .. code-block:: bash
+
+        python -m examples.benchmark_durable --items 100000 --producers 64
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+
+from aiopypes.stream import Stream, DurableStream
+
+
+async def measure(stream, items: int, producers: int):
+    await stream.open()
+
+    async def produce(n):
+        for i in range(n):
+            await stream.enqueue(i)
+
+    async def consume():
+        for _ in range(items):
+            await stream.dequeue()
+            stream.ack()
+
+    start = time.perf_counter()
+    share = items // producers
+    jobs = [asyncio.create_task(produce(share)) for _ in range(producers)]
+    await asyncio.gather(asyncio.create_task(consume()), *jobs)
+    elapsed = time.perf_counter() - start
+
+    await stream.close()
+
+    return items / elapsed
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--producers", type=int, default=64)
+    args = parser.parse_args()
+    items = args.items - args.items % args.producers
+
+    with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+        streams = {
+            "Stream": Stream(),
+            "DurableStream(fsync=False)": DurableStream(a, fsync=False),
+            "DurableStream(fsync=True)": DurableStream(b, fsync=True),
+        }
+        for name, stream in streams.items():
+            speed = asyncio.run(measure(stream, items, args.producers))
+            print(f"{name:<30} {speed:>12,.0f} items/s")
\ No newline at end of file
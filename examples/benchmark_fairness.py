@@ -0,0 +1,88 @@
+"""
+    This script measures how a saturated task is shared between two upstream tasks feeding it. Both
+    `heavy` and `light` send more than the shared task (2 runners, 1ms per item) can process, `heavy`
+    ten times faster than `light`. With a plain `Stream`, the task is shared in proportion to what
+    each upstream sends. With `fair=True` each upstream gets its own sub-queue and an equal share,
+    or the share given by `weights`. Sample run (3s):
+
+    .. code-block:: text
+
+                                  heavy/s    light/s  light share
+        Stream                       1033        101        8.9 %
+        fair                          508        508       50.0 %
+        fair, heavy: 3                855        285       25.0 %
+
+    .. code-block:: bash
+
+        python -m examples.benchmark_fairness --seconds 3
+"""
+import argparse
+import asyncio
+import time
+
+import aiopypes
+
+
+def build(options: dict, counts: dict):
+
+    app = aiopypes.App()
+
+    @app.task(interval=3600)
+    async def start():
+        return
+
+    @app.task()
+    async def heavy(input: aiopypes.Stream):
+        while True:
+            for _ in range(100):
+                yield "heavy", time.perf_counter()
+            await asyncio.sleep(0)
+
+    @app.task()
+    async def light(input: aiopypes.Stream):
+        while True:
+            for _ in range(10):
+                yield "light", time.perf_counter()
+            await asyncio.sleep(0)
+
+    @app.task(scale=2, fuse=False, **options)
+    async def shared(input: aiopypes.Stream):
+        async for flow, start in input:
+            await asyncio.sleep(0.001)
+            yield flow, start
+
+    @app.map(fuse=False)
+    def sink(item):
+        flow, start = item
+        counts[flow] += 1
+
+    return start.map(heavy, light).reduce(shared).map(sink)
+
+
+async def measure(seconds: float, options: dict):
+    counts = {"heavy": 0, "light": 0}
+    pipeline = build(options, counts)
+    job = asyncio.create_task(pipeline.run_async())
+    await asyncio.sleep(seconds)
+    await pipeline.stop()
+    await job
+    return counts["heavy"], counts["light"]
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    runs = {
+        "Stream": {},
+        "fair": {"fair": True},
+        "fair, heavy: 3": {"fair": True, "weights": {"heavy": 3}},
+    }
+
+    print(f"{'':<22} {'heavy/s':>10} {'light/s':>10} {'light share':>12}")
+    for name, options in runs.items():
+        heavy, light = asyncio.run(measure(args.seconds, options))
+        share = 100 * light / (heavy + light)
+        print(f"{name:<22} {heavy / args.seconds:>10.0f} {light / args.seconds:>10.0f} {share:>10.1f} %")
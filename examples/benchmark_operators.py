@@ -0,0 +1,112 @@
+"""
+    This script measures the per-item overhead of generator tasks against
+    operator tasks. A source emits integers into the same chain of cheap
+    stages (parse -> filter -> project) and a counting sink, written once
+    as async generator tasks and once with `@app.map` / `@app.filter`.
+    Operator stages are drained from their input in batches and called
+    in a plain loop instead of being driven through `async for`. Sample
+    run, with and without fusion:
+
+    .. code-block:: text
+
+                      unfused        fused
+        generators    51k items/s   270k items/s
+        operators     86k items/s   360k items/s
+
+    .. code-block:: bash
+
+        python -m examples.benchmark_operators --items 200000
+"""
+import argparse
+import asyncio
+import time
+
+import aiopypes
+
+
+def generators(app, fuse: bool):
+
+    @app.task(fuse=fuse)
+    async def parse(input: aiopypes.Stream):
+        async for s in input:
+            yield int(s)
+
+    @app.task(fuse=fuse)
+    async def keep(input: aiopypes.Stream):
+        async for i in input:
+            if i >= 0:
+                yield i
+
+    @app.task(fuse=fuse)
+    async def project(input: aiopypes.Stream):
+        async for i in input:
+            yield i, i * 2
+
+    return parse, keep, project
+
+
+def operators(app, fuse: bool):
+
+    @app.map(fuse=fuse)
+    def parse(s):
+        return int(s)
+
+    @app.filter(fuse=fuse)
+    def keep(i):
+        return i >= 0
+
+    @app.map(fuse=fuse)
+    def project(i):
+        return i, i * 2
+
+    return parse, keep, project
+
+
+def build(items: int, stages, fuse: bool, done: asyncio.Event):
+
+    app = aiopypes.App()
+
+    @app.task(fuse=fuse)
+    async def source(input: aiopypes.Stream):
+        for i in range(items):
+            yield str(i)
+
+    count = 0
+
+    @app.map(fuse=fuse)
+    def sink(item):
+        nonlocal count
+        count += 1
+        if count == items:
+            done.set()
+
+    parse, keep, project = stages(app, fuse)
+
+    return source.map(parse).map(keep).map(project).map(sink)
+
+
+async def measure(items: int, stages, fuse: bool):
+    done = asyncio.Event()
+    pipeline = build(items, stages, fuse, done)
+    start = time.perf_counter()
+    job = asyncio.create_task(pipeline.run_async())
+    await done.wait()
+    elapsed = time.perf_counter() - start
+    job.cancel()
+    try:
+        await job
+    except asyncio.CancelledError:
+        pass
+    return items / elapsed
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{'':<12} {'unfused':>14} {'fused':>20}")
+    for name, stages in (("generators", generators), ("operators", operators)):
+        speeds = [asyncio.run(measure(args.items, stages, fuse)) for fuse in (False, True)]
+        print(f"{name:<12} " + " ".join(f"{speed:>12,.0f} items/s" for speed in speeds))
@@ -0,0 +1,94 @@
+"""
+    This script measures the latency of urgent items mixed into bulk
+    traffic that saturates a stage. A source floods a worker task (4
+    runners, 1ms per item) with bulk items and adds an urgent item every
+    10ms; the sink records how long each kind of item took from the
+    source to the sink. With a plain `Stream`, urgent items wait behind
+    the whole bulk backlog; with `priority=` they skip it. Sample run
+    (3s):
+
+    .. code-block:: text
+
+                           urgent p50   urgent max     bulk p50
+        Stream                    1523 ms      2515 ms      1459 ms
+        priority (strict)            1 ms        23 ms      1425 ms
+        priority (weighted)          1 ms        24 ms      1437 ms
+
+    .. code-block:: bash
+
+        python -m examples.benchmark_priority --seconds 3
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiopypes
+
+
+URGENT = 0
+BULK = 1
+
+
+def build(options: dict, latencies: dict):
+
+    app = aiopypes.App()
+
+    @app.task()
+    async def source(input: aiopypes.Stream):
+        last = time.perf_counter()
+        while True:
+            now = time.perf_counter()
+            if now - last >= 0.01:
+                last = now
+                yield URGENT, now
+            for _ in range(10):
+                yield BULK, time.perf_counter()
+            await asyncio.sleep(0)
+
+    @app.task(scale=4, **options)
+    async def work(input: aiopypes.Stream):
+        async for kind, start in input:
+            await asyncio.sleep(0.001)
+            yield kind, start
+
+    @app.map(fuse=False)
+    def sink(item):
+        kind, start = item
+        latencies[kind].append(time.perf_counter() - start)
+
+    return source.map(work).map(sink)
+
+
+async def measure(seconds: float, options: dict):
+    latencies = {URGENT: [], BULK: []}
+    pipeline = build(options, latencies)
+    job = asyncio.create_task(pipeline.run_async())
+    await asyncio.sleep(seconds)
+    await pipeline.stop()
+    await job
+    return latencies
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    priority = lambda item: item[0]
+    runs = {
+        "Stream": {},
+        "priority (strict)": {"priority": priority, "levels": 2},
+        "priority (weighted)": {"priority": priority, "levels": 2, "weights": [4, 1]},
+    }
+
+    results = {}
+    for name, options in runs.items():
+        results[name] = asyncio.run(measure(args.seconds, options))
+
+    print(f"{'':<20} {'urgent p50':>12} {'urgent max':>12} {'bulk p50':>12}")
+    for name, latencies in results.items():
+        urgent, bulk = latencies[URGENT], latencies[BULK]
+        print(f"{name:<20} {statistics.median(urgent) * 1000:>9.0f} ms {max(urgent) * 1000:>9.0f} ms "
+              f"{statistics.median(bulk) * 1000:>9.0f} ms")
@@ -0,0 +1,111 @@
+"""
+    This script measures what 200 rarely used branches cost with and without scale-to-zero. A source
+    routes 20 items per second, round-robin, to 200 copies of a branch task, so each branch gets an
+    item every 10 seconds. By default every branch keeps its runner and its scaler polling once per
+    second. With `StaticTaskScaler(1, min=0, grace=1)`, a branch retires its runner after a second
+    without items, waits without polling, and starts it again as soon as the next item arrives. The
+    script reports the asyncio tasks alive, the memory allocated by the running pipeline, the CPU
+    time spent per second, and the latency of items through the pipeline, next to the cold starts of
+    the branches and their mean latency (from the arrival of the item to the runner starting). The
+    runners retired make about half of the tasks, and a tenth of the memory. The CPU time does not
+    drop: a scaler waking once per second costs next to nothing, and at this rate each item starts a
+    branch that retires a second later, which costs a little more than keeping it. With no items at
+    all (`--interval 3600`) both take the same CPU time. Sample runs (12s):
+
+    .. code-block:: text
+
+                         tasks   memory (KiB)   CPU/s   p99 latency   cold starts
+        always on          407           1941   24 ms        0.4 ms    0
+        min=0              227           1747   30 ms        1.1 ms    235 (0.15 ms)
+
+        --interval 3600
+        always on          407           1925   21 ms             -    0
+        min=0              207           1682   21 ms             -    0
+
+    .. code-block:: bash
+
+        python -m examples.benchmark_scale_to_zero --seconds 12
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+import aiopypes
+
+from aiopypes.route import Router
+from aiopypes.scale import StaticTaskScaler
+
+
+BRANCHES = 200
+
+
+def build(interval: float, options: dict, latencies: list):
+
+    app = aiopypes.App()
+
+    @app.task()
+    async def source(input: aiopypes.Stream):
+        n = 0
+        while True:
+            await asyncio.sleep(interval)
+            yield n, time.perf_counter()
+            n += 1
+
+    @app.map(fuse=False, **options)
+    def branch(item):
+        return item
+
+    @app.map(fuse=False)
+    def sink(item):
+        n, start = item
+        latencies.append(time.perf_counter() - start)
+
+    router = Router(key=lambda item: item[0] % BRANCHES, routes={i: i for i in range(BRANCHES)})
+    return source.map(*[branch] * BRANCHES, routes=router).reduce(sink)
+
+
+async def measure(seconds: float, interval: float, options: dict, trace: bool = False):
+    latencies = []
+    pipeline = build(interval, options, latencies)
+    if trace:
+        tracemalloc.start()
+    job = asyncio.create_task(pipeline.run_async())
+    await asyncio.sleep(2)
+    tasks, cpu = [], time.process_time()
+    for _ in range(int(seconds)):
+        await asyncio.sleep(1)
+        tasks.append(len(asyncio.all_tasks()))
+    cpu = time.process_time() - cpu
+    memory = 0
+    if trace:
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    branches = [m for m in pipeline.metrics() if m["name"] == "branch"]
+    await pipeline.stop()
+    await job
+    starts = sum(m.get("cold_starts", 0) for m in branches)
+    latency = sum(m.get("cold_start_avg", 0) * m.get("cold_starts", 0) for m in branches)
+    return statistics.mean(tasks), memory, cpu / seconds, latencies, starts, latency / starts if starts else 0
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=12)
+    parser.add_argument("--interval", type=float, default=0.05, help="the seconds between two items")
+    args = parser.parse_args()
+
+    runs = {
+        "always on": {},
+        "min=0": {"scaler": StaticTaskScaler(1, min=0, grace=1)},
+    }
+
+    print(f"{'':<14} {'tasks':>7} {'memory (KiB)':>14} {'CPU/s':>7} {'p99 latency':>13} {'cold starts':>13}")
+    for name, options in runs.items():
+        tasks, _, cpu, latencies, starts, latency = asyncio.run(measure(args.seconds, args.interval, options))
+        memory = asyncio.run(measure(1, args.interval, options, trace=True))[1]
+        p99 = f"{statistics.quantiles(latencies, n=100)[98] * 1000:.1f} ms" if len(latencies) > 1 else "-"
+        cold = f"{starts} ({latency * 1000:.2f} ms)" if starts else "0"
+        print(f"{name:<14} {tasks:>7.0f} {memory / 1024:>14.0f} {cpu * 1000:>4.0f} ms {p99:>13}    {cold}")
@@ -0,0 +1,96 @@
+"""
+    This script measures what an overloaded stage delivers under each way of shedding stale work. A
+    source floods a worker task (4 runners, 1ms per item) with timestamped items, far beyond what it
+    can process, and the sink counts the items delivered within a 100ms latency target ("goodput")
+    next to everything delivered. With an unbounded `Stream`, the backlog grows and almost nothing
+    arrives on time. `max_age` alone keeps the runners off items that can no longer make it, but the
+    backlog is served oldest first, so the item a runner picks is usually about to expire and is
+    dropped once processed. Bounding the stream keeps latency low: `block` pushes back on the
+    source, and the drop policies shed the excess instead, `drop_oldest` serving the freshest items.
+    Sample run (3s):
+
+    .. code-block:: text
+
+                                goodput/s  delivered/s       p50      dropped
+        Stream                         94         2910   1536 ms            0
+        max_age=0.1                   111          112     58 ms       706123
+        max_items=100 block          3207         3207     32 ms            0
+        max_items=100 oldest         2792         2792      2 ms       882520
+        max_items=100 newest         2994         2994     35 ms      1181616
+        max_items=100 random         3049         3049     33 ms      1265151
+        max_age + oldest             2562         2562      2 ms       682611
+
+    .. code-block:: bash
+
+        python -m examples.benchmark_shedding --seconds 3
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiopypes
+
+
+TARGET = 0.1
+
+
+def build(options: dict, latencies: list):
+
+    app = aiopypes.App()
+
+    @app.task()
+    async def source(input: aiopypes.Stream):
+        while True:
+            for _ in range(50):
+                yield time.perf_counter()
+            await asyncio.sleep(0)
+
+    @app.task(scale=4, fuse=False, **options)
+    async def work(input: aiopypes.Stream):
+        async for start in input:
+            await asyncio.sleep(0.001)
+            yield start
+
+    @app.map(fuse=False)
+    def sink(start):
+        latencies.append(time.perf_counter() - start)
+
+    return source.map(work).map(sink)
+
+
+async def measure(seconds: float, options: dict):
+    latencies = []
+    pipeline = build(options, latencies)
+    job = asyncio.create_task(pipeline.run_async())
+    await asyncio.sleep(seconds)
+    metrics = pipeline.metrics()
+    await pipeline.stop()
+    await job
+    dropped = sum(m["dropped_expired"] + m["dropped_shed"] for m in metrics)
+    return latencies, dropped
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    runs = {
+        "Stream": {},
+        f"max_age={TARGET}": {"max_age": TARGET},
+        "max_items=100 block": {"max_items": 100},
+        "max_items=100 oldest": {"max_items": 100, "policy": "drop_oldest"},
+        "max_items=100 newest": {"max_items": 100, "policy": "drop_newest"},
+        "max_items=100 random": {"max_items": 100, "policy": "drop_random"},
+        "max_age + oldest": {"max_age": TARGET, "max_items": 100, "policy": "drop_oldest"},
+    }
+
+    print(f"{'':<22} {'goodput/s':>10} {'delivered/s':>12} {'p50':>9} {'dropped':>12}")
+    for name, options in runs.items():
+        latencies, dropped = asyncio.run(measure(args.seconds, options))
+        goodput = sum(1 for latency in latencies if latency <= TARGET)
+        p50 = statistics.median(latencies) * 1000 if latencies else 0
+        print(f"{name:<22} {goodput / args.seconds:>10.0f} {len(latencies) / args.seconds:>12.0f} "
+              f"{p50:>6.0f} ms {dropped:>12}")
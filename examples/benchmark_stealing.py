@@ -0,0 +1,88 @@
+"""
+    This script runs the pipeline of `examples/balance_default.py` with and without work stealing:
+    a source emits 100 items per second, broadcast to `task1` (1 runner) and `task2` (`--scale`
+    runners), which take 0.5s per item. `task1` can only process 2 items per second, so its backlog
+    grows while the spare runners of `task2` sit idle. With `steal=True` on both tasks, idle `task2`
+    runners take batches from the tail of `task1`'s stream. The script reports the items processed
+    per second, the backlog left in `task1` and the 99th percentile latency. At the default scale of
+    50, `task2` needs all but a few of its runners for its own items, so stealing helps little (92.8
+    to 96.9 items/s). Sample run with 100 runners (10s):
+
+    .. code-block:: text
+
+                     processed/s   task1 backlog   p99 latency    stolen
+        default             92.7             936       5263 ms         0
+        steal=True         176.0               0        504 ms       903
+
+    .. code-block:: bash
+
+        python -m examples.benchmark_stealing --seconds 10 --scale 100
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiopypes
+
+
+def build(scale: int, options: dict, latencies: list):
+
+    app = aiopypes.App()
+
+    @app.task(interval=0.01)
+    async def hundred_per_second():
+        return time.perf_counter()
+
+    @app.task(scale=1, **options)
+    async def task1(input: aiopypes.Stream):
+        async for start in input:
+            await asyncio.sleep(0.5)
+            yield start
+
+    @app.task(scale=scale, **options)
+    async def task2(input: aiopypes.Stream):
+        async for start in input:
+            await asyncio.sleep(0.5)
+            yield start
+
+    @app.map(fuse=False)
+    def receive(start):
+        latencies.append(time.perf_counter() - start)
+
+    return hundred_per_second \
+           .map(task1, task2) \
+           .reduce(receive)
+
+
+async def measure(seconds: float, scale: int, options: dict):
+    latencies = []
+    pipeline = build(scale, options, latencies)
+    job = asyncio.create_task(pipeline.run_async())
+    await asyncio.sleep(seconds)
+    metrics = {m["name"]: m for m in pipeline.metrics()}
+    processed = len(latencies)
+    await pipeline.stop()
+    await job
+    return processed, metrics, latencies
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--scale", type=int, default=50, help="the runners of task2")
+    args = parser.parse_args()
+
+    runs = {
+        "default": {},
+        "steal=True": {"steal": True},
+    }
+
+    print(f"{'':<12} {'processed/s':>12} {'task1 backlog':>15} {'p99 latency':>13} {'stolen':>9}")
+    for name, options in runs.items():
+        processed, metrics, latencies = asyncio.run(measure(args.seconds, args.scale, options))
+        stolen = sum(m.get("stolen", 0) for m in metrics.values())
+        p99 = statistics.quantiles(latencies, n=100)[98] * 1000
+        print(f"{name:<12} {processed / args.seconds:>12.1f} {metrics['task1']['qsize']:>15} "
+              f"{p99:>10.0f} ms {stolen:>9}")
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import aiopypes
+
+
+def test_drain_delivers_backlog():
+
+    app = aiopypes.App()
+    produced, received = [], []
+
+    @app.task()
+    async def source(input: aiopypes.Stream):
+        i = 0
+        while True:
+            produced.append(i)
+            yield i
+            i += 1
+            if i % 10 == 0:
+                await asyncio.sleep(0.001)
+
+    @app.task(scale=4, fuse=False)
+    async def slow(input: aiopypes.Stream):
+        async for i in input:
+            await asyncio.sleep(0.001)
+            yield i
+
+    @app.map(fuse=False)
+    def sink(i):
+        received.append(i)
+
+    async def main():
+        pipeline = source.map(slow).map(sink)
+        job = asyncio.create_task(pipeline.run_async())
+        await asyncio.sleep(0.1)
+        drained = await pipeline.drain(10)
+        await asyncio.wait_for(job, 5)
+        return drained
+
+    assert asyncio.run(main())
+    assert produced
+    assert sorted(received) == produced
+
+
+def test_drain_deadline_with_blocked_source():
+
+    app = aiopypes.App()
+
+    @app.task()
+    async def source(input: aiopypes.Stream):
+        yield 1
+        await asyncio.sleep(1000)
+
+    @app.map(fuse=False)
+    def sink(i):
+        pass
+
+    async def main():
+        pipeline = source.map(sink)
+        job = asyncio.create_task(pipeline.run_async())
+        await asyncio.sleep(0.1)
+        start = time.monotonic()
+        drained = await pipeline.drain(0.5)
+        await asyncio.wait_for(job, 5)
+        return drained, time.monotonic() - start
+
+    drained, elapsed = asyncio.run(main())
+    assert not drained
+    assert elapsed < 5
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import time
+
+import aiopypes
+
+from aiopypes.deadline import Deadline
+from aiopypes.signal import Signal
+from aiopypes.stream import DurableStream
+from aiopypes.wal import WriteAheadLog
+
+
+def segments(directory):
+    return sorted(f for f in os.listdir(directory) if f.endswith(".wal"))
+
+
+def test_wal_replays_unacknowledged_items_in_order(tmp_path):
+
+    async def write():
+        log = WriteAheadLog(str(tmp_path))
+        assert await log.open() == []
+        seqs = await asyncio.gather(*(log.append(str(i).encode()) for i in range(10)))
+        log.ack([seq for seq in seqs if seq % 3 == 0])
+        await log.close()
+
+    async def read():
+        log = WriteAheadLog(str(tmp_path))
+        pending = await log.open()
+        await log.close()
+        return pending
+
+    asyncio.run(write())
+    pending = asyncio.run(read())
+    assert [payload for _, payload in pending] == [str(i).encode() for i in range(10) if i % 3]
+
+
+def test_wal_ignores_torn_records(tmp_path):
+
+    async def write():
+        log = WriteAheadLog(str(tmp_path))
+        await log.open()
+        for i in range(3):
+            await log.append(b"item %d" % i)
+        await log.close()
+
+    async def read():
+        log = WriteAheadLog(str(tmp_path))
+        pending = await log.open()
+        await log.close()
+        return pending
+
+    asyncio.run(write())
+    path = os.path.join(str(tmp_path), segments(str(tmp_path))[-1])
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 2)
+    assert [payload for _, payload in asyncio.run(read())] == [b"item 0", b"item 1"]
+
+
+def test_wal_compaction(tmp_path):
+
+    async def write():
+        log = WriteAheadLog(str(tmp_path), segment_bytes=1024, compact_ratio=0.5)
+        await log.open()
+        seqs = []
+        for i in range(400):
+            seqs.append(await log.append(b"%04d" % i))
+        kept = seqs[::50]
+        log.ack([seq for seq in seqs if seq not in kept])
+        for i in range(400, 800):  # keeps rolling segments, which compacts the acknowledged ones
+            log.ack([await log.append(b"%04d" % i)])
+        await log.close()
+        return [b"%04d" % seq for seq in kept]
+
+    async def read():
+        log = WriteAheadLog(str(tmp_path))
+        pending = await log.open()
+        await log.close()
+        return pending
+
+    kept = asyncio.run(write())
+    assert len(segments(str(tmp_path))) < 10
+    assert sorted(payload for _, payload in asyncio.run(read())) == kept
+
+
+def test_durable_stream_redelivers_after_restart(tmp_path):
+
+    def build(received, limit):
+        app = aiopypes.App()
+
+        @app.task()
+        async def source(input: aiopypes.Stream):
+            for i in range(limit):
+                yield i
+            while True:
+                await asyncio.sleep(1)
+
+        @app.task(stream=DurableStream(str(tmp_path)))
+        async def sink(input: aiopypes.Stream):
+            async for i in input:
+                if i >= 5 and limit:
+                    await asyncio.sleep(1000)  # never acknowledged
+                received.append(i)
+                yield
+
+        return source.map(sink)
+
+    async def run(received, limit):
+        pipeline = build(received, limit)
+        job = asyncio.create_task(pipeline.run_async())
+        await asyncio.sleep(0.3)
+        job.cancel()
+        try:
+            await job
+        except asyncio.CancelledError:
+            pass
+
+    first, second = [], []
+    asyncio.run(run(first, 10))
+    asyncio.run(run(second, 0))
+    assert first == [0, 1, 2, 3, 4]
+    assert sorted(second) == [5, 6, 7, 8, 9]
+
+
+def test_durable_stream_keeps_deadlines_across_restarts(tmp_path, monkeypatch):
+
+    async def write():
+        stream = DurableStream(str(tmp_path))
+        await stream.enqueue(Deadline.after("stale", 0.05))
+        await stream.enqueue(Deadline.after("live", 1000))
+        await stream.close()
+
+    async def read():
+        stream = DurableStream(str(tmp_path))
+        await stream.open()
+        items = [stream.admit(stream.queue.get_nowait()[1]) for _ in range(stream.queue.qsize())]
+        await stream.close()
+        return items
+
+    asyncio.run(write())
+    time.sleep(0.1)
+    # After a reboot the monotonic clock starts over, far behind the one the deadlines were set on.
+    monotonic = time.monotonic
+    monkeypatch.setattr(time, "monotonic", lambda: monotonic() - 1e6)
+    assert asyncio.run(read()) == [Signal.EXPIRED, "live"]
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+import aiopypes
+
+
+def test_cancelled_remove_runner_propagates():
+
+    app = aiopypes.App()
+
+    @app.task()
+    async def source(input: aiopypes.Stream):
+        while True:
+            await asyncio.sleep(0.5)
+            yield 0
+
+    @app.task(scale=2, fuse=False)
+    async def idle(input: aiopypes.Stream):
+        async for i in input:
+            yield i
+
+    async def main():
+        pipeline = source.map(idle)
+        job = asyncio.create_task(pipeline.run_async())
+        await asyncio.sleep(0.1)
+        task = [t for t in pipeline.tasks if t.name == "idle"][0]
+        removal = asyncio.create_task(task.remove_runner())
+        await asyncio.sleep(0.1)
+        removal.cancel()
+        try:
+            with pytest.raises(asyncio.CancelledError):
+                await asyncio.wait_for(removal, 5)
+        finally:
+            await pipeline.stop()
+            await asyncio.wait_for(job, 15)
+
+    asyncio.run(main())
+
+
+def test_checkout_ack_and_requeue():
+
+    async def main():
+        stream = aiopypes.Stream()
+        for i in range(3):
+            await stream.enqueue(i)
+
+        async def take(count):
+            return [await stream.dequeue() for _ in range(count)]
+
+        runner = asyncio.create_task(take(2))
+        assert await runner == [0, 1]
+        assert stream.inflight(runner) == 2
+        assert stream.inflight() == 2
+
+        # Requeued entries go behind the ones still waiting.
+        assert stream.requeue(runner) == [0, 1]
+        assert stream.inflight() == 0
+        assert await take(3) == [2, 0, 1]
+
+        async def take_and_ack():
+            await stream.dequeue()
+            return stream.ack()
+
+        await stream.enqueue(3)
+        runner = asyncio.create_task(take_and_ack())
+        assert await runner == [3]
+        assert stream.inflight(runner) == 0
+        assert stream.requeue(runner) == []
+        assert stream.qsize() == 0
+
+    asyncio.run(main())
+
+
+def test_removed_runner_finishes_its_item():
+
+    app = aiopypes.App()
+    received = []
+
+    @app.task()
+    async def source(input: aiopypes.Stream):
+        for i in range(20):
+            yield i
+        await asyncio.sleep(1000)
+
+    @app.task(scale=2, fuse=False)
+    async def slow(input: aiopypes.Stream):
+        async for i in input:
+            await asyncio.sleep(0.05)
+            yield i
+
+    @app.map(fuse=False)
+    def sink(i):
+        received.append(i)
+
+    async def main():
+        pipeline = source.map(slow).map(sink)
+        job = asyncio.create_task(pipeline.run_async())
+        await asyncio.sleep(0.1)
+        task = [t for t in pipeline.tasks if t.name == "slow"][0]
+        await asyncio.wait_for(task.remove_runner(), 5)
+        assert len(task.runners) == 1
+        for _ in range(100):
+            if len(received) == 20:
+                break
+            await asyncio.sleep(0.05)
+        await pipeline.drain(0.5)
+        await asyncio.wait_for(job, 5)
+
+    asyncio.run(main())
+    assert sorted(received) == list(range(20))
@@ -0,0 +1,42 @@
+import asyncio
+import random
+
+import aiopypes
+
+
+def test_ordered_task_keeps_input_order():
+
+    app = aiopypes.App()
+    received = []
+
+    @app.task()
+    async def source(input: aiopypes.Stream):
+        for i in range(100):
+            yield i
+        await asyncio.sleep(1000)
+
+    @app.task(scale=8, ordered=True, fuse=False)
+    async def jittery(input: aiopypes.Stream):
+        async for i in input:
+            await asyncio.sleep(random.random() * 0.01)
+            yield i
+
+    async def main():
+        finished = asyncio.Event()
+
+        @app.map(fuse=False)
+        def sink(i):
+            received.append(i)
+            if len(received) == 100:
+                finished.set()
+
+        pipeline = source.map(jittery).map(sink)
+        job = asyncio.create_task(pipeline.run_async())
+        try:
+            await asyncio.wait_for(finished.wait(), 10)
+        finally:
+            await pipeline.drain(0.5)
+            await asyncio.wait_for(job, 5)
+
+    asyncio.run(main())
+    assert received == list(range(100))
@@ -0,0 +1,63 @@
+import asyncio
+import os
+
+from aiopypes.signal import Signal
+from aiopypes.stream import SpillableStream
+
+
+def test_spill_preserves_order(tmp_path):
+
+    async def main():
+        stream = SpillableStream(max_items=5, segment_bytes=64, directory=str(tmp_path))
+        for i in range(200):
+            await stream.enqueue(i)
+        assert stream.qsize() == 200
+        assert stream.spilled
+        spill, = os.listdir(tmp_path)
+        assert os.listdir(tmp_path / spill)
+        items = [await stream.dequeue() for _ in range(200)]
+        assert stream.qsize() == 0
+        await stream.close()
+        return items
+
+    assert asyncio.run(main()) == list(range(200))
+    assert os.listdir(tmp_path) == []
+
+
+def test_spill_with_concurrent_consumers(tmp_path):
+
+    async def main():
+        stream = SpillableStream(max_items=10, segment_bytes=256, directory=str(tmp_path))
+        received = []
+
+        async def consume():
+            async for i in stream:
+                received.append(i)
+                await asyncio.sleep(0)
+
+        consumers = [asyncio.create_task(consume()) for _ in range(4)]
+        for i in range(1000):
+            await stream.enqueue(i)
+            if i % 100 == 0:
+                await asyncio.sleep(0)
+        for _ in consumers:
+            await stream.enqueue(Signal.TERM)
+        await asyncio.wait_for(asyncio.gather(*consumers), 5)
+        await stream.close()
+        return received
+
+    received = asyncio.run(main())
+    assert sorted(received) == list(range(1000))
+    assert os.listdir(tmp_path) == []
+
+
+def test_close_removes_unread_segments(tmp_path):
+
+    async def main():
+        stream = SpillableStream(max_items=1, segment_bytes=16, directory=str(tmp_path))
+        for i in range(100):
+            await stream.enqueue(i)
+        await stream.close()
+
+    asyncio.run(main())
+    assert os.listdir(tmp_path) == []